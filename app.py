@@ -1,38 +1,120 @@
-import re
+import logging
 
-from flask import Flask, request, jsonify, send_from_directory
+import config.settings  # noqa: F401  配置日志
+from flask import Flask, Request, Response, request, jsonify, send_from_directory, redirect
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 
+from config.jobs import JobConfig
+from config.metrics import MetricsConfig
+from config.model import ModelConfig
 from config.paths import PathConfig
-from src.video_processing import extract_audio_from_video, generate_subtitles, embed_subtitles, \
-    generate_subtitles_with_translation
+from config.retention import RetentionConfig
+from config.upload import UploadConfig
+from src.admission import HeavySlots, retry_after_seconds
+from src.cache import cache
+from src.encode_profiles import resolve_encode_profile, InvalidEncodeProfile
+from src.engines import ENGINES, EngineUnavailable, get_engine
+from src.ingest import IngestFile, UploadTooLarge, reserve_unique_filename
+from src.job_events import job_events, TERMINAL_EVENTS
+from src.jobs import get_broker, JobQueue, STATUS_QUEUED, STATUS_RUNNING, STATUS_SUCCEEDED, STATUS_FAILED
+from src.metrics import metrics, record_stage, stats_collector
+from src.model_registry import registry
+from src.pipeline import run_upload_job, lookup_cache, cached_result, register_prefetched_audio, \
+    discard_prefetched_audio, QUEUE_TRANSCRIBE
+from src.parallel_burn import embed_subtitles_parallel
+from src.retention import RetentionSweeper
 from src.subtitle_editor import SubtitleEditor
+from src.http_utils import gzip_response, not_modified, send_file_range
+from src.subtitle_io import SUPPORTED_FORMATS, WRITERS, detect_format, time_to_ms
+from src.subtitle_store import store as subtitle_store, index as subtitle_index, VersionConflict, TrackBusy, \
+    InvalidOperation
+from src.subtitle_track import SubtitleTrack
+from src.transcription import OUTPUT_TRANSLATION, parse_outputs
+from src.translation import TRANSLATORS, TranslationUnavailable, get_translator, translate_cues, translation_cache, \
+    is_language_code
+import json
 import os
 import subprocess
+import threading
+
+class IngestRequest(Request):
+    """
+    上传文件不再先缓冲到临时文件再拷贝：multipart 解析时直接写入 uploads/ 下的最终位置
+    """
+
+    def open_ingest_file(self, filename):
+        # 文件名在创建文件的同时占用，并发上传同名文件不会互相覆盖
+        unique_filename = reserve_unique_filename(PathConfig.UPLOAD_DIR, os.path.basename(filename))
+        # 本进程不执行任务（JOB_WORKERS=0）时，提前解码的音频无法交给工作进程，不在上传时提取
+        ingest = IngestFile(PathConfig.get_upload_path(unique_filename),
+                            early_extract=UploadConfig.EARLY_EXTRACT and job_queue.max_workers > 0)
+        if not hasattr(self, 'ingest_files'):
+            self.ingest_files = []
+        self.ingest_files.append(ingest)
+        return ingest
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not filename or not os.path.basename(filename):
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        PathConfig.ensure_dir(PathConfig.UPLOAD_DIR)
+        return self.open_ingest_file(filename)
+
 
 app = Flask(__name__)
+app.request_class = IngestRequest
+# 整个请求体的上限，预留 1 MB 给 multipart 的其他字段
+app.config['MAX_CONTENT_LENGTH'] = UploadConfig.MAX_UPLOAD_BYTES + (1 << 20)
 CORS(app)
 
-def get_unique_filename(directory, filename):
-    """
-    生成唯一文件名，避免重名文件覆盖
-    :param directory: 保存的目录路径
-    :param filename: 原始文件名
-    :return: 一个不重复的文件名
-    """
-    base, extension = os.path.splitext(filename)
-    # 移除 base 末尾已有的 (数字) 后缀，避免重复叠加
-    base = re.sub(r'\(\d+\)$', '', base)
+logger = logging.getLogger(__name__)
+
+# 任务代理（JOB_BROKER），API 节点与 worker.py 启动的工作进程通过它交接任务
+job_store = get_broker()
+# 转录与烧录共用节点上的重任务槽位，多个服务进程合计不超过 MAX_HEAVY_JOBS
+heavy_slots = HeavySlots()
+job_queue = JobQueue(job_store, run_upload_job, slots=heavy_slots)
+# 按目录 TTL 与容量上限清理 uploads/ 与 outputs/，跳过排队或运行中任务的文件
+retention = RetentionSweeper(job_store.active)
+
+
+def job_queue_metrics():
+    """抓取 /metrics 时读取任务库中排队与运行中的任务数"""
+    return [('job_queue_depth', 'gauge', 'Jobs waiting or running', [
+        ({'status': STATUS_QUEUED}, job_store.count(STATUS_QUEUED)),
+        ({'status': STATUS_RUNNING}, job_store.count(STATUS_RUNNING)),
+    ]), ('job_workers', 'gauge', 'Configured job worker threads', [({}, job_queue.max_workers)]),
+        ('heavy_job_slots', 'gauge', 'Heavy job slots on this node', [
+            ({'state': 'total'}, heavy_slots.count),
+            ({'state': 'in_use'}, heavy_slots.in_use()),
+        ])]
 
-    counter = 1
-    new_filename = f"{base}{extension}"
-    new_path = os.path.join(directory, new_filename)
 
-    while os.path.exists(new_path):
-        counter += 1
-        new_filename = f"{base}({counter}){extension}"
-        new_path = os.path.join(directory, new_filename)
-    return new_filename
+metrics.register_collector(job_queue_metrics)
+metrics.register_collector(stats_collector('result', cache.stats))
+metrics.register_collector(stats_collector('model', registry.stats))
+metrics.register_collector(stats_collector('translation', translation_cache.stats))
+metrics.register_collector(retention.collect)
+
+def too_busy_response(retry_after, reason):
+    """节点繁忙：返回 429 与 Retry-After，而不是继续接收超出处理能力的任务"""
+    response = jsonify({'error': f'Server is busy: {reason}', 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def admission_check():
+    """
+    上传的准入控制：排队任务达到 MAX_QUEUED_JOBS 时返回 429 响应，否则返回 None
+    在读取请求体之前调用，被拒绝的上传不会写入磁盘
+    """
+    queued = job_store.count(STATUS_QUEUED)
+    if queued < JobConfig.MAX_QUEUED_JOBS:
+        return None
+    retry_after = retry_after_seconds(metrics.mean('job_seconds'), queued - JobConfig.MAX_QUEUED_JOBS + 1,
+                                      heavy_slots.count)
+    return too_busy_response(retry_after, f'{queued} jobs queued')
 
 
 @app.route('/test', methods=['GET'])
@@ -42,61 +124,288 @@ def test():
 
 @app.route('/upload', methods=['POST'])
 def upload_video():
+    rejected = admission_check()
+    if rejected is not None:
+        return rejected
+
     # 确保相关目录已存在
     PathConfig.ensure_dirs(
         [PathConfig.UPLOAD_DIR, PathConfig.OUTPUT_DIR, PathConfig.AUDIO_DIR, PathConfig.SUBTITLE_DIR])
 
+    # 访问 request.files 时文件已经通过 IngestRequest 边接收边写入 uploads/ 并计算哈希
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
     file = request.files['file']
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
+    if not isinstance(file.stream, IngestFile):
+        return jsonify({'error': 'Invalid file name'}), 400
 
-    # 处理上传文件名，确保唯一性
-    unique_filename = get_unique_filename(PathConfig.UPLOAD_DIR, file.filename)
-    video_path = PathConfig.get_upload_path(unique_filename)
-    file.save(video_path)
+    return submit_upload(file.stream, request.form)
 
-    # 从唯一文件名提取稳定的 base 名称（去掉扩展名）
-    base = os.path.splitext(unique_filename)[0]
 
-    # 音频提取
-    audio_path = PathConfig.get_audio_path(f"{base}.wav")
-    extract_audio_from_video(video_path, audio_path)
+@app.route('/upload/stream', methods=['POST', 'PUT'])
+def upload_video_stream():
+    """
+    流式上传：请求体即为视频文件本身，文件名与处理选项通过查询参数传递
+    数据边接收边写入最终位置，并同时送入 ffmpeg 提前开始音频提取
+    """
+    filename = os.path.basename(request.args.get('filename', ''))
+    if not filename:
+        return jsonify({'error': 'filename is required'}), 400
+    rejected = admission_check()
+    if rejected is not None:
+        return rejected
 
-    # 检查请求中是否包含 translate 参数
-    translate_target_language = request.form.get('translate')
+    PathConfig.ensure_dirs(
+        [PathConfig.UPLOAD_DIR, PathConfig.OUTPUT_DIR, PathConfig.AUDIO_DIR, PathConfig.SUBTITLE_DIR])
+    ingest = request.open_ingest_file(filename)
+    ingest.copy_from(request.stream)
+    return submit_upload(ingest, request.args)
 
-    # 生成字幕
-    subtitle_path = PathConfig.get_subtitle_path(f"{base}.srt")
-    if translate_target_language:
-        success = generate_subtitles_with_translation(audio_path, subtitle_path,
-                                                      target_language=translate_target_language)
-    else:
-        success = generate_subtitles(audio_path, subtitle_path)
 
-    if not success:
-        return jsonify({'error': '生成字幕时出错'}), 500
+def parse_segments(value):
+    """分段并行烧录的段数：为空时返回 None（使用 EncodeConfig.BURN_SEGMENTS），否则必须是正整数"""
+    if value in (None, ''):
+        return None
+    if isinstance(value, bool) or not str(value).isdigit() or int(value) < 1:
+        raise ValueError('segments must be a positive integer')
+    return int(value)
 
-    # 获取用户的返回选项
-    return_option = request.form.get('return_option', 'video')  # 默认返回视频
 
-    # 处理返回字幕文件或视频文件
-    if return_option == 'subtitle':
-        # 返回字幕文件的 JSON 格式链接
-        return jsonify({
-            'message': '字幕文件处理完成',
-            'download_url': f'/download/{os.path.basename(subtitle_path)}'
-        })
-    else:
-        # 嵌入字幕并返回视频文件的 JSON 格式链接
-        output_video_path = PathConfig.get_output_path(f"{base}_with_subtitles.mp4")
-        embed_subtitles(video_path, subtitle_path, output_video_path)
+def submit_upload(ingest, options):
+    """
+    上传接收完毕后提交处理任务
+    :param ingest: 已写入 uploads/ 的 IngestFile
+    :param options: 处理选项（表单字段或查询参数）
+    """
+    # 可选的转录引擎（openai-whisper / faster-whisper）与模型名称，未指定时使用 ModelConfig 中的默认值
+    engine = options.get('engine') or None
+    model_name = options.get('model') or None
+    try:
+        get_engine(engine)
+        if model_name and not registry.is_available(model_name, engine):
+            return jsonify({'error': f'Unknown model "{model_name}"'}), 400
+    except EngineUnavailable as e:
+        return jsonify({'error': str(e)}), 400
+
+    # 翻译后端（marian / stub 等），仅在指定了 translate 目标语言时使用
+    translator = options.get('translator') or None
+    if translator and translator not in TRANSLATORS:
+        return jsonify({'error': f'Unknown translator "{translator}". Available: {", ".join(TRANSLATORS)}'}), 400
+
+    # 单次转录中额外产出的结果：language / translation / words（逗号分隔）
+    try:
+        outputs = parse_outputs(options.get('outputs'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    target_language = options.get('target_language') or options.get('translate') or None
+    if options.get('translate') and target_language != options.get('translate'):
+        return jsonify({'error': 'target_language must match translate when both are given'}), 400
+    if OUTPUT_TRANSLATION in outputs and not target_language:
+        return jsonify({'error': 'target_language is required for the translation output'}), 400
+    if target_language and not is_language_code(target_language):
+        return jsonify({'error': 'target_language must be a language code such as "en" or "zh-CN"'}), 400
+
+    # 分段并行烧录的段数，为空时使用 EncodeConfig.BURN_SEGMENTS
+    try:
+        burn_segments = parse_segments(options.get('burn_segments'))
+    except ValueError:
+        return jsonify({'error': 'burn_segments must be a positive integer'}), 400
 
-        return jsonify({
-            'message': '视频处理完成',
-            'download_url': f'/download/{os.path.basename(output_video_path)}'
+    # cprofile=1 时对整个任务开启 cProfile，需要服务端允许（ALLOW_PROFILING=1）
+    cprofile = options.get('cprofile') in ('1', 'true')
+    if cprofile and not MetricsConfig.ALLOW_PROFILING:
+        return jsonify({'error': 'Profiling is disabled on this server'}), 400
+
+    # 编码档位（fast / balanced / quality / soft）以及可选的 preset、crf、threads、tune 覆盖
+    try:
+        profile = resolve_encode_profile(options.get('profile'), {
+            key: options.get(key) for key in ('preset', 'crf', 'threads', 'tune')
         })
+    except InvalidEncodeProfile as e:
+        return jsonify({'error': str(e)}), 400
+
+    # 文件内容哈希作为结果缓存的 key；容器支持管道读取时音频已在上传过程中解码完成
+    content_hash, size, early_audio = ingest.finish()
+    upload_timing = record_stage('upload_save', ingest.save_seconds, bytes=size)
+    video_path = ingest.path
+    register_prefetched_audio(video_path, early_audio)
+
+    # 从唯一文件名提取稳定的 base 名称（去掉扩展名）
+    base = os.path.splitext(os.path.basename(video_path))[0]
+
+    params = {
+        'video_path': video_path,
+        # 工作进程通过 storage 按文件名读取上传的视频，可以运行在其他节点上
+        'video_filename': os.path.basename(video_path),
+        'base': base,
+        'content_hash': content_hash,
+        'translate': options.get('translate'),
+        'translator': translator,
+        'outputs': outputs,
+        'target_language': target_language,
+        # 音频的源语言，为空时由 Whisper 自动检测
+        'language': options.get('language') or None,
+        'model': model_name,
+        'engine': engine,
+        # chunked=1 时在静音处切分音频并行转录，适合长视频
+        'chunked': options.get('chunked') in ('1', 'true'),
+        # 音频提取方式（stream / wav）以及 stream 模式下是否保留 wav 文件
+        'audio_mode': options.get('audio_mode'),
+        'keep_audio': options['keep_audio'] in ('1', 'true') if 'keep_audio' in options else None,
+        'return_option': options.get('return_option', 'video'),  # 默认返回视频
+        'encode_profile': profile,
+        'burn_segments': burn_segments,
+        'cprofile': cprofile,
+        # 上传阶段在请求线程中完成，记录随任务一起写入耗时日志
+        'upload_timings': [upload_timing],
+    }
+
+    # 相同内容、相同参数处理过的结果直接返回，不再运行 ffmpeg 和 Whisper
+    hits = lookup_cache(params)
+    result = cached_result(params, hits)
+    if result is not None:
+        discard_prefetched_audio(video_path)
+        job = job_store.create(params, result=result)
+        return jsonify(dict(job_to_response(job), status_url=f"/jobs/{job['id']}",
+                            events_url=f"/jobs/{job['id']}/events"))
+    params['cached_subtitle'] = hits['subtitle']
+    if hits['subtitle']:
+        # 字幕命中缓存，任务只需要烧录，提前解码的音频不会被用到
+        discard_prefetched_audio(video_path)
+
+    # 音频提取、字幕生成和烧录交给后台任务执行，请求立即返回任务 id
+    job = job_queue.submit(params, queue=QUEUE_TRANSCRIBE)
+    job_queue.start()
+
+    return jsonify({
+        'message': '任务已提交',
+        'job_id': job['id'],
+        'status_url': f"/jobs/{job['id']}",
+        # SSE 事件流：阶段进度以及边转录边产出的字幕条目
+        'events_url': f"/jobs/{job['id']}/events",
+        # 转录过程中字幕会逐条追加到该文件，编辑器可以在任务完成前打开
+        'subtitle_filename': f"{base}.srt",
+    }), 202
+
+
+@app.errorhandler(UploadTooLarge)
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({'error': f'File too large, limit is {UploadConfig.MAX_UPLOAD_BYTES} bytes'}), 413
+
+
+@app.teardown_request
+def discard_rejected_uploads(exc):
+    """请求失败或上传被拒绝时，删除已经写入 uploads/ 的部分文件"""
+    for ingest in getattr(request, 'ingest_files', []):
+        if not ingest.accepted:
+            ingest.discard()
+
+
+def job_to_response(job):
+    """将任务字典转换为对外的 JSON 结构，不暴露服务器上的文件路径"""
+    result = job['result'] or {}
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        # 任务当前所在的队列（transcribe / burn）
+        'queue': job['queue'],
+        'stage': job['stage'],
+        'progress': job['progress'],
+        'message': result.get('message'),
+        'download_url': result.get('download_url'),
+        'subtitle_url': result.get('subtitle_url'),
+        'subtitle_filename': result.get('subtitle_filename'),
+        'profile': result.get('profile'),
+        'artifacts': result.get('artifacts'),
+        # 各阶段的 wall / CPU 时间与峰值内存
+        'timings': result.get('timings'),
+        'profile_url': f"/jobs/{job['id']}/profile" if result.get('cprofile') else None,
+        'error': job['error'],
+    }
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询任务的阶段、进度以及结果下载地址"""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_to_response(job))
+
+
+def sse_message(event, data, event_id=None):
+    """按 text/event-stream 格式编码一条事件"""
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, ensure_ascii=False)}']
+    return '\n'.join(lines) + '\n\n'
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_event_stream(job_id):
+    """
+    以 Server-Sent Events 推送任务进度：
+    - status：连接建立时的任务快照，以及任务结束时的最终结果
+    - progress：{"stage", "progress"}，阶段切换或整数百分比变化时推送
+    - cue：{"index", "start_time", "end_time", "text"}，每转录出一条字幕推送一次
+    断线重连时浏览器会带上 Last-Event-ID，从断点继续推送
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or '0'
+    last_id = int(last_id) if last_id.isdigit() else 0
+
+    def stream():
+        yield 'retry: 3000\n\n'
+        yield sse_message('status', job_to_response(job))
+        # 已结束且没有事件记录（例如命中缓存或服务重启过）的任务只推送快照
+        if job['status'] in (STATUS_SUCCEEDED, STATUS_FAILED) and not job_events.has(job_id):
+            return
+        for item in job_events.subscribe(job_id, last_id):
+            if item is None:
+                # 心跳；事件记录被清理或任务在其他进程中结束时，以任务库中的状态为准
+                current = job_store.get(job_id)
+                elsewhere = not job_events.has(job_id) or current['worker'] != job_queue.worker_id
+                if current['status'] in (STATUS_SUCCEEDED, STATUS_FAILED) and elsewhere:
+                    yield sse_message('status', job_to_response(current))
+                    return
+                if current['status'] == STATUS_RUNNING and elsewhere:
+                    # 任务（或其后续阶段）由其他进程执行（多进程部署或独立的工作进程），按任务库中的进度推送，没有 cue 事件
+                    yield sse_message('progress', {'stage': current['stage'], 'progress': current['progress']})
+                    continue
+                yield ': keepalive\n\n'
+                continue
+            event_id, event, data = item
+            yield sse_message(event, data, event_id)
+            if event in TERMINAL_EVENTS:
+                yield sse_message('status', job_to_response(job_store.get(job_id)))
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/jobs/<job_id>/profile', methods=['GET'])
+def get_job_profile(job_id):
+    """下载任务的 cProfile 结果（.prof，可用 pstats / snakeviz 查看）"""
+    job = job_store.get(job_id)
+    if job is None or not (job['result'] or {}).get('cprofile'):
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_from_directory(MetricsConfig.PROFILE_DIR, job['result']['cprofile'], as_attachment=True)
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """任务完成后跳转到结果文件的下载地址"""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == STATUS_FAILED:
+        return jsonify(job_to_response(job)), 500
+    if job['status'] != STATUS_SUCCEEDED:
+        return jsonify(job_to_response(job)), 409
+    return redirect(job['result']['download_url'])
 
 
 @app.route('/burn', methods=['POST'])
@@ -126,68 +435,178 @@ def burn_subtitles():
     if not os.path.exists(subtitle_path):
         return jsonify({'error': f'Subtitle file "{filename}.srt" not found'}), 404
 
+    # 编码档位（fast / balanced / quality / soft）以及可选的 preset、crf、threads、tune 覆盖
+    try:
+        profile = resolve_encode_profile(data.get('profile'), data)
+    except InvalidEncodeProfile as e:
+        return jsonify({'error': str(e)}), 400
+
+    # 分段并行烧录的段数（正整数），为空时使用 EncodeConfig.BURN_SEGMENTS
+    try:
+        segments = parse_segments(data.get('segments'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     # 输出带字幕的视频路径
     output_video_path = PathConfig.get_output_path(f"{filename}_with_subtitles.mp4")
 
+    # 同步烧录同样占用节点的重任务槽位，槽位已满时直接拒绝
+    slot = heavy_slots.try_acquire()
+    if slot is None:
+        retry_after = retry_after_seconds(metrics.mean('pipeline_stage_seconds', {'stage': 'burn'}), 1,
+                                          heavy_slots.count)
+        return too_busy_response(retry_after, 'all heavy job slots are in use')
+
     try:
-        # 嵌入字幕
-        embed_subtitles(video_path, subtitle_path, output_video_path)
+        with slot:
+            # 嵌入字幕
+            if not embed_subtitles_parallel(video_path, subtitle_path, output_video_path, profile, segments):
+                return jsonify({'error': 'Failed to burn subtitles'}), 500
     except Exception as e:
         return jsonify({'error': f'Failed to burn subtitles: {str(e)}'}), 500
 
     # 返回下载地址
     return jsonify({
         'message': '字幕烧录完成',
-        'download_url': f'/download/{os.path.basename(output_video_path)}'
+        'download_url': f'/download/{os.path.basename(output_video_path)}',
+        'profile': profile
     })
 
 @app.route('/download/<filename>', methods=['GET'])
 def download_file(filename):
     # 根据文件扩展名判断是否是字幕文件
-    if filename.endswith('.srt'):
+    if filename.lower().endswith(tuple(f'.{fmt}' for fmt in SUPPORTED_FORMATS)):
         directory = PathConfig.SUBTITLE_DIR
     else:
         directory = PathConfig.OUTPUT_DIR
 
-    return send_from_directory(directory, filename)
+    # 支持 Range / 条件请求，大文件通过 sendfile 零拷贝发送，播放器可以拖动、断点续传不必从头开始
+    response = send_file_range(directory, filename)
+    if response is None:
+        return jsonify({'error': 'File not found'}), 404
+    return response
 
 @app.route('/subtitles', methods=['GET'])
 def list_subtitles():
-    """获取可用的字幕文件列表"""
+    """
+    获取可用的字幕文件列表，目录内容不变时直接使用缓存的索引
+    details=1 时同时返回每个文件的字幕条数、时长与大小
+    """
     try:
-        subtitle_dir = PathConfig.SUBTITLE_DIR
-        if not os.path.exists(subtitle_dir):
-            return jsonify({'files': []})
-        
-        files = []
-        for filename in os.listdir(subtitle_dir):
-            if filename.endswith('.srt'):
-                files.append(filename)
-        
-        return jsonify({'files': files})
+        data = {'files': subtitle_index.files()}
+        if request.args.get('details', '0').lower() in ('1', 'true', 'yes'):
+            data['details'] = subtitle_index.details()
+        return gzip_response(jsonify(data))
     except Exception as e:
         return jsonify({'error': f'获取字幕文件列表失败: {str(e)}'}), 500
 
+def parse_time_param(value):
+    """时间范围参数既可以是毫秒数，也可以是 HH:MM:SS,mmm 格式的时间"""
+    return int(value) if value.isdigit() else time_to_ms(value)
+
 @app.route('/subtitles/<filename>', methods=['GET'])
 def get_subtitles(filename):
-    """获取字幕内容用于编辑"""
+    """
+    获取字幕内容用于编辑，响应头中的 ETag 是后续 PATCH / PUT 的版本号
+    可选参数：start / end 只返回与该时间范围有重叠的字幕，offset / limit 对结果分页
+    """
     subtitle_path = PathConfig.get_subtitle_path(filename)
     
     if not os.path.exists(subtitle_path):
         return jsonify({'error': '字幕文件不存在'}), 404
     
-    editor = SubtitleEditor()
-    if not editor.parse_srt_file(subtitle_path):
+    try:
+        detect_format(filename)
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = parse_time_param(start) if start else None
+        end = parse_time_param(end) if end else None
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = request.args.get('limit')
+        limit = max(0, int(limit)) if limit else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # SRT / WebVTT / ASS 使用同一个流式解析路径，解析结果按路径 + mtime 缓存在内存中
+        track, etag = subtitle_store.load(subtitle_path)
+    except Exception as e:
+        logger.exception('解析字幕文件失败')
         return jsonify({'error': '解析字幕文件失败'}), 500
+
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    if start is None and end is None:
+        positions = range(len(track))
+    else:
+        positions = track.cues_in_range(start or 0, end if end is not None else track.duration() + 1)
+    page = positions[offset:offset + limit] if limit is not None else positions[offset:]
     
-    return jsonify({
-        'subtitles': editor.get_subtitles_data(),
-        'filename': filename
+    response = jsonify({
+        'subtitles': [track.to_dict(i) for i in page],
+        'filename': filename,
+        'version': etag,
+        'total': len(track),
+        'matched': len(positions),
+        'offset': offset,
+        'limit': limit,
+        # 仍在转录中：内容会继续增长，结束后整体替换，此时不能保存修改
+        'live': subtitle_store.is_live(subtitle_path)
     })
+    response.headers['ETag'] = etag
+    return gzip_response(response)
+
+def version_conflict_response(e):
+    response = jsonify({'error': '字幕已被其他人修改，请重新加载后再保存', 'version': e.current_etag})
+    response.headers['ETag'] = e.current_etag
+    return response, 412
+
+def track_busy_response():
+    return jsonify({'error': '字幕仍在生成中，请等待任务完成后再保存'}), 409
+
+@app.route('/subtitles/<filename>', methods=['PATCH'])
+def patch_subtitles(filename):
+    """
+    按字幕 id 增量修改字幕：{"operations": [{"op": "insert" | "update" | "delete", ...}, ...]}
+    只在内存中的轨道上应用改动并原子地写回文件；带 If-Match 时版本不一致返回 412
+    """
+    if not request.is_json:
+        return jsonify({'error': 'Invalid content type. Please use application/json'}), 400
+
+    operations = (request.get_json() or {}).get('operations')
+    if not isinstance(operations, list):
+        return jsonify({'error': 'operations must be a list'}), 400
+
+    subtitle_path = PathConfig.get_subtitle_path(filename)
+    if not os.path.exists(subtitle_path):
+        return jsonify({'error': '字幕文件不存在'}), 404
+
+    try:
+        etag, inserted, renumbered, count = subtitle_store.patch(subtitle_path, operations,
+                                                                request.headers.get('If-Match'))
+    except VersionConflict as e:
+        return version_conflict_response(e)
+    except TrackBusy:
+        return track_busy_response()
+    except InvalidOperation as e:
+        # operation 为出错的操作下标，编辑器据此丢弃该操作，其余操作可以重新提交
+        return jsonify({'error': f'字幕修改无效: {str(e)}', 'operation': e.index}), 400
+    except ValueError as e:
+        return jsonify({'error': f'字幕修改无效: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'更新字幕失败: {str(e)}'}), 500
+
+    # 写回后字幕按文件顺序重新编号，renumbered 给出 id 发生变化的字幕 {旧 id: 新 id}
+    response = jsonify({'message': '字幕更新成功', 'version': etag, 'inserted': inserted,
+                        'renumbered': {str(old): new for old, new in renumbered.items()}, 'count': count})
+    response.headers['ETag'] = etag
+    return response
 
 @app.route('/subtitles/<filename>', methods=['PUT'])
 def update_subtitles(filename):
-    """更新字幕内容"""
+    """整体替换字幕内容"""
     if not request.is_json:
         return jsonify({'error': 'Invalid content type. Please use application/json'}), 400
     
@@ -198,25 +617,94 @@ def update_subtitles(filename):
         return jsonify({'error': '字幕数据不能为空'}), 400
     
     subtitle_path = PathConfig.get_subtitle_path(filename)
+    fmt = os.path.splitext(filename)[1].lstrip('.').lower()
+    if fmt not in WRITERS:
+        return jsonify({'error': f'Cannot write subtitle format "{fmt}"'}), 400
     
     try:
-        editor = SubtitleEditor()
-        # 重建字幕列表
-        for subtitle_data in subtitles_data:
-            editor.add_subtitle(
-                subtitle_data['start_time'],
-                subtitle_data['end_time'],
-                subtitle_data['text']
-            )
-        
-        if not editor.save_to_srt(subtitle_path):
-            return jsonify({'error': '保存字幕文件失败'}), 500
-        
-        return jsonify({'message': '字幕更新成功'})
-        
+        # 直接构建数组存储的字幕轨道并一次写出，避免逐条 add_subtitle
+        track = SubtitleTrack.from_dicts(subtitles_data)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'字幕数据格式错误: {str(e)}'}), 400
+
+    try:
+        etag = subtitle_store.replace(subtitle_path, track, request.headers.get('If-Match'))
+    except VersionConflict as e:
+        return version_conflict_response(e)
+    except TrackBusy:
+        return track_busy_response()
     except Exception as e:
         return jsonify({'error': f'更新字幕失败: {str(e)}'}), 500
 
+    response = jsonify({'message': '字幕更新成功', 'version': etag})
+    response.headers['ETag'] = etag
+    return response
+
+@app.route('/subtitles/<filename>/export', methods=['POST'])
+def export_subtitles(filename):
+    """把字幕转换为另一种格式（srt / vtt / ass），写在同一目录下"""
+    data = request.get_json(silent=True) or {}
+    fmt = (data.get('format') or request.args.get('format') or '').lower()
+    if fmt not in WRITERS:
+        return jsonify({'error': f'Unsupported format "{fmt}". Available: {", ".join(WRITERS)}'}), 400
+
+    subtitle_path = PathConfig.get_subtitle_path(filename)
+    if not os.path.exists(subtitle_path):
+        return jsonify({'error': '字幕文件不存在'}), 404
+
+    output_filename = f"{os.path.splitext(filename)[0]}.{fmt}"
+    try:
+        track, _ = subtitle_store.load(subtitle_path)
+        subtitle_store.replace(PathConfig.get_subtitle_path(output_filename), track.copy())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'转换字幕失败: {str(e)}'}), 500
+
+    return jsonify({
+        'filename': output_filename,
+        'cues': len(track),
+        'download_url': f'/download/{output_filename}'
+    })
+
+@app.route('/subtitles/<filename>/translate', methods=['POST'])
+def translate_subtitles(filename):
+    """
+    把已有字幕翻译成目标语言：{"target_language": "en", "source_language": "zh", "translator": "marian"}
+    结果写入 <文件名>.<目标语言>.<扩展名>，起止时间保持不变
+    """
+    data = request.get_json(silent=True) or {}
+    target_language = data.get('target_language')
+    if not target_language:
+        return jsonify({'error': 'target_language is required'}), 400
+    # 目标语言会拼进输出文件名，必须是语言代码
+    if not is_language_code(target_language):
+        return jsonify({'error': 'target_language must be a language code such as "en" or "zh-CN"'}), 400
+
+    subtitle_path = PathConfig.get_subtitle_path(filename)
+    if not os.path.exists(subtitle_path):
+        return jsonify({'error': '字幕文件不存在'}), 404
+
+    stem, extension = os.path.splitext(filename)
+    output_filename = f"{stem}.{target_language}{extension}"
+    stats = {}
+    try:
+        track, _ = subtitle_store.load(subtitle_path)
+        cues = translate_cues(track.cues(), target_language, data.get('source_language'),
+                              translator=get_translator(data.get('translator')), stats=stats)
+        subtitle_store.replace(PathConfig.get_subtitle_path(output_filename), SubtitleTrack.from_cues(cues))
+    except TranslationUnavailable as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'翻译字幕失败: {str(e)}'}), 500
+
+    return jsonify({
+        'filename': output_filename,
+        'cues': len(cues),
+        'stats': stats,
+        'download_url': f'/download/{output_filename}'
+    })
+
 @app.route('/subtitles/validate', methods=['POST'])
 def validate_subtitle_time():
     """验证时间格式"""
@@ -237,6 +725,35 @@ def validate_subtitle_time():
         'time': time_str
     })
 
+@app.route('/models', methods=['GET'])
+def model_stats():
+    """查看可用的转录引擎、常驻模型、加载耗时以及命中/未命中计数"""
+    stats = registry.stats()
+    stats['engines'] = {name: engine.is_installed() for name, engine in ENGINES.items()}
+    stats['default_engine'] = ModelConfig.DEFAULT_ENGINE
+    return jsonify(stats)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus 文本格式的指标：各阶段耗时 / CPU / 峰值内存、任务队列深度以及各缓存的命中率"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/retention', methods=['GET'])
+def retention_status():
+    """各目录的保留策略、当前占用以及最近一次清理释放的空间"""
+    return jsonify(retention.status())
+
+@app.route('/retention/sweep', methods=['POST'])
+def retention_sweep():
+    """立即按策略清理一次，dry_run=1 时只报告将会删除的文件数与字节数"""
+    dry_run = request.args.get('dry_run', '0').lower() in ('1', 'true', 'yes')
+    return jsonify(retention.sweep(force=True, dry_run=dry_run))
+
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    """查看结果缓存的命中/未命中计数与占用空间"""
+    return jsonify(cache.stats())
+
 @app.route('/')
 def index():
     return send_from_directory('static', 'index.html')
@@ -245,5 +762,17 @@ def index():
 def editor():
     return send_from_directory('static', 'editor.html')
 
+def start_background_services():
+    """启动任务工作线程与磁盘清理线程，并在后台线程中预热模型，服务可以立即开始接收请求"""
+    job_queue.start()
+    if RetentionConfig.ENABLED:
+        retention.start()
+    # 只接收上传、不执行任务的 API 节点（JOB_WORKERS=0）不需要加载模型
+    if ModelConfig.WARMUP_ON_START and job_queue.max_workers:
+        threading.Thread(target=registry.warm_up, name='model-warmup', daemon=True).start()
+
 if __name__ == '__main__':
+    # debug 模式下 reloader 父进程不处理请求，只在真正的服务子进程中启动后台服务
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
     app.run(debug=True, host='0.0.0.0', port=8080)
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""
+对比单次 model.transcribe 与分块并行转录在合成长音频上的耗时
+
+用法：python -m benchmarks.bench_chunked_transcription --duration 1200 --model tiny --workers 4 --chunk-seconds 120
+"""
+import argparse
+import json
+import time
+
+from benchmarks.fixtures import make_speechlike_audio
+from src.chunked_transcription import transcribe_chunked, find_silences, plan_chunks
+from src.model_registry import get_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=int, default=600, help='合成音频时长（秒）')
+    parser.add_argument('--model', default='tiny')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-seconds', type=float, default=120, help='期望的分块时长（秒）')
+    args = parser.parse_args()
+
+    audio_path = make_speechlike_audio(args.duration)
+    silences, total_duration = find_silences(audio_path)
+    chunks = plan_chunks(silences, total_duration, args.chunk_seconds, args.chunk_seconds * 2)
+
+    model = get_model(args.model, 'cpu')
+    start = time.perf_counter()
+    single_segments = model.transcribe(audio_path, fp16=False)['segments']
+    single_seconds = time.perf_counter() - start
+
+    # 先用一个很短的分块预热进程池，避免把子进程加载模型的时间计入对比
+    transcribe_chunked(make_speechlike_audio(10), model_name=args.model, workers=args.workers)
+    start = time.perf_counter()
+    chunked_segments = transcribe_chunked(audio_path, model_name=args.model, workers=args.workers,
+                                          target_seconds=args.chunk_seconds, max_seconds=args.chunk_seconds * 2)
+    chunked_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        'audio_seconds': total_duration,
+        'chunks': len(chunks),
+        'single': {'seconds': round(single_seconds, 2), 'segments': len(single_segments)},
+        'chunked': {'seconds': round(chunked_seconds, 2), 'segments': len(chunked_segments)},
+        'speedup': round(single_seconds / chunked_seconds, 2) if chunked_seconds else None,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+/download 的 Range 正确性检查与吞吐量对比
+- 正确性：用 Flask 测试客户端向 send_file_range 发送各种 Range / 条件请求，响应体逐字节与文件切片比对
+- 吞吐量：在本地启动 HTTP 服务，对比原来的 send_from_directory 与 send_file_range 的整文件下载速度以及随机 Range 请求速率
+  --server gunicorn 时在 gunicorn（gthread）下运行，send_file_range 的响应通过 sendfile 零拷贝发送；
+  默认使用 werkzeug 的多线程服务器（没有 wsgi.file_wrapper，两条路径都是逐块读取）
+
+用法：python -m benchmarks.bench_download --size-mb 256 --ranges 200
+      python -m benchmarks.bench_download --server gunicorn --size-mb 1024
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from flask import Flask, jsonify, send_from_directory
+
+from benchmarks.fixtures import make_binary_file
+from src.http_utils import send_file_range
+
+DIR_ENV = 'BENCH_DOWNLOAD_DIR'
+
+
+def create_app(directory=None):
+    """baseline 为改动前的 send_from_directory，ranged 为 send_file_range"""
+    directory = directory or os.environ[DIR_ENV]
+    app = Flask(__name__)
+
+    @app.route('/baseline/<filename>')
+    def baseline(filename):
+        return send_from_directory(directory, filename)
+
+    @app.route('/ranged/<filename>')
+    def ranged(filename):
+        return send_file_range(directory, filename) or (jsonify({'error': 'File not found'}), 404)
+
+    return app
+
+
+def check_ranges(path):
+    """返回 [(用例, 是否通过, 说明)]"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    size = len(content)
+    filename = os.path.basename(path)
+    client = create_app(os.path.dirname(path)).test_client()
+    url = f'/ranged/{filename}'
+    etag = client.head(url).headers['ETag']
+
+    cases = [
+        ('first byte', {'Range': 'bytes=0-0'}, 206, (0, 1)),
+        ('first KB', {'Range': 'bytes=0-1023'}, 206, (0, 1024)),
+        ('middle', {'Range': f'bytes={size // 3}-{size // 3 + 65535}'}, 206, (size // 3, size // 3 + 65536)),
+        ('open ended', {'Range': f'bytes={size - 100}-'}, 206, (size - 100, size)),
+        ('suffix', {'Range': 'bytes=-500'}, 206, (size - 500, size)),
+        ('end past size', {'Range': f'bytes=1000-{size + 1000}'}, 206, (1000, size)),
+        ('start past size', {'Range': f'bytes={size}-'}, 416, None),
+        ('multiple ranges', {'Range': 'bytes=0-1,5-9'}, 200, (0, size)),
+        ('unknown unit', {'Range': 'items=0-1'}, 200, (0, size)),
+        ('malformed', {'Range': 'bytes=abc'}, 200, (0, size)),
+        ('if-range match', {'Range': 'bytes=10-19', 'If-Range': etag}, 206, (10, 20)),
+        ('if-range stale', {'Range': 'bytes=10-19', 'If-Range': '"stale"'}, 200, (0, size)),
+        ('if-none-match', {'If-None-Match': etag}, 304, None),
+        ('full', {}, 200, (0, size)),
+    ]
+
+    results = []
+    for name, headers, status, span in cases:
+        response = client.get(url, headers=headers)
+        problems = []
+        if response.status_code != status:
+            problems.append(f'status {response.status_code} != {status}')
+        if span is not None:
+            start, stop = span
+            if response.data != content[start:stop]:
+                problems.append(f'body mismatch ({len(response.data)} bytes)')
+            if int(response.headers.get('Content-Length', -1)) != stop - start:
+                problems.append('Content-Length mismatch')
+            if status == 206 and response.headers.get('Content-Range') != f'bytes {start}-{stop - 1}/{size}':
+                problems.append(f"Content-Range {response.headers.get('Content-Range')}")
+        if status == 416 and response.headers.get('Content-Range') != f'bytes */{size}':
+            problems.append('missing Content-Range on 416')
+        results.append((name, not problems, '; '.join(problems)))
+
+    head = client.head(url, headers={'Range': 'bytes=0-99'})
+    ok = head.status_code == 206 and head.headers.get('Content-Length') == '100' and not head.data
+    results.append(('head', ok, '' if ok else f'status {head.status_code}'))
+    return results
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server did not start on port {port}')
+
+
+def start_server(server, directory):
+    """启动服务并返回 (端口, 停止函数)"""
+    port = _free_port()
+    if server == 'gunicorn':
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-k', 'gthread', '--threads', '4', '-b', f'127.0.0.1:{port}',
+             'benchmarks.bench_download:create_app()'],
+            env=dict(os.environ, **{DIR_ENV: directory}), stderr=subprocess.DEVNULL)
+        _wait_for_port(port)
+        return port, lambda: (process.terminate(), process.wait())
+
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    httpd = make_server('127.0.0.1', port, create_app(directory), threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    _wait_for_port(port)
+    return port, httpd.shutdown
+
+
+def fetch(port, path, headers=None, chunk_size=1 << 20):
+    """发送 GET 并读完响应体，返回 (状态码, 字节数)"""
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    try:
+        conn.request('GET', path, headers=headers or {})
+        response = conn.getresponse()
+        received = 0
+        while True:
+            chunk = response.read(chunk_size)
+            if not chunk:
+                break
+            received += len(chunk)
+        return response.status, received
+    finally:
+        conn.close()
+
+
+def measure_route(port, route, filename, size, ranges, range_bytes, repeat, seed=0):
+    full_seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        status, received = fetch(port, f'/{route}/{filename}')
+        full_seconds.append(time.perf_counter() - start)
+        assert status == 200 and received == size, (route, status, received)
+    best = min(full_seconds)
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(ranges):
+        offset = rng.randrange(0, max(1, size - range_bytes))
+        status, received = fetch(port, f'/{route}/{filename}',
+                                 {'Range': f'bytes={offset}-{offset + range_bytes - 1}'})
+        assert status == 206 and received == range_bytes, (route, status, received)
+    range_seconds = time.perf_counter() - start
+
+    return {
+        'full_seconds': round(best, 3),
+        'full_mb_per_second': round(size / (1 << 20) / best, 1),
+        'ranges_per_second': round(ranges / range_seconds, 1) if ranges else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=256, help='测试文件大小（MB）')
+    parser.add_argument('--ranges', type=int, default=200, help='随机 Range 请求次数')
+    parser.add_argument('--range-kb', type=int, default=1024, help='每个 Range 请求的大小（KB）')
+    parser.add_argument('--repeat', type=int, default=3, help='整文件下载重复次数，取最快的一次')
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug')
+    args = parser.parse_args()
+
+    path = make_binary_file(args.size_mb)
+    size = os.path.getsize(path)
+    checks = check_ranges(path)
+    failed = [name for name, ok, _ in checks if not ok]
+
+    port, stop = start_server(args.server, os.path.dirname(path))
+    try:
+        throughput = {route: measure_route(port, route, os.path.basename(path), size, args.ranges,
+                                           args.range_kb * 1024, args.repeat)
+                      for route in ('baseline', 'ranged')}
+    finally:
+        stop()
+
+    print(json.dumps({
+        'server': args.server,
+        'file_mb': args.size_mb,
+        'range_checks': {name: 'ok' if ok else detail for name, ok, detail in checks},
+        'throughput': throughput,
+    }, indent=2))
+    if failed:
+        sys.exit(f'Range checks failed: {", ".join(failed)}')
+
+
+if __name__ == '__main__':
+    main()
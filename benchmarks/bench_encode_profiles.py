@@ -0,0 +1,50 @@
+"""
+测量各编码档位在生成的测试视频上的烧录速度（fps）
+
+用法：python -m benchmarks.bench_encode_profiles --duration 30 --size 1280x720 --profiles fast balanced soft
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import make_test_video, make_srt, probe_video
+from config.encode import EncodeConfig
+from src.encode_profiles import resolve_encode_profile
+from src.video_processing import embed_subtitles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=int, default=30)
+    parser.add_argument('--size', default='1280x720')
+    parser.add_argument('--profiles', nargs='+', default=list(EncodeConfig.PROFILES))
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    video_path = make_test_video(args.duration, args.size)
+    subtitle_path = make_srt(args.duration)
+    _, frames = probe_video(video_path)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in args.profiles:
+            profile = resolve_encode_profile(name, {'threads': args.threads})
+            output_path = os.path.join(tmp_dir, f'{name}.mp4')
+            start = time.perf_counter()
+            ok = embed_subtitles(video_path, subtitle_path, output_path, profile)
+            elapsed = time.perf_counter() - start
+            results.append({
+                'profile': profile,
+                'ok': ok,
+                'seconds': round(elapsed, 2),
+                'fps': round(frames / elapsed, 1),
+                'output_bytes': os.path.getsize(output_path) if ok else None,
+            })
+
+    print(json.dumps({'video': video_path, 'frames': frames, 'results': results}, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+对比各转录引擎 / 模型在同一段本地样本上的实时率（RTF = 转录耗时 / 音频时长，越小越快）与峰值内存
+每个 引擎:模型 组合在独立的子进程中运行，峰值 RSS 互不影响；未安装的引擎会被跳过
+
+用法：python -m benchmarks.bench_engines --engines openai-whisper:tiny,faster-whisper:tiny --duration 60
+      python -m benchmarks.bench_engines --sample path/to/speech.wav --repeat 3
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.fixtures import make_speechlike_audio
+
+
+def peak_rss_mb():
+    """当前进程的峰值 RSS（Linux 上 ru_maxrss 的单位为 KB）"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_worker(engine, model_name, sample, repeat, language):
+    """子进程内执行：加载模型、解码音频一次，然后重复转录并取最快的一次"""
+    from src.model_registry import get_model
+    from src.transcription import load_audio
+
+    audio = load_audio(sample)
+    audio_seconds = len(audio) / 16000
+
+    start = time.perf_counter()
+    model = get_model(model_name, 'cpu', engine)
+    load_seconds = time.perf_counter() - start
+    after_load_mb = peak_rss_mb()
+
+    timings = []
+    segments = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        segments = model.transcribe(audio, language=language)['segments']
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+
+    return {
+        'engine': engine,
+        'model': model_name,
+        'audio_seconds': round(audio_seconds, 2),
+        'load_seconds': round(load_seconds, 2),
+        'transcribe_seconds': round(best, 2),
+        'rtf': round(best / audio_seconds, 4) if audio_seconds else None,
+        'segments': len(segments),
+        'peak_rss_mb_after_load': after_load_mb,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_isolated(engine, model_name, sample, repeat, language):
+    """在新的解释器中运行一个组合，返回其 JSON 结果；失败时返回错误信息"""
+    cmd = [sys.executable, '-m', 'benchmarks.bench_engines', '--worker', f'{engine}:{model_name}',
+           '--sample', sample, '--repeat', str(repeat)]
+    if language:
+        cmd += ['--language', language]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {'engine': engine, 'model': model_name, 'error': result.stderr.strip().splitlines()[-1:]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def parse_pairs(value):
+    pairs = []
+    for item in value.split(','):
+        engine, _, model_name = item.strip().partition(':')
+        pairs.append((engine, model_name or 'tiny'))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engines', default='openai-whisper:tiny,faster-whisper:tiny',
+                        help='逗号分隔的 引擎:模型 列表')
+    parser.add_argument('--duration', type=int, default=60, help='未指定 --sample 时合成音频的时长（秒）')
+    parser.add_argument('--sample', default=None, help='固定的本地样本文件，默认使用合成音频')
+    parser.add_argument('--repeat', type=int, default=1, help='每个组合重复转录的次数，取最快的一次')
+    parser.add_argument('--language', default='en', help='固定语言，避免把语言检测计入转录耗时')
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        engine, model_name = parse_pairs(args.worker)[0]
+        print(json.dumps(run_worker(engine, model_name, args.sample, args.repeat, args.language)))
+        return
+
+    from src.engines import ENGINES
+
+    sample = args.sample or make_speechlike_audio(args.duration)
+    results = []
+    for engine, model_name in parse_pairs(args.engines):
+        if engine not in ENGINES or not ENGINES[engine].is_installed():
+            results.append({'engine': engine, 'model': model_name, 'skipped': 'not installed'})
+            continue
+        results.append(run_isolated(engine, model_name, sample, args.repeat, args.language))
+
+    print(json.dumps({'sample': sample, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
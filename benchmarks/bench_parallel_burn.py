@@ -0,0 +1,87 @@
+"""
+对比串行烧录与分段并行烧录的耗时，并校验两者输出一致：
+- 时长相差不超过一帧
+- 逐帧 PSNR 不低于阈值（字幕时间轴错位时，出现/消失字幕的帧 PSNR 会明显下降）
+校验失败时以非零状态码退出
+
+用法：python -m benchmarks.bench_parallel_burn --duration 240 --segments 4 --profile fast
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import make_test_video, make_srt, probe_video
+from src.encode_profiles import resolve_encode_profile
+from src.parallel_burn import embed_subtitles_parallel
+from src.video_processing import embed_subtitles
+
+
+def frame_psnr(reference_path, distorted_path, stats_path):
+    """逐帧计算 PSNR，返回 (最小值, 平均值)；完全相同的帧记为 inf"""
+    subprocess.run([
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-i', distorted_path, '-i', reference_path,
+        '-lavfi', f'[0:v][1:v]psnr=stats_file={stats_path}', '-f', 'null', '-'
+    ], check=True)
+    values = []
+    with open(stats_path) as f:
+        for line in f:
+            match = re.search(r'psnr_avg:(\S+)', line)
+            if match:
+                values.append(float(match.group(1)))
+    return min(values), sum(values) / len(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=int, default=240)
+    parser.add_argument('--size', default='1280x720')
+    parser.add_argument('--segments', type=int, default=4)
+    parser.add_argument('--profile', default='fast')
+    parser.add_argument('--min-psnr', type=float, default=25.0)
+    args = parser.parse_args()
+
+    rate = 25
+    video_path = make_test_video(args.duration, args.size, rate)
+    subtitle_path = make_srt(args.duration)
+    profile = resolve_encode_profile(args.profile)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        serial_path = os.path.join(tmp_dir, 'serial.mp4')
+        parallel_path = os.path.join(tmp_dir, 'parallel.mp4')
+
+        start = time.perf_counter()
+        assert embed_subtitles(video_path, subtitle_path, serial_path, profile)
+        serial_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assert embed_subtitles_parallel(video_path, subtitle_path, parallel_path, profile, args.segments)
+        parallel_seconds = time.perf_counter() - start
+
+        serial_duration, serial_frames = probe_video(serial_path)
+        parallel_duration, parallel_frames = probe_video(parallel_path)
+        min_psnr, avg_psnr = frame_psnr(serial_path, parallel_path, os.path.join(tmp_dir, 'psnr.log'))
+
+    checks = {
+        'duration_matches': abs(serial_duration - parallel_duration) <= 1.0 / rate,
+        'frame_count_matches': serial_frames == parallel_frames,
+        'subtitle_timing_matches': min_psnr >= args.min_psnr,
+    }
+    print(json.dumps({
+        'serial': {'seconds': round(serial_seconds, 2), 'duration': serial_duration, 'frames': serial_frames},
+        'parallel': {'seconds': round(parallel_seconds, 2), 'duration': parallel_duration,
+                     'frames': parallel_frames, 'segments': args.segments},
+        'speedup': round(serial_seconds / parallel_seconds, 2),
+        'psnr': {'min': min_psnr, 'avg': round(avg_psnr, 2)},
+        'checks': checks,
+    }, indent=2))
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+"""
+端到端基准套件：用确定性的合成素材测量处理流水线各阶段以及完整 /upload 流程的耗时，输出 JSON 便于在版本之间对比
+- extract_wav：extract_audio_from_video（旧版 44 kHz 双声道 wav）
+- extract_stream：extract_audio_array（16 kHz 单声道 float32 读入内存）
+- model_load / transcribe：加载模型与 generate_subtitles（默认 tiny 模型）
+- burn：embed_subtitles
+- editor_parse / editor_save：SubtitleEditor 解析与保存大字幕文件（--cues 条）
+- upload：通过 Flask 测试客户端上传视频，轮询 /jobs/<job_id> 直到任务完成（音频提取 + 转录 + 烧录）
+每个阶段重复 --repeat 次，记录最快与中位数耗时；某个阶段出错时记录错误并继续，结束时以非零状态退出
+/upload 流程在临时目录中运行（上传、输出与任务库都不写入项目目录），并关闭结果缓存
+
+用法：python -m benchmarks.bench_pipeline --duration 30 --model tiny --output results.json
+      python -m benchmarks.bench_pipeline --stages editor_parse,editor_save --cues 200000
+      python -m benchmarks.bench_pipeline --compare baseline.json --max-regression 1.2
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import make_srt, make_test_video
+from config.paths import PathConfig
+
+STAGES = ('extract_wav', 'extract_stream', 'model_load', 'transcribe', 'burn', 'editor_parse', 'editor_save',
+          'upload')
+# 需要合成视频（以及 ffmpeg）的阶段
+MEDIA_STAGES = ('extract_wav', 'extract_stream', 'transcribe', 'burn', 'upload')
+# 套件在临时目录中运行时覆盖的配置（必须在导入 src 与 app 之前设置）
+BENCH_ENV = {
+    'CACHE_ENABLED': '0',
+    'RETENTION_ENABLED': '0',
+    'WHISPER_WARMUP': '0',
+    'JOB_POLL_INTERVAL': '0.05',
+}
+
+
+def isolate(root):
+    """把上传、输出与服务状态目录指向 root，基准运行不会影响项目目录下的文件与任务库"""
+    for name in ('UPLOAD_DIR', 'OUTPUT_DIR', 'DATA_DIR'):
+        setattr(PathConfig, name, os.path.join(root, name.split('_')[0].lower()))
+    for name, sub in (('AUDIO_DIR', 'audio'), ('SUBTITLE_DIR', 'subtitles'), ('FRAMES_DIR', 'frames'),
+                      ('CACHE_DIR', 'cache')):
+        setattr(PathConfig, name, os.path.join(PathConfig.OUTPUT_DIR, sub))
+    PathConfig.ensure_dirs([PathConfig.UPLOAD_DIR, PathConfig.OUTPUT_DIR, PathConfig.DATA_DIR])
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+
+
+def environment():
+    """结果中记录的版本信息，对比时确认两份结果来自哪两个版本"""
+    def command_output(cmd):
+        try:
+            return subprocess.run(cmd, capture_output=True, text=True, check=True).stdout.splitlines()[0].strip()
+        except (OSError, subprocess.CalledProcessError, IndexError):
+            return None
+
+    return {
+        'git_commit': command_output(['git', 'rev-parse', '--short', 'HEAD']),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': command_output(['ffmpeg', '-version']),
+    }
+
+
+def measure(func, repeat):
+    """重复运行 func，返回 (各次耗时, 最后一次的返回值)"""
+    runs, value = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        runs.append(time.perf_counter() - start)
+    return runs, value
+
+
+def summarize(runs, **extra):
+    return dict(seconds=round(min(runs), 4), median_seconds=round(statistics.median(runs), 4),
+                runs=[round(run, 4) for run in runs], **extra)
+
+
+class Suite:
+    def __init__(self, args, work_dir):
+        self.args = args
+        self.work_dir = work_dir
+        self.video_path = None
+        self.srt_path = None
+        self.audio = None
+
+    def fixtures(self):
+        """生成（或复用）本次运行需要的素材，只运行编辑器阶段时不需要 ffmpeg"""
+        args = self.args
+        # 大字幕文件：每条 2 秒、间隔 0.5 秒，--cues 条
+        self.srt_path = make_srt(args.cues * 2.5)
+        fixtures = {'srt': os.path.basename(self.srt_path), 'srt_bytes': os.path.getsize(self.srt_path)}
+        if any(stage in MEDIA_STAGES for stage in args.stages):
+            try:
+                self.video_path = make_test_video(args.duration, args.size, audio=args.audio)
+            except (OSError, subprocess.CalledProcessError) as e:
+                # 没有 ffmpeg 时仍然运行编辑器阶段，媒体阶段记为错误
+                fixtures['video_error'] = f'{type(e).__name__}: {e}'
+            else:
+                fixtures.update(video=os.path.basename(self.video_path),
+                                video_bytes=os.path.getsize(self.video_path))
+        return fixtures
+
+    def extract_wav(self):
+        from src.video_processing import extract_audio_from_video
+
+        wav_path = os.path.join(self.work_dir, 'legacy.wav')
+        runs, _ = measure(lambda: extract_audio_from_video(self.video_path, wav_path), self.args.repeat)
+        return summarize(runs, bytes_written=os.path.getsize(wav_path),
+                         realtime_factor=round(self.args.duration / min(runs), 1))
+
+    def extract_stream(self):
+        from src.video_processing import extract_audio_array
+
+        runs, (self.audio, stats) = measure(lambda: extract_audio_array(self.video_path), self.args.repeat)
+        return summarize(runs, audio_seconds=stats['audio_seconds'],
+                         realtime_factor=round(self.args.duration / min(runs), 1))
+
+    def model_load(self):
+        from src.model_registry import registry
+
+        # 只测一次：之后注册表中已有常驻模型，再次获取不会重新加载
+        start = time.perf_counter()
+        registry.get(self.args.model, engine=self.args.engine)
+        return summarize([time.perf_counter() - start], model=self.args.model)
+
+    def transcribe(self):
+        from src.subtitle_io import read_cues
+        from src.video_processing import extract_audio_array, generate_subtitles
+
+        if self.audio is None:
+            self.audio, _ = extract_audio_array(self.video_path)
+        srt_path = os.path.join(self.work_dir, 'transcribed.srt')
+
+        def run():
+            if not generate_subtitles(self.audio, srt_path, model_name=self.args.model, engine=self.args.engine):
+                raise RuntimeError('generate_subtitles failed')
+
+        runs, _ = measure(run, self.args.repeat)
+        return summarize(runs, model=self.args.model, cues=sum(1 for _ in read_cues(srt_path)),
+                         realtime_factor=round(self.args.duration / min(runs), 1))
+
+    def burn(self):
+        from src.encode_profiles import resolve_encode_profile
+        from src.video_processing import embed_subtitles
+
+        profile = resolve_encode_profile(self.args.profile)
+        # 烧录用与视频等长的字幕，大字幕文件只用于编辑器
+        srt_path = make_srt(self.args.duration)
+        output_path = os.path.join(self.work_dir, 'burned.mp4')
+
+        def run():
+            if not embed_subtitles(self.video_path, srt_path, output_path, profile):
+                raise RuntimeError('embed_subtitles failed')
+
+        runs, _ = measure(run, self.args.repeat)
+        return summarize(runs, profile=profile['name'], realtime_factor=round(self.args.duration / min(runs), 1))
+
+    def editor_parse(self):
+        from src.subtitle_editor import SubtitleEditor
+
+        editor = SubtitleEditor()
+        runs, _ = measure(lambda: editor.parse_srt_file(self.srt_path), self.args.repeat)
+        count = len(editor.subtitles)
+        return summarize(runs, cues=count, cues_per_second=round(count / min(runs)))
+
+    def editor_save(self):
+        from src.subtitle_editor import SubtitleEditor
+
+        editor = SubtitleEditor()
+        editor.parse_srt_file(self.srt_path)
+        output_path = os.path.join(self.work_dir, 'saved.srt')
+        runs, _ = measure(lambda: editor.save_to_srt(output_path), self.args.repeat)
+        count = len(editor.subtitles)
+        return summarize(runs, cues=count, cues_per_second=round(count / min(runs)))
+
+    def upload(self):
+        from app import app
+
+        client = app.test_client()
+
+        def run():
+            with open(self.video_path, 'rb') as f:
+                response = client.post('/upload', data={
+                    'file': (f, os.path.basename(self.video_path)),
+                    'model': self.args.model,
+                    'engine': self.args.engine or '',
+                    'profile': self.args.profile,
+                }, content_type='multipart/form-data')
+            if response.status_code != 202:
+                raise RuntimeError(f'/upload returned {response.status_code}: {response.get_data(as_text=True)}')
+            status_url = response.get_json()['status_url']
+            deadline = time.monotonic() + self.args.timeout
+            while time.monotonic() < deadline:
+                job = client.get(status_url).get_json()
+                if job['status'] == 'succeeded':
+                    return job
+                if job['status'] == 'failed':
+                    raise RuntimeError(f"job failed: {job['error']}")
+                time.sleep(0.05)
+            raise RuntimeError(f'job did not finish within {self.args.timeout} seconds')
+
+        runs, job = measure(run, self.args.repeat)
+        # 任务内各阶段的耗时（upload_save / extract / transcribe / burn）
+        stage_seconds = {timing['stage']: timing.get('wall_seconds') for timing in job.get('timings') or []}
+        return summarize(runs, job_stages=stage_seconds, realtime_factor=round(self.args.duration / min(runs), 1))
+
+
+def compare(results, baseline, max_regression=None):
+    """
+    与之前保存的结果逐阶段对比，ratio 为本次与基线最快耗时之比（大于 1 表示变慢）
+    :return: (对比表, 超过 max_regression 的阶段列表)
+    """
+    table, regressions = {}, []
+    for stage, current in results['stages'].items():
+        previous = baseline.get('stages', {}).get(stage)
+        if not previous or 'seconds' not in current or 'seconds' not in previous or not previous['seconds']:
+            continue
+        ratio = current['seconds'] / previous['seconds']
+        table[stage] = {'baseline_seconds': previous['seconds'], 'seconds': current['seconds'],
+                        'ratio': round(ratio, 3)}
+        if max_regression and ratio > max_regression:
+            regressions.append(stage)
+    return table, regressions
+
+
+def parse_stages(value):
+    stages = [stage.strip() for stage in value.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f'Unknown stage "{",".join(unknown)}". Available: {", ".join(STAGES)}')
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stages', type=parse_stages, default=list(STAGES), help='逗号分隔的阶段，默认全部')
+    parser.add_argument('--duration', type=int, default=30, help='合成视频时长（秒）')
+    parser.add_argument('--size', default='640x360', help='合成视频分辨率')
+    parser.add_argument('--audio', default='noise', choices=('sine', 'noise'), help='合成视频的音轨')
+    parser.add_argument('--cues', type=int, default=50000, help='编辑器基准使用的字幕条数')
+    parser.add_argument('--model', default='tiny')
+    parser.add_argument('--engine', default=None)
+    parser.add_argument('--profile', default='fast', help='烧录使用的编码档位')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=600.0, help='/upload 任务的最长等待时间（秒）')
+    parser.add_argument('--output', help='把结果 JSON 同时写入该文件')
+    parser.add_argument('--compare', help='之前保存的结果 JSON，输出逐阶段的耗时对比')
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help='与 --compare 一起使用：任一阶段耗时超过基线的该倍数时以非零状态退出')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_pipeline_') as work_dir:
+        isolate(work_dir)
+        suite = Suite(args, work_dir)
+        results = {'environment': environment(), 'args': vars(args), 'fixtures': suite.fixtures(), 'stages': {}}
+        for stage in args.stages:
+            if stage in MEDIA_STAGES and suite.video_path is None:
+                results['stages'][stage] = {'error': f"video fixture unavailable: {results['fixtures']['video_error']}"}
+                continue
+            try:
+                results['stages'][stage] = getattr(suite, stage)()
+            except Exception as e:
+                results['stages'][stage] = {'error': f'{type(e).__name__}: {e}'}
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            results['comparison'], regressions = compare(results, json.load(f), args.max_regression)
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    print(output)
+    if regressions or any('error' in result for result in results['stages'].values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
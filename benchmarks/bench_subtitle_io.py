@@ -0,0 +1,120 @@
+"""
+字幕读写吞吐量（条/秒）：对比原有的整文件 re.split 解析 / timedelta 格式化与 src.subtitle_io 的流式解析 / 整数毫秒格式化，
+并测量 WebVTT、ASS 的读写速度；每种格式都会做一次往返校验，时间轴或文本不一致时以非零状态退出
+
+用法：python -m benchmarks.bench_subtitle_io --cues 100000
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from datetime import timedelta
+
+from benchmarks.fixtures import FIXTURE_DIR, make_srt
+from src.subtitle_editor import SubtitleEditor
+from src.subtitle_io import WRITERS, format_timestamp, read_cues, write_cues
+
+
+def legacy_parse(content):
+    """改动前 SubtitleEditor._parse_srt_content 的实现"""
+    subtitles = []
+    for block in re.split(r'\n\s*\n', content.strip()):
+        lines = block.strip().split('\n')
+        if len(lines) < 3:
+            continue
+        try:
+            index = int(lines[0].strip())
+            time_match = re.match(r'(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2},\d{3})', lines[1].strip())
+            if not time_match:
+                continue
+            subtitles.append((index, time_match.group(1), time_match.group(2), '\n'.join(lines[2:])))
+        except (ValueError, IndexError):
+            continue
+    return subtitles
+
+
+def legacy_time_to_seconds(time_str):
+    """改动前 SubtitleEditor.time_to_seconds 的实现"""
+    time_part, ms_part = time_str.split(',')
+    h, m, s = map(int, time_part.split(':'))
+    return h * 3600 + m * 60 + s + int(ms_part) / 1000
+
+
+def legacy_format_timestamp(seconds):
+    """改动前 video_processing.format_timestamp 的实现"""
+    td = timedelta(seconds=float(seconds))
+    hours = int(td.total_seconds() // 3600)
+    minutes = int((td.total_seconds() % 3600) // 60)
+    seconds = td.total_seconds() % 60
+    milliseconds = int((seconds % 1) * 1000)
+    return f"{hours:02d}:{minutes:02d}:{int(seconds):02d},{milliseconds:03d}"
+
+
+def rate(count, func):
+    """执行 func 并返回每秒处理的条数"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return round(count / elapsed) if elapsed else None
+
+
+def legacy_read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return legacy_parse(f.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cues', type=int, default=100000)
+    args = parser.parse_args()
+
+    srt_path = make_srt(duration=args.cues * 2.5, cue_seconds=2.0, gap_seconds=0.5)
+    cues = list(read_cues(srt_path))
+    count = len(cues)
+
+    report = {'cues': count, 'cues_per_second': {}, 'round_trip_ok': {}}
+    rates = report['cues_per_second']
+    rates['srt_read_legacy'] = rate(count, lambda: legacy_read(srt_path))
+    # 旧解析器只得到时间字符串，加上换算为数值时间轴的开销才与新解析器的输出对等
+    rates['srt_read_legacy_numeric'] = rate(count, lambda: [
+        (legacy_time_to_seconds(start), legacy_time_to_seconds(end), text)
+        for _, start, end, text in legacy_read(srt_path)
+    ])
+    rates['srt_read_stream'] = rate(count, lambda: list(read_cues(srt_path)))
+    rates['srt_read_editor'] = rate(count, lambda: SubtitleEditor().parse_srt_file(srt_path))
+    seconds = [start / 1000 for start, _, _ in cues]
+    rates['timestamp_legacy'] = rate(count, lambda: [legacy_format_timestamp(s) for s in seconds])
+    rates['timestamp_int_ms'] = rate(count, lambda: [format_timestamp(s) for s in seconds])
+
+    if len(legacy_read(srt_path)) != count:
+        report['round_trip_ok']['legacy_count'] = False
+
+    for fmt in WRITERS:
+        path = os.path.join(FIXTURE_DIR, f'bench_subtitle_io.{fmt}')
+        rates[f'{fmt}_write'] = rate(count, lambda: write_cues(cues, path))
+        rates[f'{fmt}_read'] = rate(count, lambda: list(read_cues(path)))
+        parsed = list(read_cues(path))
+        # ASS 的时间精度是百分之一秒
+        tolerance = 10 if fmt == 'ass' else 0
+        report['round_trip_ok'][fmt] = len(parsed) == count and all(
+            abs(a[0] - b[0]) <= tolerance and abs(a[1] - b[1]) <= tolerance and a[2] == b[2]
+            for a, b in zip(parsed, cues)
+        )
+        os.remove(path)
+
+    # CRLF 与 BOM
+    crlf_path = os.path.join(FIXTURE_DIR, 'bench_subtitle_io_crlf.srt')
+    with open(srt_path, 'r', encoding='utf-8') as src, open(crlf_path, 'w', encoding='utf-8-sig', newline='\r\n') as dst:
+        dst.write(src.read())
+    report['round_trip_ok']['srt_crlf_bom'] = list(read_cues(crlf_path)) == cues
+    os.remove(crlf_path)
+
+    print(json.dumps(report, indent=2))
+    if not all(report['round_trip_ok'].values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+在 10 万条字幕的文件上对比 SubtitleEditor（对象列表 + 字符串时间）与 SubtitleTrack（整数毫秒数组）：
+构建、按时间查找、整体平移、重叠/间隙检测以及内存占用
+
+用法：python -m benchmarks.bench_subtitle_track --cues 100000 --lookups 10000
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from benchmarks.fixtures import make_srt
+from src.subtitle_editor import SubtitleEditor
+from src.subtitle_io import time_to_ms
+from src.subtitle_track import SubtitleTrack
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def retained_memory(func):
+    """func 返回后仍被结果占用的内存（字节）"""
+    tracemalloc.start()
+    result = func()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def load_editor(path):
+    editor = SubtitleEditor()
+    editor.parse_srt_file(path)
+    return editor
+
+
+def editor_cue_at(editor, t):
+    """旧方式：线性扫描并逐条解析时间字符串"""
+    for i, subtitle in enumerate(editor.subtitles):
+        if time_to_ms(subtitle.start_time) <= t < time_to_ms(subtitle.end_time):
+            return i
+    return None
+
+
+def editor_shift(editor, delta):
+    for subtitle in editor.subtitles:
+        subtitle.start_time = editor.seconds_to_time(editor.time_to_seconds(subtitle.start_time) + delta / 1000)
+        subtitle.end_time = editor.seconds_to_time(editor.time_to_seconds(subtitle.end_time) + delta / 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cues', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--linear-lookups', type=int, default=100, help='线性扫描太慢，只抽样这么多次再按比例换算')
+    args = parser.parse_args()
+
+    cue_seconds, gap_seconds = 2.0, 0.5
+    srt_path = make_srt(int(args.cues * (cue_seconds + gap_seconds)), cue_seconds, gap_seconds)
+
+    editor = SubtitleEditor()
+    editor.parse_srt_file(srt_path)
+    data = editor.get_subtitles_data()
+
+    def rebuild_editor():
+        rebuilt = SubtitleEditor()
+        for item in data:
+            rebuilt.add_subtitle(item['start_time'], item['end_time'], item['text'])
+        return rebuilt
+
+    _, editor_build = timed(rebuild_editor)
+    track, track_build = timed(SubtitleTrack.from_dicts, data)
+    _, editor_memory = retained_memory(lambda: load_editor(srt_path))
+    _, track_memory = retained_memory(lambda: SubtitleTrack.from_editor(load_editor(srt_path)))
+
+    rng = random.Random(0)
+    duration = track.duration()
+    times = [rng.randrange(duration) for _ in range(args.lookups)]
+
+    _, linear_seconds = timed(lambda: [editor_cue_at(editor, t) for t in times[:args.linear_lookups]])
+    _, indexed_seconds = timed(lambda: [track.cue_at(t) for t in times])
+    _, editor_shift_seconds = timed(editor_shift, editor, 1500)
+    _, track_shift_seconds = timed(track.shift, 1500)
+    overlaps, overlap_seconds = timed(track.overlaps)
+    gaps, gap_seconds_taken = timed(track.gaps, 100)
+
+    print(json.dumps({
+        'cues': len(track),
+        'build_seconds': {'editor_add_subtitle': round(editor_build, 3), 'track': round(track_build, 3)},
+        'memory_bytes': {'editor': editor_memory, 'track': track_memory},
+        'lookup_us_per_query': {
+            'editor_linear': round(linear_seconds / args.linear_lookups * 1e6, 1),
+            'track_indexed': round(indexed_seconds / args.lookups * 1e6, 2),
+        },
+        'shift_seconds': {'editor': round(editor_shift_seconds, 3), 'track': round(track_shift_seconds, 3)},
+        'overlaps': {'found': len(overlaps), 'seconds': round(overlap_seconds, 3)},
+        'gaps': {'found': len(gaps), 'seconds': round(gap_seconds_taken, 3)},
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+字幕翻译阶段的吞吐量：用模拟请求耗时的 stub 后端对比逐条翻译、分批并发翻译以及缓存命中后的重新运行，
+并校验译文与原字幕一一对应、起止时间不变，不一致时以非零状态退出
+
+用法：python -m benchmarks.bench_translation --cues 2000 --latency 0.05
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from benchmarks.fixtures import FIXTURE_DIR, make_srt
+from src.subtitle_io import read_cues
+from src.translation import StubTranslator, TranslationCache, translate_cues
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, round(time.perf_counter() - start, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cues', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.05, help='stub 后端每个请求的模拟耗时（秒）')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--repeat-ratio', type=float, default=0.3, help='重复出现的字幕文本所占比例')
+    args = parser.parse_args()
+
+    srt_path = make_srt(duration=args.cues * 2.5, cue_seconds=2.0, gap_seconds=0.5)
+    cues = list(read_cues(srt_path))
+    # 字幕里常见的重复短句（"嗯"、"谢谢" 之类）
+    repeat_every = max(1, round(1 / args.repeat_ratio)) if args.repeat_ratio else 0
+    cues = [(start, end, '谢谢' if repeat_every and i % repeat_every == 0 else text)
+            for i, (start, end, text) in enumerate(cues)]
+
+    cache_path = os.path.join(FIXTURE_DIR, 'bench_translations.sqlite3')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(cache_path + suffix):
+            os.remove(cache_path + suffix)
+    cache = TranslationCache(cache_path)
+
+    # 逐条翻译：每条字幕一次请求，不去重、不缓存
+    one_by_one = StubTranslator(args.latency)
+    sample = cues[:min(len(cues), 200)]
+    _, sample_seconds = timed(lambda: [one_by_one.translate_batch([text], 'zh', 'en') for _, _, text in sample])
+    per_cue_seconds = round(sample_seconds / len(sample) * len(cues), 3)
+
+    batched = StubTranslator(args.latency)
+    stats = {}
+    translated, batched_seconds = timed(lambda: translate_cues(
+        cues, 'en', 'zh', translator=batched, cache=cache, concurrency=args.concurrency, stats=stats))
+
+    rerun = StubTranslator(args.latency)
+    rerun_stats = {}
+    _, rerun_seconds = timed(lambda: translate_cues(
+        cues, 'en', 'zh', translator=rerun, cache=cache, concurrency=args.concurrency, stats=rerun_stats))
+
+    timing_ok = len(translated) == len(cues) and all(
+        a[0] == b[0] and a[1] == b[1] and b[2] == f'[en] {a[2]}' for a, b in zip(cues, translated)
+    )
+    print(json.dumps({
+        'cues': len(cues),
+        'seconds': {
+            'one_request_per_cue_estimated': per_cue_seconds,
+            'batched_concurrent': batched_seconds,
+            'rerun_cached': rerun_seconds,
+        },
+        'requests': {'one_request_per_cue': len(cues), 'batched': batched.batches, 'rerun': rerun.batches},
+        'batched_stats': stats,
+        'rerun_stats': rerun_stats,
+        'timing_preserved': timing_ok,
+    }, indent=2))
+    if not timing_ok or rerun.batches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+多个本地工作进程共享 sqlite 任务代理的正确性检查与吞吐量
+- 启动若干个工作进程，分别只处理 transcribe、只处理 burn 或两者都处理，处理函数用 sleep 模拟各阶段耗时
+- 检查每个任务都成功完成，且每个阶段恰好执行一次（没有被两个进程重复认领）
+- --kill 时在运行中强制结束一个工作进程（SIGKILL），检查它手上的任务在租约过期后被其他进程接手完成
+
+用法：python -m benchmarks.bench_workers --jobs 40 --transcribe 2 --burn 2 --both 1
+      python -m benchmarks.bench_workers --kill --lease 3
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from config.jobs import JobConfig
+from src.jobs import JobQueue, JobStore, NextStage, STATUS_SUCCEEDED, STATUS_FAILED
+
+QUEUE_TRANSCRIBE = 'transcribe'
+QUEUE_BURN = 'burn'
+
+
+def fake_handler(job, report):
+    """模拟两阶段的上传任务，每执行一个阶段向日志追加一行 (job_id, queue, pid)"""
+    params = job['params']
+    queue = job['queue']
+    report(queue, 50)
+    time.sleep(params['seconds'])
+    with open(params['log'], 'a') as f:
+        f.write(f"{job['id']} {queue} {os.getpid()}\n")
+    if queue == QUEUE_TRANSCRIBE:
+        return NextStage(QUEUE_BURN, {'subtitle_filename': f"{job['id']}.srt"})
+    return {'message': 'done', 'subtitle_filename': job['result']['subtitle_filename']}
+
+
+def run_worker(db_path, queues, threads, lease):
+    JobConfig.LEASE_SECONDS = lease
+    job_queue = JobQueue(JobStore(db_path), fake_handler, max_workers=threads, poll_interval=0.05,
+                         queues=queues)
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    job_queue.start()
+    stopped.wait()
+    job_queue.stop(wait=True)
+
+
+def wait_for(store, job_ids, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        jobs = [store.get(job_id) for job_id in job_ids]
+        if all(job['status'] in (STATUS_SUCCEEDED, STATUS_FAILED) for job in jobs):
+            return jobs
+        time.sleep(0.1)
+    return [store.get(job_id) for job_id in job_ids]
+
+
+def run(args):
+    directory = tempfile.mkdtemp(prefix='bench_workers_')
+    db_path = os.path.join(directory, 'jobs.sqlite3')
+    log_path = os.path.join(directory, 'stages.log')
+    JobConfig.LEASE_SECONDS = args.lease
+    store = JobStore(db_path)
+
+    roles = ([(QUEUE_TRANSCRIBE,)] * args.transcribe + [(QUEUE_BURN,)] * args.burn
+             + [(QUEUE_TRANSCRIBE, QUEUE_BURN)] * args.both)
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=run_worker, args=(db_path, queues, args.threads, args.lease), daemon=True)
+                 for queues in roles]
+
+    start = time.perf_counter()
+    job_ids = [store.create({'seconds': args.stage_seconds, 'log': log_path}, queue=QUEUE_TRANSCRIBE)['id']
+               for _ in range(args.jobs)]
+    for process in processes:
+        process.start()
+
+    killed = None
+    if args.kill:
+        # 等到有任务在运行后强制结束一个同时处理两个阶段的进程（没有则结束第一个进程）
+        victim = processes[-1] if args.both else processes[0]
+        time.sleep(args.stage_seconds + 1.0)
+        os.kill(victim.pid, signal.SIGKILL)
+        killed = victim.pid
+
+    jobs = wait_for(store, job_ids, args.timeout)
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+
+    with open(log_path) as f:
+        runs = [line.split() for line in f if line.strip()]
+    counts = Counter((job_id, queue) for job_id, queue, _ in runs)
+    succeeded = sum(job['status'] == STATUS_SUCCEEDED for job in jobs)
+    # 被强制结束的进程可能在写完日志、回写结果之前退出，这类阶段允许重复执行一次
+    duplicated = [key for key, count in counts.items() if count > 1]
+    killed_runs = {(job_id, queue) for job_id, queue, pid in runs if killed and int(pid) == killed}
+    missing = [(job_id, queue) for job_id in job_ids for queue in (QUEUE_TRANSCRIBE, QUEUE_BURN)
+               if (job_id, queue) not in counts]
+    return {
+        'jobs': args.jobs,
+        'workers': [','.join(queues) for queues in roles],
+        'threads_per_worker': args.threads,
+        'stage_seconds': args.stage_seconds,
+        'killed_pid': killed,
+        'succeeded': succeeded,
+        'missing_stages': len(missing),
+        'duplicated_stages': len([key for key in duplicated if key not in killed_runs]),
+        'stages_by_pid': dict(Counter(pid for _, _, pid in runs)),
+        'elapsed_seconds': round(elapsed, 3),
+        'jobs_per_second': round(succeeded / elapsed, 2),
+        'ok': succeeded == args.jobs and not missing and all(key in killed_runs for key in duplicated),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check sqlite job broker with several local worker processes')
+    parser.add_argument('--jobs', type=int, default=40)
+    parser.add_argument('--transcribe', type=int, default=2, help='processes that only run the transcribe stage')
+    parser.add_argument('--burn', type=int, default=1, help='processes that only run the burn stage')
+    parser.add_argument('--both', type=int, default=1, help='processes that run both stages')
+    parser.add_argument('--threads', type=int, default=2)
+    parser.add_argument('--stage-seconds', type=float, default=0.2)
+    parser.add_argument('--lease', type=float, default=3.0)
+    parser.add_argument('--kill', action='store_true', help='SIGKILL one worker while jobs are running')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    print(json.dumps(run(parser.parse_args()), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+基准测试用的确定性合成素材，音视频由 ffmpeg 的测试源在本地生成
+同一组参数总是生成相同的文件，生成过的文件会被复用
+"""
+import json
+import os
+import random
+import subprocess
+
+from src.subtitle_io import format_timestamp
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def _fixture_path(name):
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    return os.path.join(FIXTURE_DIR, name)
+
+
+def _run_ffmpeg(args, output_path):
+    if not os.path.exists(output_path):
+        subprocess.run(['ffmpeg', '-nostdin', '-loglevel', 'error', '-y'] + args + [output_path], check=True)
+    return output_path
+
+
+def make_speechlike_audio(duration=600, burst=6, gap=2, sample_rate=16000):
+    """
+    生成“有声段 + 静音段”交替的长音频，用于模拟带停顿的讲话
+    有声段为带调制的正弦波，静音段为纯静音，静音检测会在静音段切分
+    """
+    path = _fixture_path(f'speechlike_{duration}s_{burst}on_{gap}off_{sample_rate}.wav')
+    period = burst + gap
+    expr = f'0.5*sin(2*PI*220*t)*(0.6+0.4*sin(2*PI*3*t))*lt(mod(t\\,{period})\\,{burst})'
+    return _run_ffmpeg(['-f', 'lavfi', '-i', f'aevalsrc={expr}:s={sample_rate}:d={duration}', '-ac', '1'], path)
+
+
+# 测试视频的音轨：正弦波，或固定种子的粉红噪声（更接近真实录音的频谱，不需要 TTS）
+AUDIO_SOURCES = {
+    'sine': 'sine=frequency=440:sample_rate=44100:duration={duration}',
+    'noise': 'anoisesrc=color=pink:seed=42:amplitude=0.3:sample_rate=44100:duration={duration}',
+}
+
+
+def make_test_video(duration=30, size='1280x720', rate=25, audio='sine'):
+    """生成带音轨的测试视频：testsrc2 画面 + 正弦波（或噪声）音频，H.264/AAC 的 mp4"""
+    suffix = '' if audio == 'sine' else f'_{audio}'
+    path = _fixture_path(f'testsrc_{duration}s_{size}_{rate}fps{suffix}.mp4')
+    return _run_ffmpeg([
+        '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate={rate}:duration={duration}',
+        '-f', 'lavfi', '-i', AUDIO_SOURCES[audio].format(duration=duration),
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-g', str(rate * 2),
+        '-c:a', 'aac', '-shortest'
+    ], path)
+
+
+def make_srt(duration=30, cue_seconds=2.0, gap_seconds=0.5):
+    """生成覆盖整个时长、时间轴规律的 SRT 文件"""
+    path = _fixture_path(f'cues_{duration}s_{cue_seconds}_{gap_seconds}.srt')
+    if os.path.exists(path):
+        return path
+
+    lines = []
+    start, index = 0.0, 1
+    while start + cue_seconds <= duration:
+        lines += [str(index), f'{format_timestamp(start)} --> {format_timestamp(start + cue_seconds)}',
+                  f'字幕 {index} subtitle line', '']
+        start += cue_seconds + gap_seconds
+        index += 1
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+    return path
+
+
+def probe_video(path):
+    """读取视频时长（秒）与帧数"""
+    result = subprocess.run([
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0', '-count_packets',
+        '-show_entries', 'format=duration:stream=nb_read_packets', '-of', 'json', path
+    ], capture_output=True, check=True, text=True)
+    info = json.loads(result.stdout)
+    return float(info['format']['duration']), int(info['streams'][0]['nb_read_packets'])
+
+
+def make_binary_file(size_mb=256, seed=0):
+    """生成固定内容的伪随机二进制文件，用于下载与 Range 请求测试（内容不可压缩）"""
+    path = _fixture_path(f'random_{size_mb}mb_{seed}.bin')
+    if not os.path.exists(path):
+        rng = random.Random(seed)
+        with open(path, 'wb') as f:
+            for _ in range(size_mb):
+                f.write(rng.randbytes(1 << 20))
+    return path
@@ -0,0 +1,15 @@
+import os
+
+
+class BatchConfig:
+    # 输入为目录时处理的视频扩展名（逗号分隔，不区分大小写）
+    VIDEO_EXTENSIONS = tuple(
+        ext.strip().lower() for ext in
+        os.environ.get('BATCH_VIDEO_EXTENSIONS', '.mp4,.mkv,.mov,.avi,.webm,.m4v,.flv,.ts').split(',') if ext.strip()
+    )
+    # 提前解码、等待转录的音频个数；音频为 16 kHz 单声道 float32，每小时约 230 MB 内存
+    PREFETCH = int(os.environ.get('BATCH_PREFETCH', '1'))
+    # 与转录并行运行的烧录 ffmpeg 进程数
+    BURN_WORKERS = int(os.environ.get('BATCH_BURN_WORKERS', '1'))
+    # 输出目录下的断点清单文件名（JSON Lines，每次状态变化追加一行）
+    MANIFEST_NAME = os.environ.get('BATCH_MANIFEST_NAME', 'batch_manifest.jsonl')
@@ -0,0 +1,12 @@
+import os
+
+from config.paths import PathConfig
+
+
+class CacheConfig:
+    # 内容寻址缓存的索引库路径
+    DB_PATH = os.environ.get('CACHE_DB_PATH', PathConfig.get_data_path('cache.sqlite3'))
+    # 缓存文件（字幕和烧录后的视频）的总大小上限，超出后按 LRU 删除，默认 20 GB
+    MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', str(20 * 1024 ** 3)))
+    # 是否启用缓存
+    ENABLED = os.environ.get('CACHE_ENABLED', '1') == '1'
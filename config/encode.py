@@ -0,0 +1,28 @@
+import os
+
+
+class EncodeConfig:
+    # 字幕烧录的编码档位；soft 不重新编码，只把 SRT 以 mov_text 字幕流封装进 mp4
+    PROFILES = {
+        'fast': {'mode': 'burn', 'preset': 'veryfast', 'crf': 23, 'tune': None},
+        'balanced': {'mode': 'burn', 'preset': 'medium', 'crf': 23, 'tune': None},
+        'quality': {'mode': 'burn', 'preset': 'slow', 'crf': 18, 'tune': None},
+        'soft': {'mode': 'soft'},
+    }
+    # 默认档位，与旧版 ffmpeg 默认参数（libx264 medium, crf 23）一致
+    DEFAULT_PROFILE = os.environ.get('ENCODE_PROFILE', 'balanced')
+    # mp4 / mov 输出是否加上 -movflags +faststart：把 moov 移到文件开头，播放器无需下载完整文件即可开始播放
+    FASTSTART = os.environ.get('ENCODE_FASTSTART', '1') == '1'
+    # 编码线程数，0 表示由 ffmpeg 自动选择
+    THREADS = int(os.environ.get('ENCODE_THREADS', '0'))
+
+    # 允许按请求覆盖的参数取值范围
+    PRESETS = ('ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow')
+    TUNES = ('film', 'animation', 'grain', 'stillimage', 'fastdecode', 'zerolatency')
+    CRF_RANGE = (0, 51)
+    # 分段并行烧录的段数，1 表示不分段（单个 ffmpeg 进程串行编码）
+    BURN_SEGMENTS = int(os.environ.get('BURN_SEGMENTS', '1'))
+    # 段数上限（请求指定的段数也受其限制），每段是一个 ffmpeg 编码进程，默认为 CPU 核数
+    BURN_MAX_SEGMENTS = int(os.environ.get('BURN_MAX_SEGMENTS', '0')) or os.cpu_count() or 1
+    # 视频时长低于该值（秒）时不分段，切分与拼接的固定开销不值得
+    PARALLEL_BURN_MIN_SECONDS = float(os.environ.get('PARALLEL_BURN_MIN_SECONDS', '120'))
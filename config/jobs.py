@@ -0,0 +1,33 @@
+import os
+
+from config.paths import PathConfig
+
+
+class JobConfig:
+    # SQLite 任务库路径，排队中的任务在服务重启后仍会继续执行
+    DB_PATH = os.environ.get('JOB_DB_PATH', PathConfig.get_data_path('jobs.sqlite3'))
+    # 服务进程内处理流水线的工作线程数（每个任务都会占满 CPU/内存，默认串行执行）
+    # 设为 0 时服务只接收上传与提供结果，任务全部交给独立的工作进程（python worker.py）
+    MAX_WORKERS = int(os.environ.get('JOB_WORKERS', '1'))
+    # 工作线程在没有被唤醒时轮询任务库的间隔（秒）
+    POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '2'))
+    # 任务进度写入任务库的最小间隔（秒），阶段切换与完成时总会立即写入
+    PROGRESS_WRITE_INTERVAL = float(os.environ.get('JOB_PROGRESS_WRITE_INTERVAL', '1'))
+    # 每个任务在内存中保留的事件条数上限（进度与字幕条目），晚到的订阅者可以从头回放
+    EVENT_HISTORY = int(os.environ.get('JOB_EVENT_HISTORY', '20000'))
+    # 任务结束后事件继续保留的时长（秒）
+    EVENT_RETENTION_SECONDS = float(os.environ.get('JOB_EVENT_RETENTION', '600'))
+    # SSE 连接空闲时发送心跳注释的间隔（秒），避免代理断开长连接
+    SSE_KEEPALIVE_SECONDS = float(os.environ.get('SSE_KEEPALIVE_SECONDS', '15'))
+    # 单个节点上同时运行的重任务（转录、烧录）上限，多个服务进程共享，默认与 JOB_WORKERS 相同
+    MAX_HEAVY_JOBS = int(os.environ.get('MAX_HEAVY_JOBS', str(MAX_WORKERS)))
+    # 重任务槽位锁文件所在目录，同一节点上的服务进程必须指向同一目录
+    SLOT_DIR = os.environ.get('HEAVY_JOB_SLOT_DIR', PathConfig.get_data_path('slots'))
+    # 排队中的任务达到该数量时拒绝新的上传（429），避免积压超过节点的处理能力
+    MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', '20'))
+    # 没有历史耗时可供估算时，429 响应中 Retry-After 的默认值（秒）
+    RETRY_AFTER_SECONDS = int(os.environ.get('RETRY_AFTER_SECONDS', '30'))
+    # 任务代理实现（见 src/jobs.py 中的 BROKERS）；sqlite 以 DB_PATH 为共享的任务库，同一台机器上的多个工作进程均可使用
+    BROKER = os.environ.get('JOB_BROKER', 'sqlite')
+    # 工作进程认领任务后持有的租约时长（秒），运行期间定时续约；工作进程失联超过该时长后任务重新排队
+    LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', '60'))
@@ -0,0 +1,14 @@
+import os
+
+from config.paths import PathConfig
+
+
+class MetricsConfig:
+    # 阶段内采样进程 RSS 的间隔（秒），用于记录各阶段的内存峰值
+    RSS_SAMPLE_INTERVAL = float(os.environ.get('METRICS_RSS_SAMPLE_INTERVAL', '0.05'))
+    # 每个任务结束时写一行 JSON 的阶段耗时日志（wall / CPU / 峰值 RSS）
+    TIMING_LOG_PATH = os.environ.get('JOB_TIMING_LOG', PathConfig.get_data_path('job_timings.log'))
+    # 是否允许通过 /upload 的 cprofile=1 对单个任务开启 cProfile，默认关闭
+    ALLOW_PROFILING = os.environ.get('ALLOW_PROFILING', '0') == '1'
+    # cProfile 结果（.prof）的保存目录
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', PathConfig.get_data_path('profiles'))
@@ -0,0 +1,35 @@
+import os
+
+
+class ModelConfig:
+    # 默认转录引擎：openai-whisper（PyTorch）或 faster-whisper（CTranslate2，CPU 上更快）
+    DEFAULT_ENGINE = os.environ.get('WHISPER_ENGINE', 'openai-whisper')
+    # 默认使用的 Whisper 模型（可通过环境变量切换为 medium / small 等更小的模型）
+    DEFAULT_MODEL = os.environ.get('WHISPER_MODEL', 'large-v3')
+    # 推理设备，为空时由 whisper 自行选择（有 CUDA 用 CUDA，否则使用 CPU）
+    DEVICE = os.environ.get('WHISPER_DEVICE') or None
+    # faster-whisper 的计算精度，CPU 上 int8 最快；有 GPU 时可设为 float16
+    COMPUTE_TYPE = os.environ.get('WHISPER_COMPUTE_TYPE', 'int8')
+    # faster-whisper 的 CPU 线程数，0 表示由 CTranslate2 自行决定
+    CPU_THREADS = int(os.environ.get('WHISPER_CPU_THREADS', '0'))
+    # 同时常驻内存的模型数量上限，超出后按最近最少使用（LRU）淘汰
+    MAX_RESIDENT_MODELS = int(os.environ.get('WHISPER_MAX_MODELS', '1'))
+    # 服务启动时是否预热模型
+    WARMUP_ON_START = os.environ.get('WHISPER_WARMUP', '1') == '1'
+    # 需要预热的模型列表，逗号分隔；为空时只预热 DEFAULT_MODEL
+    WARMUP_MODELS = [name.strip() for name in os.environ.get('WHISPER_WARMUP_MODELS', '').split(',')
+                     if name.strip()]
+
+    @classmethod
+    def resolve_model_name(cls, name=None):
+        """未指定模型时回落到默认模型"""
+        return name or cls.DEFAULT_MODEL
+
+    @classmethod
+    def resolve_engine_name(cls, name=None):
+        """未指定引擎时回落到默认引擎"""
+        return name or cls.DEFAULT_ENGINE
+
+    @classmethod
+    def get_warmup_models(cls):
+        return cls.WARMUP_MODELS or [cls.DEFAULT_MODEL]
@@ -13,6 +13,10 @@ class PathConfig:
     SUBTITLE_DIR = os.path.join(OUTPUT_DIR, 'subtitles')
     # 视频帧存储目录
     FRAMES_DIR = os.path.join(OUTPUT_DIR, 'frames')
+    # 内容寻址缓存的字幕副本目录
+    CACHE_DIR = os.path.join(OUTPUT_DIR, 'cache')
+    # 服务自身状态（任务库等）存储目录，不随输出清理
+    DATA_DIR = os.path.join(BASE_DIR, 'data')
 
     @classmethod
     def ensure_dirs(cls, dirs):
@@ -42,6 +46,14 @@ class PathConfig:
     def get_frames_path(cls, filename):
         return os.path.join(cls.FRAMES_DIR, filename)
 
+    @classmethod
+    def get_cache_path(cls, filename):
+        return os.path.join(cls.CACHE_DIR, filename)
+
+    @classmethod
+    def get_data_path(cls, filename):
+        return os.path.join(cls.DATA_DIR, filename)
+
     @classmethod
     def ensure_dir(cls, path):
         """
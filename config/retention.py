@@ -0,0 +1,35 @@
+import os
+
+from config.paths import PathConfig
+
+
+def _policy(name, directory, ttl_hours, max_gb):
+    """目录的保留策略，可用 RETENTION_<名称>_TTL_HOURS / RETENTION_<名称>_MAX_GB 覆盖，0 表示不限制"""
+    prefix = f'RETENTION_{name.upper()}'
+    return {
+        'directory': directory,
+        'ttl_seconds': float(os.environ.get(f'{prefix}_TTL_HOURS', str(ttl_hours))) * 3600,
+        'max_bytes': int(float(os.environ.get(f'{prefix}_MAX_GB', str(max_gb))) * 1024 ** 3),
+    }
+
+
+class RetentionConfig:
+    # 是否在服务中运行后台清理线程
+    ENABLED = os.environ.get('RETENTION_ENABLED', '1') == '1'
+    # 各目录的保留时长与容量上限；只清理目录下的文件，不进入子目录（outputs 只包含烧录后的视频等顶层文件）
+    # 内容寻址缓存目录由 ContentCache 按 CACHE_MAX_BYTES 自行淘汰，不在此列
+    POLICIES = {
+        'uploads': _policy('uploads', PathConfig.UPLOAD_DIR, 72, 0),
+        'audio': _policy('audio', PathConfig.AUDIO_DIR, 24, 0),
+        'subtitles': _policy('subtitles', PathConfig.SUBTITLE_DIR, 24 * 30, 0),
+        'outputs': _policy('outputs', PathConfig.OUTPUT_DIR, 72, 50),
+        'frames': _policy('frames', PathConfig.FRAMES_DIR, 24, 0),
+    }
+    # 两次清理之间的间隔（秒）；多个服务进程共享索引库，同一间隔内只有一个进程执行清理
+    SWEEP_INTERVAL = float(os.environ.get('RETENTION_SWEEP_INTERVAL', '600'))
+    # 修改时间距今小于该值（秒）的文件不会被清理，保护其他进程正在写入的文件
+    MIN_AGE_SECONDS = float(os.environ.get('RETENTION_MIN_AGE', '600'))
+    # 文件 mtime 索引库路径
+    INDEX_DB_PATH = os.environ.get('RETENTION_DB_PATH', PathConfig.get_data_path('retention.sqlite3'))
+    # 任务结束后立即删除未要求保留的中间 wav 文件
+    DELETE_AUDIO_ON_COMPLETE = os.environ.get('RETENTION_DELETE_AUDIO', '1') == '1'
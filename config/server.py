@@ -0,0 +1,15 @@
+import os
+
+
+class ServerConfig:
+    # 生产入口 serve.py 监听的地址与端口
+    HOST = os.environ.get('HOST', '0.0.0.0')
+    PORT = int(os.environ.get('PORT', '8080'))
+    # WSGI 服务器：auto（优先 gunicorn，其次 waitress，都未安装时使用 werkzeug 的多线程服务器）、gunicorn、waitress、werkzeug
+    SERVER = os.environ.get('WSGI_SERVER', 'auto').lower()
+    # 服务进程数（仅 gunicorn）；每个进程各自加载模型，内存占用随之成倍增加
+    WORKERS = int(os.environ.get('WEB_WORKERS', '1'))
+    # 每个服务进程处理请求的线程数，上传与 SSE 长连接各占一个线程
+    THREADS = int(os.environ.get('WEB_THREADS', '8'))
+    # gunicorn 工作进程无响应多久后被重启（秒）
+    TIMEOUT = int(os.environ.get('WEB_TIMEOUT', '300'))
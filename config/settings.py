@@ -1,11 +1,12 @@
 import logging
+import os
 
 # 配置日志
 logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     handlers=[
         logging.StreamHandler(),
         logging.FileHandler("app.log", mode='w')
     ]
-)
\ No newline at end of file
+)
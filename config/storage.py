@@ -0,0 +1,7 @@
+import os
+
+
+class StorageConfig:
+    # 任务产物的存储实现（见 src/storage.py 中的 STORAGES）；local 直接使用 PathConfig 中的目录，
+    # 多台机器分工时把项目目录放在共享文件系统上即可
+    BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
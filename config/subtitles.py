@@ -0,0 +1,6 @@
+import os
+
+
+class SubtitleConfig:
+    # 内存中缓存的已解析字幕轨道数量上限，超出后按 LRU 淘汰
+    CACHE_TRACKS = int(os.environ.get('SUBTITLE_CACHE_TRACKS', '32'))
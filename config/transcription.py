@@ -0,0 +1,22 @@
+import os
+
+
+class TranscriptionConfig:
+    # 分块并行转录使用的进程数，默认取 CPU 核数的一半（每个进程各自加载一份模型）
+    CHUNK_WORKERS = int(os.environ.get('CHUNK_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+    # 期望的分块时长（秒），在达到该时长后的第一个静音处切分
+    CHUNK_TARGET_SECONDS = float(os.environ.get('CHUNK_TARGET_SECONDS', '300'))
+    # 分块最大时长（秒），一直找不到静音时强制切分
+    CHUNK_MAX_SECONDS = float(os.environ.get('CHUNK_MAX_SECONDS', '600'))
+    # 低于该能量（dBFS）的帧视为静音
+    SILENCE_THRESHOLD_DB = float(os.environ.get('SILENCE_THRESHOLD_DB', '-40'))
+    # 至少持续该时长（秒）的静音才作为候选切分点
+    MIN_SILENCE_SECONDS = float(os.environ.get('MIN_SILENCE_SECONDS', '0.5'))
+    # 音频提取方式：stream 直接解码为 16 kHz 单声道 float32 送入模型，不写中间 wav；wav 为旧版落盘方式
+    AUDIO_EXTRACTION_MODE = os.environ.get('AUDIO_EXTRACTION_MODE', 'stream')
+    # stream 模式下是否额外保留一份 16 kHz 单声道 wav 文件
+    KEEP_AUDIO_WAV = os.environ.get('KEEP_AUDIO_WAV', '0') == '1'
+    # 估算流式提取节省的时间：旧版流程写出 44 kHz 双声道 wav 的磁盘写入速度（字节/秒），
+    # 以及 Whisper 重新读入并重采样该 wav 的速度（每秒墙钟时间处理的音频秒数）
+    WAV_WRITE_BYTES_PER_SECOND = float(os.environ.get('WAV_WRITE_BYTES_PER_SECOND', str(200 * 1024 ** 2)))
+    WAV_REDECODE_REALTIME = float(os.environ.get('WAV_REDECODE_REALTIME', '1000'))
@@ -0,0 +1,17 @@
+import os
+
+from config.paths import PathConfig
+
+
+class TranslationConfig:
+    # 翻译后端：marian（本地离线的 Helsinki-NLP/opus-mt 模型，需要安装 transformers）或 stub（测试用，不真正翻译）
+    BACKEND = os.environ.get('TRANSLATION_BACKEND', 'marian')
+    # opus-mt 模型名称模板，{source} / {target} 为语言代码
+    MARIAN_MODEL_TEMPLATE = os.environ.get('TRANSLATION_MARIAN_MODEL', 'Helsinki-NLP/opus-mt-{source}-{target}')
+    # 每个批次的最大字符数与最大条数
+    BATCH_MAX_CHARS = int(os.environ.get('TRANSLATION_BATCH_MAX_CHARS', '2000'))
+    BATCH_MAX_ITEMS = int(os.environ.get('TRANSLATION_BATCH_MAX_ITEMS', '32'))
+    # 同时进行的批次数
+    CONCURRENCY = int(os.environ.get('TRANSLATION_CONCURRENCY', '4'))
+    # 翻译结果缓存库：(后端, 源语言, 目标语言, 原文) -> 译文
+    CACHE_DB_PATH = os.environ.get('TRANSLATION_CACHE_DB_PATH', PathConfig.get_data_path('translations.sqlite3'))
@@ -0,0 +1,17 @@
+import os
+
+
+class UploadConfig:
+    # 单个上传文件的大小上限（字节），默认 10 GB
+    MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(10 * 1024 ** 3)))
+    # 上传过程中是否同时把数据送入 ffmpeg 提前开始音频提取
+    EARLY_EXTRACT = os.environ.get('EARLY_EXTRACT', '1') == '1'
+    # 流式上传时每次从请求体读取的字节数
+    CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', str(1 << 20)))
+    # 提前解码的音频在内存中等待任务认领的最长秒数，任务由其他进程处理时超时丢弃
+    EARLY_AUDIO_TTL = int(os.environ.get('EARLY_AUDIO_TTL', '3600'))
+    # 同时在内存中等待认领的提前解码音频总字节数上限（16 kHz float32 每小时约 230 MB），
+    # 超出时不再保留新的音频，由工作进程照常从视频中提取
+    EARLY_AUDIO_MAX_BYTES = int(os.environ.get('EARLY_AUDIO_MAX_BYTES', str(1024 ** 3)))
+    # 定时清理超时音频的间隔（秒）
+    EARLY_AUDIO_PURGE_INTERVAL = float(os.environ.get('EARLY_AUDIO_PURGE_INTERVAL', '60'))
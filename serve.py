@@ -0,0 +1,106 @@
+"""
+生产环境入口：python serve.py
+- gunicorn：WEB_WORKERS 个服务进程 × 每进程 WEB_THREADS 个线程（gthread），仅支持 Linux / macOS
+- waitress：单进程 WEB_THREADS 个线程，Windows 上也可使用
+- 两者都未安装时使用 werkzeug 的多线程服务器（关闭调试与自动重载），便于本地运行
+开发调试仍然使用 python app.py
+"""
+import logging
+import sys
+
+from config.server import ServerConfig
+from config.upload import UploadConfig
+
+logger = logging.getLogger('serve')
+
+SERVERS = ('gunicorn', 'waitress', 'werkzeug')
+
+
+def _installed(module):
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+def choose_server(name=None):
+    name = name or ServerConfig.SERVER
+    if name != 'auto':
+        return name
+    if sys.platform != 'win32' and _installed('gunicorn'):
+        return 'gunicorn'
+    if _installed('waitress'):
+        return 'waitress'
+    return 'werkzeug'
+
+
+def run_gunicorn(app, job_store, start_worker):
+    from gunicorn.app.base import BaseApplication
+
+    def on_starting(server):
+        # 中断任务只在主进程派生工作进程前恢复一次，避免后启动的进程把其他进程正在运行的任务重新排队
+        requeued = job_store.requeue_interrupted()
+        if requeued:
+            logger.info('重新排队 %d 个中断的任务', requeued)
+
+    def post_fork(server, worker):
+        start_worker()
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{ServerConfig.HOST}:{ServerConfig.PORT}')
+            self.cfg.set('workers', ServerConfig.WORKERS)
+            self.cfg.set('threads', ServerConfig.THREADS)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('timeout', ServerConfig.TIMEOUT)
+            self.cfg.set('on_starting', on_starting)
+            self.cfg.set('post_fork', post_fork)
+
+        def load(self):
+            return app
+
+    Server().run()
+
+
+def run_waitress(app):
+    from waitress import serve
+
+    # waitress 默认的请求体上限为 1 GB，与上传上限保持一致
+    serve(app, host=ServerConfig.HOST, port=ServerConfig.PORT, threads=ServerConfig.THREADS,
+          max_request_body_size=UploadConfig.MAX_UPLOAD_BYTES + (1 << 20))
+
+
+def run_werkzeug(app):
+    from werkzeug.serving import run_simple
+
+    run_simple(ServerConfig.HOST, ServerConfig.PORT, app, threaded=True)
+
+
+def main():
+    from app import app, job_queue, job_store, start_background_services
+
+    server = choose_server()
+    if server not in SERVERS:
+        raise SystemExit(f'Unknown WSGI_SERVER "{server}". Available: auto, {", ".join(SERVERS)}')
+    logger.info('使用 %s 在 %s:%d 启动服务', server, ServerConfig.HOST, ServerConfig.PORT)
+
+    if server == 'gunicorn':
+        def start_worker():
+            job_queue.recover = False
+            start_background_services()
+
+        run_gunicorn(app, job_store, start_worker)
+        return
+
+    if ServerConfig.WORKERS > 1:
+        logger.warning('%s 只支持单进程，忽略 WEB_WORKERS=%d', server, ServerConfig.WORKERS)
+    start_background_services()
+    if server == 'waitress':
+        run_waitress(app)
+    else:
+        run_werkzeug(app)
+
+
+if __name__ == '__main__':
+    main()
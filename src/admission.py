@@ -0,0 +1,105 @@
+import math
+import os
+import threading
+
+from config.jobs import JobConfig
+from config.paths import PathConfig
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class _LockSlot:
+    """通过 flock 持有的槽位，进程退出（包括崩溃）时由内核自动释放"""
+
+    def __init__(self, fd):
+        self._fd = fd
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _SemaphoreSlot:
+    def __init__(self, semaphore):
+        self._semaphore = semaphore
+
+    def release(self):
+        if self._semaphore is not None:
+            self._semaphore.release()
+            self._semaphore = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class HeavySlots:
+    """
+    单个节点上重任务（转录、烧录）的并发槽位，同一节点上的多个服务进程共享
+    每个槽位是 SLOT_DIR 下的一个锁文件，以非阻塞的 flock 占用；没有 fcntl 的平台（Windows）退回进程内的信号量
+    """
+
+    def __init__(self, count=None, directory=None):
+        self.count = max(1, count or JobConfig.MAX_HEAVY_JOBS)
+        self.directory = directory or JobConfig.SLOT_DIR
+        self._semaphore = threading.BoundedSemaphore(self.count) if fcntl is None else None
+
+    def _slot_path(self, i):
+        return os.path.join(self.directory, f'slot-{i}.lock')
+
+    def try_acquire(self):
+        """占用一个空闲槽位并返回（可作为上下文管理器，或调用 release() 释放），全部被占用时返回 None"""
+        if self._semaphore is not None:
+            return _SemaphoreSlot(self._semaphore) if self._semaphore.acquire(blocking=False) else None
+        PathConfig.ensure_dir(self.directory)
+        for i in range(self.count):
+            # 每次重新打开文件：flock 作用于打开的文件描述，同一进程的不同线程之间同样互斥
+            fd = os.open(self._slot_path(i), os.O_CREAT | os.O_RDWR, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            return _LockSlot(fd)
+        return None
+
+    def in_use(self):
+        """当前被占用的槽位数（逐个试探加锁，只用于监控）"""
+        if self._semaphore is not None:
+            return self.count - self._semaphore._value
+        busy = 0
+        for i in range(self.count):
+            if not os.path.exists(self._slot_path(i)):
+                continue
+            fd = os.open(self._slot_path(i), os.O_RDWR)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            except OSError:
+                busy += 1
+            finally:
+                os.close(fd)
+        return busy
+
+
+def retry_after_seconds(average_seconds, backlog, slots):
+    """
+    估算 429 响应的 Retry-After：积压的 backlog 个任务由 slots 个槽位并行处理所需的时间
+    没有历史耗时（average_seconds 为 None）时使用 RETRY_AFTER_SECONDS
+    """
+    if not average_seconds:
+        return JobConfig.RETRY_AFTER_SECONDS
+    return max(1, math.ceil(average_seconds * max(1, backlog) / max(1, slots)))
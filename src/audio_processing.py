@@ -1,12 +1,16 @@
-import whisper
+import logging
+
 from config.paths import PathConfig
+from src.model_registry import get_model
+
+logger = logging.getLogger(__name__)
 
-def transcribe_audio(audio_path, language='zh'):
+def transcribe_audio(audio_path, language='zh', model_name=None, engine=None):
     """使用 Whisper 进行音频转录"""
     try:
-        model = whisper.load_model("large-v3")
+        model = get_model(model_name, engine=engine)
         result = model.transcribe(audio_path, language=language)
         return result["text"]
     except Exception as e:
-        print(f"音频转录时出错: {str(e)}")
+        logger.exception('音频转录时出错')
         return None
\ No newline at end of file
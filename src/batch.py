@@ -0,0 +1,343 @@
+"""
+离线批量处理：对目录下（或清单文件中列出）的所有视频生成字幕并烧录，不经过 HTTP 接口
+
+用法：python -m src.batch /archive/videos --output-dir /archive/subtitled
+      python -m src.batch videos.txt --output-dir out --subtitles-only --model small
+      python -m src.batch /archive/videos --output-dir out --retry-failed
+
+- 整个批次共用一个已加载的模型（进程级模型注册表）
+- 三个阶段流水线执行：提取线程提前解码下一个文件的音频，主线程转录，烧录线程池与后续文件的转录并行
+- 输出目录下的断点清单记录每个文件的进度，中断后重新运行同一命令会跳过已完成的文件，
+  已转录但未烧录的文件只补做烧录
+- 结束时输出汇总：文件数、音频总时长、各阶段累计耗时、总耗时与吞吐量
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.batch import BatchConfig
+from src.encode_profiles import resolve_encode_profile, InvalidEncodeProfile
+from src.engines import EngineUnavailable
+from src.model_registry import get_model
+from src.video_processing import extract_audio_array, generate_subtitles, embed_subtitles
+
+logger = logging.getLogger(__name__)
+
+# 清单中的文件状态
+STATUS_TRANSCRIBED = 'transcribed'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# 批次内的阶段，汇总中按阶段统计累计耗时
+STAGES = ('extract', 'transcribe', 'burn')
+
+
+def collect_sources(path, extensions=None):
+    """
+    列出待处理的视频，返回 (根目录, 源文件绝对路径列表)
+    - path 为目录时递归查找扩展名在 extensions 中的文件，按路径排序
+    - 否则作为清单文件读取，每行一个路径（相对路径相对于清单所在目录），忽略空行与 # 开头的注释
+    输出文件按源文件相对于根目录的路径存放，目录输入时根目录即 path，清单输入时为所有文件的公共目录
+    """
+    extensions = extensions or BatchConfig.VIDEO_EXTENSIONS
+    if os.path.isdir(path):
+        root = os.path.abspath(path)
+        sources = []
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            sources += [os.path.join(directory, name) for name in sorted(filenames)
+                        if os.path.splitext(name)[1].lower() in extensions]
+        return root, sources
+
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding='utf-8') as f:
+        sources = [os.path.abspath(os.path.join(base, line.strip())) for line in f
+                   if line.strip() and not line.lstrip().startswith('#')]
+    # 去掉重复的路径，保持清单中的顺序
+    sources = list(dict.fromkeys(sources))
+    root = os.path.commonpath([os.path.dirname(source) for source in sources]) if sources else base
+    return root, sources
+
+
+def fingerprint(path):
+    """源文件的大小与修改时间，文件被替换后清单中的旧记录不再适用"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class BatchManifest:
+    """
+    断点清单：JSON Lines 文件，每次文件状态变化追加一行并刷新到磁盘，读取时同一文件以最后一行为准
+    只追加不重写，进程在任意时刻崩溃都不会损坏已记录的进度（最后一行写了一半时忽略该行）
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries.setdefault(entry['source'], {}).update(entry)
+
+    def get(self, source, source_fingerprint):
+        """源文件的记录；文件在上次运行后被修改过时返回 None"""
+        entry = self.entries.get(source)
+        if entry is None or entry.get('fingerprint') != source_fingerprint:
+            return None
+        return entry
+
+    def update(self, source, **fields):
+        with self._lock:
+            entry = self.entries.setdefault(source, {'source': source})
+            entry.update(fields, updated_at=time.time())
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class BatchItem:
+    def __init__(self, source, root, output_dir):
+        self.source = source
+        # 输出文件按源文件的相对路径存放，不同子目录下的同名文件不会互相覆盖
+        stem = os.path.splitext(os.path.relpath(source, root))[0]
+        output_dir = os.path.abspath(output_dir)
+        self.subtitle_path = os.path.join(output_dir, f'{stem}.srt')
+        self.output_path = os.path.join(output_dir, f'{stem}_with_subtitles.mp4')
+        self.fingerprint = fingerprint(source)
+
+
+class BatchRunner:
+    """
+    流水线批处理：
+    - 提取线程按顺序把音频解码到内存，最多提前 prefetch 个文件，有界队列限制等待转录的音频占用的内存
+    - 主线程从队列中取出音频转录并写出字幕，模型只加载一次
+    - 烧录交给 burn_workers 个线程，每个线程运行一个 ffmpeg 进程，与后续文件的转录并行
+    """
+
+    def __init__(self, items, manifest, model_name=None, engine=None, profile=None, subtitles_only=False,
+                 prefetch=None, burn_workers=None, retry_failed=False):
+        self.items = items
+        self.manifest = manifest
+        self.model_name = model_name
+        self.engine = engine
+        self.profile = profile or resolve_encode_profile()
+        self.subtitles_only = subtitles_only
+        self.prefetch = max(1, prefetch or BatchConfig.PREFETCH)
+        self.burn_workers = max(1, burn_workers or BatchConfig.BURN_WORKERS)
+        self.retry_failed = retry_failed
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {'files': len(items), 'done': 0, 'failed': 0, 'skipped': 0, 'audio_seconds': 0.0}
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+
+    def plan(self):
+        """
+        按清单把文件分为待转录、只需烧录和跳过三类
+        之前以 --subtitles-only 完成的文件在需要烧录的批次中只补做烧录
+        """
+        transcribe, burn = [], []
+        for item in self.items:
+            entry = self.manifest.get(item.source, item.fingerprint) or {}
+            status = entry.get('status')
+            if status == STATUS_DONE and (self.subtitles_only or entry.get('output')):
+                self.stats['skipped'] += 1
+            elif status == STATUS_FAILED and not self.retry_failed:
+                self.stats['skipped'] += 1
+            elif status in (STATUS_TRANSCRIBED, STATUS_DONE) and os.path.exists(item.subtitle_path):
+                if self.subtitles_only:
+                    self.manifest.update(item.source, status=STATUS_DONE)
+                    self.stats['done'] += 1
+                else:
+                    burn.append(item)
+            else:
+                transcribe.append(item)
+        return transcribe, burn
+
+    def run(self):
+        """处理全部文件并返回汇总"""
+        start = time.perf_counter()
+        transcribe, burn = self.plan()
+        logger.info('批处理 %d 个文件：待转录 %d，待烧录 %d，跳过 %d',
+                    len(self.items), len(transcribe), len(burn), self.stats['skipped'])
+        if transcribe:
+            # 预先加载共享模型，加载耗时不计入第一个文件的转录
+            model_start = time.perf_counter()
+            get_model(self.model_name, engine=self.engine)
+            self.stats['model_load_seconds'] = round(time.perf_counter() - model_start, 3)
+
+        audio_queue = queue.Queue(maxsize=self.prefetch)
+        extractor = threading.Thread(target=self._extract_all, args=(transcribe, audio_queue),
+                                     name='batch-extract', daemon=True)
+        with ThreadPoolExecutor(self.burn_workers, thread_name_prefix='batch-burn') as burner:
+            try:
+                for item in burn:
+                    burner.submit(self._burn, item)
+                extractor.start()
+                while True:
+                    entry = audio_queue.get()
+                    if entry is None:
+                        break
+                    item, audio, error = entry
+                    if error is not None:
+                        self._fail(item, 'extract', error)
+                    elif self._transcribe(item, audio) and not self.subtitles_only:
+                        burner.submit(self._burn, item)
+            except KeyboardInterrupt:
+                # 已完成的文件都记录在清单中，重新运行即可继续；正在运行的烧录会先结束
+                logger.warning('批处理被中断，等待正在运行的烧录结束')
+                self._stop.set()
+                burner.shutdown(wait=True, cancel_futures=True)
+                raise
+
+        elapsed = time.perf_counter() - start
+        return self.summary(elapsed)
+
+    def _extract_all(self, items, audio_queue):
+        for item in items:
+            if self._stop.is_set():
+                return
+            item_start = time.perf_counter()
+            try:
+                audio, stats = extract_audio_array(item.source)
+                entry = (item, audio, None)
+                self._add_stage('extract', time.perf_counter() - item_start)
+                with self._lock:
+                    self.stats['audio_seconds'] += stats['audio_seconds']
+                self.manifest.update(item.source, fingerprint=item.fingerprint,
+                                     audio_seconds=stats['audio_seconds'], extract_seconds=stats['extract_seconds'])
+            except Exception as e:
+                entry = (item, None, f'{type(e).__name__}: {e}')
+            self._put(audio_queue, entry)
+        self._put(audio_queue, None)
+
+    def _put(self, audio_queue, entry):
+        """放入有界队列；主线程被中断后不再阻塞"""
+        while not self._stop.is_set():
+            try:
+                audio_queue.put(entry, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _transcribe(self, item, audio):
+        os.makedirs(os.path.dirname(item.subtitle_path), exist_ok=True)
+        item_start = time.perf_counter()
+        success = generate_subtitles(audio, item.subtitle_path, model_name=self.model_name, engine=self.engine)
+        elapsed = time.perf_counter() - item_start
+        self._add_stage('transcribe', elapsed)
+        if not success:
+            self._fail(item, 'transcribe', '生成字幕时出错')
+            return False
+        status = STATUS_DONE if self.subtitles_only else STATUS_TRANSCRIBED
+        self.manifest.update(item.source, fingerprint=item.fingerprint, status=status,
+                             subtitle=item.subtitle_path, transcribe_seconds=round(elapsed, 3), error=None)
+        logger.info('已转录 %s（%.1f 秒）', item.source, elapsed)
+        if self.subtitles_only:
+            self._count('done')
+        return True
+
+    def _burn(self, item):
+        if self._stop.is_set():
+            return
+        item_start = time.perf_counter()
+        try:
+            success = embed_subtitles(item.source, item.subtitle_path, item.output_path, self.profile)
+        except Exception:
+            # 烧录线程中的异常不会传回主线程，记录为失败，其余文件继续处理
+            logger.exception('烧录 %s 时出错', item.source)
+            success = False
+        elapsed = time.perf_counter() - item_start
+        self._add_stage('burn', elapsed)
+        if not success:
+            self._fail(item, 'burn', '嵌入字幕时出错')
+            return
+        self.manifest.update(item.source, fingerprint=item.fingerprint, status=STATUS_DONE,
+                             output=item.output_path, burn_seconds=round(elapsed, 3), error=None)
+        logger.info('已烧录 %s（%.1f 秒）', item.output_path, elapsed)
+        self._count('done')
+
+    def _fail(self, item, stage, error):
+        logger.error('%s 在 %s 阶段失败: %s', item.source, stage, error)
+        self.manifest.update(item.source, fingerprint=item.fingerprint, status=STATUS_FAILED, stage=stage,
+                             error=error)
+        self._count('failed')
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _add_stage(self, stage, seconds):
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+
+    def summary(self, elapsed):
+        """
+        批次汇总；serial_seconds 为各阶段累计耗时之和（即逐个文件串行处理所需的时间），
+        与 wall_seconds 之比反映流水线重叠带来的加速
+        """
+        processed = self.stats['done'] + self.stats['failed']
+        serial = sum(self.stage_seconds.values())
+        return dict(
+            self.stats,
+            audio_seconds=round(self.stats['audio_seconds'], 3),
+            stage_seconds={stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+            serial_seconds=round(serial, 3),
+            wall_seconds=round(elapsed, 3),
+            pipeline_speedup=round(serial / elapsed, 2) if elapsed else None,
+            files_per_hour=round(processed * 3600 / elapsed, 1) if elapsed else None,
+            # 每秒墙钟时间处理的音频秒数
+            realtime_factor=round(self.stats['audio_seconds'] / elapsed, 2) if elapsed else None,
+        )
+
+
+def main():
+    import config.settings  # noqa: F401  配置日志
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='视频目录，或每行一个视频路径的清单文件')
+    parser.add_argument('--output-dir', required=True, help='字幕与烧录视频的输出目录')
+    parser.add_argument('--manifest', help=f'断点清单路径，默认为输出目录下的 {BatchConfig.MANIFEST_NAME}')
+    parser.add_argument('--model', help='模型名称，默认使用 ModelConfig 中的默认模型')
+    parser.add_argument('--engine', help='转录引擎（openai-whisper / faster-whisper）')
+    parser.add_argument('--profile', help='编码档位（fast / balanced / quality / soft）')
+    parser.add_argument('--subtitles-only', action='store_true', help='只生成字幕，不烧录')
+    parser.add_argument('--prefetch', type=int, help=f'提前解码的音频个数（默认 {BatchConfig.PREFETCH}）')
+    parser.add_argument('--burn-workers', type=int, help=f'并行烧录进程数（默认 {BatchConfig.BURN_WORKERS}）')
+    parser.add_argument('--retry-failed', action='store_true', help='重新处理清单中记录为失败的文件')
+    args = parser.parse_args()
+
+    try:
+        profile = resolve_encode_profile(args.profile)
+    except InvalidEncodeProfile as e:
+        parser.error(str(e))
+    root, sources = collect_sources(args.input)
+    for source in [source for source in sources if not os.path.isfile(source)]:
+        logger.warning('跳过不存在的文件: %s', source)
+        sources.remove(source)
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest = BatchManifest(args.manifest or os.path.join(args.output_dir, BatchConfig.MANIFEST_NAME))
+    items = [BatchItem(source, root, args.output_dir) for source in sources]
+
+    runner = BatchRunner(items, manifest, model_name=args.model, engine=args.engine, profile=profile,
+                         subtitles_only=args.subtitles_only, prefetch=args.prefetch, burn_workers=args.burn_workers,
+                         retry_failed=args.retry_failed)
+    try:
+        summary = runner.run()
+    except EngineUnavailable as e:
+        parser.exit(1, f'{e}\n')
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
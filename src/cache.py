@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config.cache import CacheConfig
+from src.db import connect, init_db
+
+# 缓存条目类型
+KIND_SUBTITLE = 'subtitle'
+KIND_VIDEO = 'video'
+
+
+def make_key(*parts):
+    """把内容哈希与处理参数组合为缓存 key，参数需可 JSON 序列化"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ContentCache:
+    """
+    内容寻址的结果缓存：key 由上传内容的哈希与模型、语言、任务等参数组成，value 为 outputs/ 下已生成的文件
+    所有缓存文件的总大小超过上限时，按最近访问时间（LRU）删除文件
+    """
+
+    def __init__(self, db_path=None, max_bytes=None):
+        self.db_path = db_path or CacheConfig.DB_PATH
+        self.max_bytes = max_bytes or CacheConfig.MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        init_db(self.db_path, """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache_entries (last_access);
+        """)
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """命中时返回缓存文件路径；文件已被删除或被改写过时视为未命中并清理该条目"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT path, mtime_ns FROM cache_entries WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                try:
+                    valid = os.stat(row['path']).st_mtime_ns == row['mtime_ns']
+                except FileNotFoundError:
+                    valid = False
+                if valid:
+                    conn.execute('UPDATE cache_entries SET last_access = ? WHERE key = ?', (time.time(), key))
+                    self._count(True)
+                    return row['path']
+                conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+        self._count(False)
+        return None
+
+    def put(self, key, kind, path):
+        """登记新生成的文件，并在超过总大小上限时淘汰最久未访问的文件"""
+        stat = os.stat(path)
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, kind, path, size, mtime_ns, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, kind, path, stat.st_size, stat.st_mtime_ns, time.time())
+            )
+        self.evict()
+
+    def evict(self):
+        """删除最久未访问的缓存文件，直到总大小不超过上限，返回释放的字节数"""
+        reclaimed = 0
+        with self._connect() as conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            rows = conn.execute('SELECT key, path, size FROM cache_entries ORDER BY last_access').fetchall()
+            for row in rows:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(row['path'])
+                except FileNotFoundError:
+                    pass
+                conn.execute('DELETE FROM cache_entries WHERE key = ?', (row['key'],))
+                total -= row['size']
+                reclaimed += row['size']
+                with self._lock:
+                    self.evictions += 1
+        return reclaimed
+
+    def stats(self):
+        with self._connect() as conn:
+            row = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries').fetchone()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': row[0],
+                'bytes': row[1],
+                'max_bytes': self.max_bytes,
+            }
+
+
+cache = ContentCache()
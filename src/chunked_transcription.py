@@ -0,0 +1,229 @@
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from config.transcription import TranscriptionConfig
+
+# Whisper 模型要求的输入格式：16 kHz 单声道
+SAMPLE_RATE = 16000
+# 静音检测的帧长（毫秒）
+FRAME_MS = 30
+# 每次从 ffmpeg 读取的帧数，保证长音频在静音检测时只占用常量内存
+FRAMES_PER_READ = 1000
+
+
+def _ffmpeg_pcm_cmd(audio_path, start=None, duration=None):
+    """构造把任意音频解码为 16 kHz 单声道 s16le 并写到 stdout 的 ffmpeg 命令"""
+    cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error']
+    if start is not None:
+        cmd += ['-ss', f'{start:.3f}']
+    if duration is not None:
+        cmd += ['-t', f'{duration:.3f}']
+    cmd += ['-i', audio_path, '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), '-']
+    return cmd
+
+
+def load_audio_segment(audio_path, start=None, end=None):
+    """只解码 [start, end) 区间的音频（都为空时解码整个文件），返回 Whisper 可直接使用的 float32 数组"""
+    duration = None if end is None else end - (start or 0)
+    result = subprocess.run(_ffmpeg_pcm_cmd(audio_path, start, duration), capture_output=True, check=True)
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def find_silences(audio_path, threshold_db=None, min_silence=None):
+    """
+    基于帧能量的静音检测（VAD）
+    :return: (静音区间列表 [(start, end), ...]，音频总时长)，单位均为秒
+    """
+    threshold_db = TranscriptionConfig.SILENCE_THRESHOLD_DB if threshold_db is None else threshold_db
+    min_silence = TranscriptionConfig.MIN_SILENCE_SECONDS if min_silence is None else min_silence
+    frame_len = SAMPLE_RATE * FRAME_MS // 1000
+    frame_seconds = FRAME_MS / 1000
+    # 将 dBFS 阈值换算为 int16 幅度下的均方能量阈值
+    threshold = (10 ** (threshold_db / 20) * 32768) ** 2
+
+    silences = []
+    silence_start = None
+    frame_index = 0
+    process = subprocess.Popen(_ffmpeg_pcm_cmd(audio_path), stdout=subprocess.PIPE)
+    try:
+        while True:
+            data = process.stdout.read(frame_len * 2 * FRAMES_PER_READ)
+            if not data:
+                break
+            samples = np.frombuffer(data[:len(data) // 2 * 2], np.int16).astype(np.float32)
+            n_frames = len(samples) // frame_len
+            if n_frames == 0:
+                break
+            energy = np.mean(samples[:n_frames * frame_len].reshape(n_frames, frame_len) ** 2, axis=1)
+            for is_silent in energy < threshold:
+                if is_silent and silence_start is None:
+                    silence_start = frame_index * frame_seconds
+                elif not is_silent and silence_start is not None:
+                    if frame_index * frame_seconds - silence_start >= min_silence:
+                        silences.append((silence_start, frame_index * frame_seconds))
+                    silence_start = None
+                frame_index += 1
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, process.args)
+
+    total_duration = frame_index * frame_seconds
+    if silence_start is not None and total_duration - silence_start >= min_silence:
+        silences.append((silence_start, total_duration))
+    return silences, total_duration
+
+
+def plan_chunks(silences, total_duration, target_seconds=None, max_seconds=None):
+    """
+    根据静音区间规划分块：达到目标时长后在第一个静音的中点切分，超过最大时长仍无静音则强制切分
+    :return: [(start, end), ...]
+    """
+    target_seconds = target_seconds or TranscriptionConfig.CHUNK_TARGET_SECONDS
+    max_seconds = max(max_seconds or TranscriptionConfig.CHUNK_MAX_SECONDS, target_seconds)
+    cut_points = [(start + end) / 2 for start, end in silences]
+
+    chunks = []
+    chunk_start = 0.0
+    i = 0
+    while total_duration - chunk_start > max_seconds:
+        while i < len(cut_points) and cut_points[i] < chunk_start + target_seconds:
+            i += 1
+        if i < len(cut_points) and cut_points[i] <= chunk_start + max_seconds:
+            cut = cut_points[i]
+        else:
+            cut = chunk_start + max_seconds
+        chunks.append((chunk_start, cut))
+        chunk_start = cut
+    chunks.append((chunk_start, total_duration))
+    return chunks
+
+
+def _init_worker(threads):
+    """子进程初始化：限制每个进程的推理线程数，避免多个进程争抢 CPU"""
+    from config.model import ModelConfig
+
+    if not ModelConfig.CPU_THREADS:
+        ModelConfig.CPU_THREADS = threads
+    try:
+        import torch
+    except ImportError:
+        # 只安装了 faster-whisper 时没有 torch
+        return
+    torch.set_num_threads(threads)
+
+
+def _offset_words(words, offset):
+    return [dict(word, start=word['start'] + offset, end=word['end'] + offset) for word in words]
+
+
+def _transcribe_chunk(audio_path, start, end, model_name, language, task, word_timestamps=False, engine=None):
+    """在子进程中转录单个分块，返回加上分块偏移量后的片段"""
+    from src.model_registry import get_model
+
+    model = get_model(model_name, 'cpu', engine)
+    audio = load_audio_segment(audio_path, start, end)
+    result = model.transcribe(audio, language=language, task=task, fp16=False, word_timestamps=word_timestamps)
+    segments = []
+    for segment in result['segments']:
+        item = {'start': start + segment['start'], 'end': min(start + segment['end'], end), 'text': segment['text']}
+        if word_timestamps:
+            item['words'] = _offset_words(segment.get('words', []), start)
+        segments.append(item)
+    return segments
+
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """进程池常驻复用，子进程内的模型在多次请求之间保持已加载状态"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            # torch 与 fork 不兼容，这里使用 spawn 启动子进程
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                                        initializer=_init_worker, initargs=(threads,))
+            _pool_workers = workers
+        return _pool
+
+
+def _normalize_text(text):
+    return re.sub(r'[\W_]+', '', text).lower()
+
+
+def stitch_into(stitched, segments, seam_tolerance=1.0):
+    """
+    把一个分块的片段按时间顺序拼接到 stitched 末尾
+    去除分块接缝处重复识别的片段，并修正与前一片段重叠的开始时间；可能延长 stitched 最后一个片段的结束时间
+    """
+    for segment in segments:
+        text = segment['text'].strip()
+        if not text:
+            continue
+        if stitched:
+            previous = stitched[-1]
+            if (_normalize_text(text) == _normalize_text(previous['text'])
+                    and segment['start'] < previous['end'] + seam_tolerance):
+                previous['end'] = max(previous['end'], segment['end'])
+                continue
+            if segment['start'] < previous['end']:
+                segment = dict(segment, start=previous['end'])
+                if segment['end'] <= segment['start']:
+                    continue
+        item = {'start': segment['start'], 'end': segment['end'], 'text': text}
+        if 'words' in segment:
+            item['words'] = segment['words']
+        stitched.append(item)
+    return stitched
+
+
+def stitch_segments(chunk_results, seam_tolerance=1.0):
+    """按时间顺序拼接各分块的片段"""
+    stitched = []
+    for segments in chunk_results:
+        stitch_into(stitched, segments, seam_tolerance)
+    return stitched
+
+
+def transcribe_chunked(audio_path, model_name=None, language=None, task='transcribe', workers=None,
+                       target_seconds=None, max_seconds=None, word_timestamps=False, engine=None, on_progress=None):
+    """
+    在静音处把长音频切分成多个分块，用 CPU 进程池并行转录后拼接成完整的片段列表
+    每个子进程只解码自己负责的区间，主进程不会持有完整的解码音频
+    :param engine: 转录引擎名称，为空时使用 ModelConfig.DEFAULT_ENGINE
+    :param on_progress: 可选的回调 on_progress(比例, 新片段列表)，按时间顺序每完成一个分块回调一次；
+                        最后一个片段可能还会与下一分块的开头合并，留到下一次回调再交出
+    """
+    workers = workers or TranscriptionConfig.CHUNK_WORKERS
+    silences, total_duration = find_silences(audio_path)
+    chunks = plan_chunks(silences, total_duration, target_seconds, max_seconds)
+
+    pool = _get_pool(workers)
+    futures = [
+        pool.submit(_transcribe_chunk, audio_path, start, end, model_name, language, task, word_timestamps,
+                    engine)
+        for start, end in chunks
+    ]
+    if on_progress is None:
+        return stitch_segments(future.result() for future in futures)
+
+    stitched = []
+    emitted = 0
+    for (start, end), future in zip(chunks, futures):
+        stitch_into(stitched, future.result())
+        ready = len(stitched) - 1 if end < total_duration else len(stitched)
+        on_progress(end / total_duration if total_duration else 1.0, stitched[emitted:ready])
+        emitted = max(emitted, ready)
+    return stitched
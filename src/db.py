@@ -0,0 +1,45 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+from config.paths import PathConfig
+
+
+@contextmanager
+def connect(db_path):
+    """
+    打开一个自动提交模式的 SQLite 连接，用完即关
+    每次操作使用独立连接，避免跨线程共享 sqlite3 连接
+    """
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def init_db(db_path, schema):
+    """确保数据库所在目录存在，开启 WAL 并执行建表语句"""
+    PathConfig.ensure_dir(os.path.dirname(db_path))
+    with connect(db_path) as conn:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(schema)
+
+
+def ensure_columns(db_path, table, columns):
+    """
+    给已有的表补上后来新增的列（CREATE TABLE IF NOT EXISTS 不会修改旧表）
+    :param columns: {列名: 列定义}
+    """
+    with connect(db_path) as conn:
+        existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+        for name, definition in columns.items():
+            if name in existing:
+                continue
+            try:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+            except sqlite3.OperationalError:
+                # 其他进程同时完成了迁移
+                if name not in {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}:
+                    raise
@@ -0,0 +1,76 @@
+import os
+
+from config.encode import EncodeConfig
+
+
+class InvalidEncodeProfile(ValueError):
+    """档位名称或覆盖参数不合法"""
+
+
+def resolve_encode_profile(name=None, overrides=None):
+    """
+    解析编码档位，并应用按请求覆盖的 preset / crf / threads / tune
+    :return: 完整的档位字典，包含 name 字段，可直接写入接口响应
+    """
+    name = name or EncodeConfig.DEFAULT_PROFILE
+    if name not in EncodeConfig.PROFILES:
+        raise InvalidEncodeProfile(f'Unknown encode profile "{name}"')
+    profile = dict(EncodeConfig.PROFILES[name], name=name)
+    if profile['mode'] == 'soft':
+        return profile
+
+    profile.setdefault('threads', EncodeConfig.THREADS)
+    overrides = {key: value for key, value in (overrides or {}).items() if value not in (None, '')}
+    if 'preset' in overrides:
+        if overrides['preset'] not in EncodeConfig.PRESETS:
+            raise InvalidEncodeProfile(f'Unknown preset "{overrides["preset"]}"')
+        profile['preset'] = overrides['preset']
+    if 'tune' in overrides:
+        if overrides['tune'] not in EncodeConfig.TUNES:
+            raise InvalidEncodeProfile(f'Unknown tune "{overrides["tune"]}"')
+        profile['tune'] = overrides['tune']
+    try:
+        if 'crf' in overrides:
+            profile['crf'] = int(overrides['crf'])
+        if 'threads' in overrides:
+            profile['threads'] = int(overrides['threads'])
+    except (TypeError, ValueError):
+        raise InvalidEncodeProfile('crf and threads must be integers')
+    low, high = EncodeConfig.CRF_RANGE
+    if not low <= profile['crf'] <= high or profile['threads'] < 0:
+        raise InvalidEncodeProfile(f'crf must be within {low}-{high} and threads must not be negative')
+    return profile
+
+
+def faststart_args(output_path):
+    """
+    mp4 / mov 输出的 -movflags +faststart 参数：编码结束后把 moov 移到文件开头（多一次顺序改写），
+    下载过程中即可开始播放和拖动
+    """
+    if EncodeConfig.FASTSTART and os.path.splitext(output_path)[1].lower() in ('.mp4', '.m4v', '.mov'):
+        return ['-movflags', '+faststart']
+    return []
+
+
+def build_embed_command(video_path, subtitle_path, output_path, profile, faststart=True):
+    """
+    根据档位构造 ffmpeg 命令：burn 重新编码并烧录字幕，soft 以 mov_text 流复制封装
+    :param faststart: 是否按 faststart_args 处理输出；只作为中间文件的分段无需移动 moov
+    """
+    movflags = faststart_args(output_path) if faststart else []
+    if profile['mode'] == 'soft':
+        return [
+            'ffmpeg', '-nostdin', '-y', '-i', video_path, '-i', subtitle_path,
+            '-map', '0:v', '-map', '0:a?', '-map', '1:0',
+            '-c', 'copy', '-c:s', 'mov_text'
+        ] + movflags + [output_path]
+
+    cmd = [
+        'ffmpeg', '-nostdin', '-y', '-i', video_path, '-vf', f'subtitles={subtitle_path}',
+        '-c:v', 'libx264', '-preset', profile['preset'], '-crf', str(profile['crf']),
+        '-threads', str(profile['threads'])
+    ]
+    if profile.get('tune'):
+        cmd += ['-tune', profile['tune']]
+    cmd += ['-c:a', 'copy'] + movflags + [output_path]
+    return cmd
@@ -0,0 +1,239 @@
+import os
+import threading
+
+import numpy as np
+
+from config.model import ModelConfig
+
+# Whisper 系列模型的输入：16 kHz 单声道 float32
+SAMPLE_RATE = 16000
+# 语言检测只看第一个 30 秒窗口
+DETECT_WINDOW_SECONDS = 30
+
+
+class EngineUnavailable(Exception):
+    """转录引擎未安装或名称未知"""
+
+
+class EngineModel:
+    """
+    已加载的模型与所属引擎的组合，对调用方提供统一的接口：
+    - transcribe(audio, language, task, word_timestamps) -> {'text', 'segments': [{'start', 'end', 'text', 'words'?}], 'language'}
+    - detect_language(audio) -> (语言代码, 概率)
+    audio 可以是文件路径或 16 kHz float32 数组
+    on_progress(比例, 新片段列表) 在转录过程中回调，引擎能逐段产出时新片段会立即交给调用方
+    """
+
+    def __init__(self, engine, name, device, model):
+        self.engine = engine
+        self.name = name
+        self.device = device
+        self.model = model
+
+    def transcribe(self, audio, language=None, task='transcribe', word_timestamps=False, on_progress=None,
+                   **options):
+        return self.engine.transcribe(self.model, audio, language=language, task=task,
+                                      word_timestamps=word_timestamps, on_progress=on_progress, **options)
+
+    def detect_language(self, audio):
+        return self.engine.detect_language(self.model, as_array(audio))
+
+
+class Engine:
+    """转录引擎接口：负责加载模型、转录以及语言检测，输出统一为 openai-whisper 的片段格式"""
+
+    name = 'base'
+
+    def is_installed(self):
+        raise NotImplementedError
+
+    def available_models(self):
+        raise NotImplementedError
+
+    def is_available(self, model_name):
+        """模型名是否可用；本地模型目录也视为可用"""
+        return model_name in self.available_models() or os.path.isdir(model_name)
+
+    def load(self, model_name, device=None):
+        """加载并返回引擎原生的模型对象，由 ModelRegistry 负责缓存"""
+        raise NotImplementedError
+
+    def transcribe(self, model, audio, language=None, task='transcribe', word_timestamps=False, on_progress=None,
+                   **options):
+        raise NotImplementedError
+
+    def detect_language(self, model, audio):
+        raise NotImplementedError
+
+
+# 当前线程正在运行的 openai-whisper 转录的进度回调
+_whisper_progress = threading.local()
+_hook_lock = threading.Lock()
+
+
+def _install_whisper_progress_hook():
+    """
+    openai-whisper 没有进度回调，只在每个 30 秒窗口解码完成后更新 tqdm 进度条（默认禁用显示）
+    这里把 whisper.transcribe 模块使用的 tqdm 替换为会调用当前线程回调的子类，只安装一次
+    """
+    import whisper.transcribe as whisper_transcribe
+
+    with _hook_lock:
+        if getattr(whisper_transcribe.tqdm, 'progress_hook', False):
+            return
+        base = whisper_transcribe.tqdm.tqdm
+
+        class ProgressBar(base):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.callback = getattr(_whisper_progress, 'callback', None)
+                self.frames_total = kwargs.get('total') or 0
+                self.frames_done = 0
+
+            def update(self, n=1):
+                # 禁用显示时 tqdm 不会累计 n，这里自行计数
+                self.frames_done += n
+                if self.callback is not None and self.frames_total:
+                    self.callback(min(1.0, self.frames_done / self.frames_total), [])
+                return super().update(n)
+
+        class HookedTqdm:
+            progress_hook = True
+            tqdm = ProgressBar
+
+        whisper_transcribe.tqdm = HookedTqdm
+
+
+class OpenAIWhisperEngine(Engine):
+    """openai-whisper（PyTorch），有 GPU 时使用 GPU"""
+
+    name = 'openai-whisper'
+
+    def is_installed(self):
+        try:
+            import whisper  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def available_models(self):
+        import whisper
+        return whisper.available_models()
+
+    def load(self, model_name, device=None):
+        import whisper
+        return whisper.load_model(model_name, device=device)
+
+    def transcribe(self, model, audio, language=None, task='transcribe', word_timestamps=False, on_progress=None,
+                   **options):
+        """openai-whisper 只在整段转录结束后返回片段，转录过程中只能通过进度条钩子上报比例"""
+        if str(model.device) == 'cpu':
+            # CPU 不支持 fp16，显式关闭避免每次转录都打印警告
+            options.setdefault('fp16', False)
+        if on_progress is None:
+            return model.transcribe(audio, language=language, task=task, word_timestamps=word_timestamps, **options)
+
+        _install_whisper_progress_hook()
+        _whisper_progress.callback = on_progress
+        try:
+            result = model.transcribe(audio, language=language, task=task, word_timestamps=word_timestamps,
+                                      **options)
+        finally:
+            _whisper_progress.callback = None
+        on_progress(1.0, result['segments'])
+        return result
+
+    def detect_language(self, model, audio):
+        """只计算第一个 30 秒窗口的 log-mel 频谱，不运行完整转录"""
+        import whisper
+        window = whisper.pad_or_trim(audio[:DETECT_WINDOW_SECONDS * SAMPLE_RATE])
+        mel = whisper.log_mel_spectrogram(window, n_mels=model.dims.n_mels).to(model.device)
+        _, probs = model.detect_language(mel)
+        language = max(probs, key=probs.get)
+        return language, float(probs[language])
+
+
+class FasterWhisperEngine(Engine):
+    """
+    faster-whisper（CTranslate2）：CPU 上使用 int8 量化推理，速度和内存占用都明显优于 PyTorch 版本
+    计算精度与线程数由 ModelConfig.COMPUTE_TYPE / CPU_THREADS 控制
+    """
+
+    name = 'faster-whisper'
+
+    def is_installed(self):
+        try:
+            import faster_whisper  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def available_models(self):
+        import faster_whisper
+        return faster_whisper.available_models()
+
+    def load(self, model_name, device=None):
+        from faster_whisper import WhisperModel
+        return WhisperModel(model_name, device=device or 'auto', compute_type=ModelConfig.COMPUTE_TYPE,
+                            cpu_threads=ModelConfig.CPU_THREADS)
+
+    @staticmethod
+    def _segment_dict(segment, word_timestamps):
+        item = {'start': segment.start, 'end': segment.end, 'text': segment.text}
+        if word_timestamps:
+            item['words'] = [{'start': w.start, 'end': w.end, 'word': w.word, 'probability': w.probability}
+                             for w in segment.words or []]
+        return item
+
+    def transcribe(self, model, audio, language=None, task='transcribe', word_timestamps=False, on_progress=None,
+                   **options):
+        """片段是逐个解码出来的，每解码出一段就通过 on_progress 交给调用方"""
+        # fp16 等 openai-whisper 专有选项在这里没有意义
+        options.pop('fp16', None)
+        generator, info = model.transcribe(audio, language=language, task=task, word_timestamps=word_timestamps,
+                                           **options)
+        segments = []
+        for segment in generator:
+            item = self._segment_dict(segment, word_timestamps)
+            segments.append(item)
+            if on_progress is not None:
+                on_progress(min(1.0, item['end'] / info.duration) if info.duration else 0.0, [item])
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': info.language,
+        }
+
+    def detect_language(self, model, audio):
+        # transcribe 在返回前只做语言检测，片段是惰性生成的，不迭代就不会解码
+        _, info = model.transcribe(audio[:DETECT_WINDOW_SECONDS * SAMPLE_RATE])
+        return info.language, float(info.language_probability)
+
+
+ENGINES = {
+    OpenAIWhisperEngine.name: OpenAIWhisperEngine(),
+    FasterWhisperEngine.name: FasterWhisperEngine(),
+}
+
+
+def register_engine(engine):
+    ENGINES[engine.name] = engine
+
+
+def get_engine(name=None):
+    """按名称获取引擎，为空时使用 ModelConfig.DEFAULT_ENGINE；未安装时抛出 EngineUnavailable"""
+    name = ModelConfig.resolve_engine_name(name)
+    engine = ENGINES.get(name)
+    if engine is None:
+        raise EngineUnavailable(f'Unknown engine "{name}". Available: {", ".join(ENGINES)}')
+    if not engine.is_installed():
+        raise EngineUnavailable(f'Engine "{name}" is not installed')
+    return engine
+
+
+def as_array(audio):
+    """语言检测需要数组形式的音频；文件路径只解码前 30 秒"""
+    if isinstance(audio, np.ndarray):
+        return audio
+    from src.chunked_transcription import load_audio_segment
+    return load_audio_segment(audio, 0, DETECT_WINDOW_SECONDS)
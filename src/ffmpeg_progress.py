@@ -0,0 +1,48 @@
+import subprocess
+
+
+def probe_duration(path):
+    """用 ffprobe 读取容器时长（秒），读取失败或时长未知时返回 None"""
+    try:
+        result = subprocess.run([
+            'ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path
+        ], capture_output=True, check=True, text=True)
+        return float(result.stdout.strip()) or None
+    except (subprocess.CalledProcessError, ValueError, OSError):
+        return None
+
+
+def with_progress_output(cmd):
+    """在 ffmpeg 命令中加上 -progress pipe:1：以 key=value 行的形式把进度写到 stdout"""
+    return [cmd[0], '-progress', 'pipe:1', '-nostats'] + cmd[1:]
+
+
+def parse_progress(lines, duration, on_progress):
+    """
+    解析 -progress 输出，按 out_time 回调已完成的比例（0~1）
+    out_time_us 与旧版 ffmpeg 的 out_time_ms 单位都是微秒
+    """
+    for line in lines:
+        key, _, value = line.strip().partition('=')
+        if key in ('out_time_us', 'out_time_ms') and value.isdigit() and duration:
+            on_progress(min(1.0, int(value) / 1e6 / duration))
+        elif key == 'progress' and value == 'end':
+            on_progress(1.0)
+
+
+def run_ffmpeg(cmd, on_progress=None, duration=None):
+    """
+    运行 ffmpeg 命令，失败时抛出 CalledProcessError
+    :param on_progress: 可选的进度回调 on_progress(比例)，需要同时给出输出的预计时长 duration（秒）
+    """
+    if on_progress is None or not duration:
+        subprocess.run(cmd, check=True)
+        return
+    cmd = with_progress_output(cmd)
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    try:
+        parse_progress(process.stdout, duration, on_progress)
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
@@ -0,0 +1,142 @@
+import gzip
+import mimetypes
+import os
+from datetime import datetime, timezone
+
+from flask import Response, request
+from werkzeug.security import safe_join
+
+# 小于该大小的响应压缩收益不大，直接返回
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+# 服务器不支持 wsgi.file_wrapper 时逐块读取文件的块大小
+FILE_BLOCK_SIZE = 1 << 20
+
+
+def if_none_match(etag):
+    """请求的 If-None-Match 是否包含 etag（etag 为带引号的强校验值）"""
+    return request.if_none_match.contains(etag.strip('"')) or request.if_none_match.star_tag
+
+
+def not_modified(etag):
+    """客户端缓存仍然有效时返回 304 响应，否则返回 None"""
+    if etag and if_none_match(etag):
+        return '', 304, {'ETag': etag}
+    return None
+
+
+def gzip_response(response, min_bytes=GZIP_MIN_BYTES):
+    """客户端接受 gzip 且响应足够大时压缩响应体"""
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.status_code != 200 or 'Content-Encoding' in response.headers
+            or not request.accept_encodings['gzip']):
+        return response
+    data = response.get_data()
+    if len(data) < min_bytes:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+class _FileRange:
+    """从文件当前位置起最多读取 length 字节的响应体，没有 wsgi.file_wrapper 时使用"""
+
+    def __init__(self, file, length, block_size=FILE_BLOCK_SIZE):
+        self.file = file
+        self.remaining = length
+        self.block_size = block_size
+
+    def __iter__(self):
+        while self.remaining > 0:
+            data = self.file.read(min(self.block_size, self.remaining))
+            if not data:
+                break
+            self.remaining -= len(data)
+            yield data
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(stat):
+    """由修改时间与大小构成的强校验 ETag，文件被重新生成时随之变化"""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _if_range_matches(etag, last_modified):
+    """If-Range 与当前文件一致时才按 Range 返回部分内容，否则返回完整文件"""
+    if_range = request.if_range
+    if if_range.etag:
+        return if_range.etag == etag.strip('"')
+    if if_range.date:
+        return if_range.date == last_modified
+    return True
+
+
+def _byte_range(size, etag, last_modified):
+    """
+    解析 Range：返回 (start, stop)；不带 Range、多段或 If-Range 不一致时返回 None（按完整文件响应）；
+    无法满足时返回 False（416）
+    """
+    if 'Range' not in request.headers or not _if_range_matches(etag, last_modified):
+        return None
+    byte_range = request.range
+    # 格式错误、非 bytes 单位与多段 Range 按规范可以忽略，直接返回完整文件
+    if byte_range is None or byte_range.units != 'bytes' or len(byte_range.ranges) != 1:
+        return None
+    start, stop = byte_range.ranges[0]
+    if start < 0 and size > 0:
+        # 后缀长度超过文件大小时按规范返回整个文件（werkzeug 的 range_for_length 会判为无法满足）
+        return max(0, size + start), size
+    return byte_range.range_for_length(size) or False
+
+
+def send_file_range(directory, filename, mimetype=None):
+    """
+    发送 directory 下的文件，支持单段 Range（206 / 416）以及 If-None-Match / If-Modified-Since / If-Range 条件请求
+    响应体使用服务器提供的 wsgi.file_wrapper：文件已定位到起始偏移并设置了 Content-Length，
+    gunicorn 据此以 sendfile 零拷贝发送该区间（waitress 同样只发送 Content-Length 字节）；
+    werkzeug 的 send_file 会把部分内容包装成逐块读取的迭代器，无法走 sendfile
+    :return: Response，文件不存在时返回 None
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = file_etag(stat)
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': last_modified.strftime('%a, %d %b %Y %H:%M:%S GMT'),
+        'Accept-Ranges': 'bytes',
+        # 同名输出可能被重新生成，客户端每次用 ETag 重新校验
+        'Cache-Control': 'no-cache',
+    }
+
+    if request.if_none_match:
+        if if_none_match(etag):
+            return Response(status=304, headers=headers)
+    elif request.if_modified_since and request.if_modified_since >= last_modified:
+        return Response(status=304, headers=headers)
+
+    byte_range = _byte_range(size, etag, last_modified)
+    if byte_range is False:
+        headers['Content-Range'] = f'bytes */{size}'
+        return Response(status=416, headers=headers)
+    start, stop = byte_range or (0, size)
+    status = 206 if byte_range else 200
+    if byte_range:
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+    headers['Content-Length'] = str(stop - start)
+    mimetype = mimetype or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if request.method == 'HEAD':
+        return Response(status=status, headers=headers, mimetype=mimetype)
+
+    file = open(path, 'rb')
+    file.seek(start)
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    body = file_wrapper(file, FILE_BLOCK_SIZE) if file_wrapper else _FileRange(file, stop - start)
+    return Response(body, status=status, headers=headers, mimetype=mimetype, direct_passthrough=True)
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import re
+import subprocess
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from config.upload import UploadConfig
+from src.video_processing import audio_array_command, build_audio_stats
+
+
+class UploadTooLarge(Exception):
+    """上传内容超过 UploadConfig.MAX_UPLOAD_BYTES"""
+
+
+def reserve_unique_filename(directory, filename, max_attempts=1000):
+    """
+    原子地占用一个不重名的文件名，避免重名文件覆盖
+    以 O_CREAT | O_EXCL 创建空文件，已存在时依次尝试 name(2).ext、name(3).ext ……
+    多个线程或服务进程同时上传同名文件时不会拿到同一个名字；同名文件过多时改用随机后缀
+    :return: 已创建（空）文件的文件名
+    """
+    base, extension = os.path.splitext(filename)
+    # 移除 base 末尾已有的 (数字) 后缀，避免重复叠加
+    base = re.sub(r'\(\d+\)$', '', base)
+
+    candidates = (f"{base}{extension}" if counter == 1 else f"{base}({counter}){extension}"
+                  for counter in range(1, max_attempts + 1))
+    for candidate in candidates:
+        try:
+            os.close(os.open(os.path.join(directory, candidate), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+        except FileExistsError:
+            continue
+        return candidate
+
+    candidate = f"{base}_{uuid.uuid4().hex[:12]}{extension}"
+    os.close(os.open(os.path.join(directory, candidate), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+    return candidate
+
+
+class EarlyAudioExtractor:
+    """
+    上传过程中把收到的数据同时送入 ffmpeg 的 stdin，边上传边解码音频
+    对于 moov 在文件末尾的 mp4 等无法从管道读取的容器，ffmpeg 会失败，此时 finish() 返回 None，
+    由流水线在上传完成后按常规方式提取
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.process = subprocess.Popen(audio_array_command('pipe:0'), stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.failed = False
+        self._buffer = bytearray()
+        self._reader = threading.Thread(target=self._read_output, name='early-audio-reader', daemon=True)
+        self._reader.start()
+
+    def _read_output(self):
+        while True:
+            chunk = self.process.stdout.read(1 << 20)
+            if not chunk:
+                break
+            self._buffer += chunk
+
+    def feed(self, data):
+        if self.failed:
+            return
+        try:
+            self.process.stdin.write(data)
+        except (BrokenPipeError, OSError):
+            # ffmpeg 已经退出（容器无法从管道解析），后续数据不再送入
+            self.failed = True
+
+    def finish(self):
+        """上传结束：关闭 stdin 并等待解码完成，成功时返回 (audio, stats)，否则返回 None"""
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            self.failed = True
+        self._reader.join()
+        if self.process.wait() != 0 or self.failed or not self._buffer:
+            return None
+        audio = np.frombuffer(self._buffer, dtype=np.float32)
+        return audio, build_audio_stats(audio, time.perf_counter() - self._start, mode='early')
+
+    def abort(self):
+        self.failed = True
+        self.process.kill()
+        self._reader.join()
+        self.process.wait()
+
+
+class IngestFile:
+    """
+    上传数据直接写入 uploads/ 下的最终位置：边写边计算 SHA-256、限制大小，并可同时送入 EarlyAudioExtractor
+    提供 werkzeug 表单解析器所需的 write/seek/read 接口，可作为 multipart 解析的 stream_factory 返回值
+    """
+
+    def __init__(self, path, max_bytes=None, early_extract=None):
+        self.path = path
+        self.max_bytes = max_bytes or UploadConfig.MAX_UPLOAD_BYTES
+        self.size = 0
+        # 从开始接收到 finish() 的耗时，作为任务的 upload_save 阶段记录
+        self.started = time.perf_counter()
+        self.save_seconds = None
+        # 只有被上传接口接受的文件才会保留，请求结束时其余文件会被删除
+        self.accepted = False
+        self._sha256 = hashlib.sha256()
+        self._file = open(path, 'w+b')
+        if early_extract is None:
+            early_extract = UploadConfig.EARLY_EXTRACT
+        self.extractor = EarlyAudioExtractor() if early_extract else None
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.discard()
+            raise UploadTooLarge(f'Upload exceeds {self.max_bytes} bytes')
+        self._sha256.update(data)
+        self._file.write(data)
+        if self.extractor is not None:
+            self.extractor.feed(data)
+        return len(data)
+
+    def copy_from(self, stream, chunk_size=None):
+        """从请求体等可读流中逐块读取并写入"""
+        chunk_size = chunk_size or UploadConfig.CHUNK_SIZE
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            self.write(chunk)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def readline(self, *args):
+        return self._file.readline(*args)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def finish(self):
+        """
+        上传完成：关闭文件并取回提前提取的音频
+        :return: (内容哈希, 字节数, (audio, stats) 或 None)
+        """
+        self.close()
+        self.accepted = True
+        early_audio = self.extractor.finish() if self.extractor is not None else None
+        self.save_seconds = time.perf_counter() - self.started
+        return self._sha256.hexdigest(), self.size, early_audio
+
+    def discard(self):
+        """放弃本次上传，删除已写入的部分文件"""
+        self.close()
+        if self.extractor is not None and not self.accepted:
+            self.extractor.abort()
+        self.accepted = False
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import deque
+
+from config.jobs import JobConfig
+
+# 事件类型
+EVENT_PROGRESS = 'progress'
+EVENT_CUE = 'cue'
+EVENT_DONE = 'done'
+EVENT_FAILED = 'failed'
+TERMINAL_EVENTS = (EVENT_DONE, EVENT_FAILED)
+
+
+class _Stream:
+    __slots__ = ('events', 'next_id', 'closed_at')
+
+    def __init__(self, history):
+        self.events = deque(maxlen=history)
+        self.next_id = 1
+        self.closed_at = None
+
+
+class JobEvents:
+    """
+    进程内的任务事件流：工作线程发布阶段进度与新转录出的字幕条目，SSE 连接订阅
+    每个事件带有递增的 id，断线重连时通过 Last-Event-ID 从断点继续；任务结束后事件保留一段时间再清理
+    """
+
+    def __init__(self, history=None, retention=None):
+        self.history = history or JobConfig.EVENT_HISTORY
+        self.retention = JobConfig.EVENT_RETENTION_SECONDS if retention is None else retention
+        self._streams = {}
+        self._cond = threading.Condition()
+
+    def publish(self, job_id, event, data):
+        """发布事件并唤醒所有订阅者，返回事件 id"""
+        with self._cond:
+            stream = self._streams.get(job_id)
+            if stream is None:
+                stream = self._streams[job_id] = _Stream(self.history)
+            event_id = stream.next_id
+            stream.next_id += 1
+            stream.events.append((event_id, event, data))
+            if event in TERMINAL_EVENTS:
+                stream.closed_at = time.monotonic()
+            self._cond.notify_all()
+            self._expire_locked()
+        return event_id
+
+    def has(self, job_id):
+        with self._cond:
+            return job_id in self._streams
+
+    def _expire_locked(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, stream in self._streams.items()
+                   if stream.closed_at is not None and now - stream.closed_at > self.retention]
+        for job_id in expired:
+            del self._streams[job_id]
+
+    def subscribe(self, job_id, last_id=0, keepalive=None):
+        """
+        按顺序产出 last_id 之后的事件 (id, event, data)，任务结束事件产出后停止
+        超过 keepalive 秒没有新事件时产出 None，调用方据此发送心跳
+        """
+        keepalive = keepalive or JobConfig.SSE_KEEPALIVE_SECONDS
+        while True:
+            with self._cond:
+                pending = self._pending_locked(job_id, last_id)
+                if not pending:
+                    self._cond.wait(keepalive)
+                    pending = self._pending_locked(job_id, last_id)
+            if not pending:
+                yield None
+                continue
+            for item in pending:
+                last_id = item[0]
+                yield item
+                if item[1] in TERMINAL_EVENTS:
+                    return
+
+    def _pending_locked(self, job_id, last_id):
+        stream = self._streams.get(job_id)
+        if stream is None or stream.next_id - 1 <= last_id:
+            return []
+        return [item for item in stream.events if item[0] > last_id]
+
+
+job_events = JobEvents()
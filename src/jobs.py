@@ -0,0 +1,438 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+
+from config.jobs import JobConfig
+from src.db import connect, init_db, ensure_columns
+from src.job_events import job_events, EVENT_PROGRESS, EVENT_DONE, EVENT_FAILED
+from src.metrics import job_timings
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+
+
+class Broker:
+    """
+    任务代理接口：API 节点提交任务，工作进程（服务内的线程或独立的 worker.py）按队列认领并回写进度与结果
+    每个任务处在一个队列（queue）中，分阶段执行的任务完成一个阶段后通过 advance 进入下一个队列重新排队，
+    只处理部分阶段的工作进程只认领对应队列中的任务
+    实现需要保证 claim_next 在多个进程之间是原子的，并在工作进程失联（租约过期）后让任务重新排队
+    """
+
+    name = 'base'
+
+    def create(self, params, result=None, queue=''):
+        """新建排队中的任务并返回任务字典；传入 result 时直接创建为已完成的任务"""
+        raise NotImplementedError
+
+    def get(self, job_id):
+        raise NotImplementedError
+
+    def claim_next(self, queues=None, worker=None):
+        """原子地认领 queues（None 表示任意队列）中最早排队的任务，没有任务时返回 None"""
+        raise NotImplementedError
+
+    def extend_lease(self, job_id, worker):
+        raise NotImplementedError
+
+    def update_progress(self, job_id, stage, progress):
+        raise NotImplementedError
+
+    def advance(self, job_id, queue, state):
+        """当前阶段完成：任务带着中间结果 state 进入 queue 重新排队"""
+        raise NotImplementedError
+
+    def finish(self, job_id, result):
+        raise NotImplementedError
+
+    def fail(self, job_id, error):
+        raise NotImplementedError
+
+    def requeue_interrupted(self):
+        """把租约已过期（工作进程崩溃或服务重启）的运行中任务重新放回队列，返回任务数"""
+        raise NotImplementedError
+
+    def active(self):
+        """排队中与运行中的任务"""
+        raise NotImplementedError
+
+    def count(self, status):
+        raise NotImplementedError
+
+
+class JobStore(Broker):
+    """
+    基于 SQLite 的任务库，任务参数与结果以 JSON 保存
+    同一台机器上的多个服务进程与工作进程共享 DB_PATH 即可协作：认领在 BEGIN IMMEDIATE 事务中完成
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or JobConfig.DB_PATH
+        init_db(self.db_path, """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                stage TEXT,
+                progress REAL NOT NULL DEFAULT 0,
+                params TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+        """)
+        # 分阶段执行与工作进程租约是后来加入的列，旧的任务库在这里补上
+        ensure_columns(self.db_path, 'jobs', {
+            'queue': "TEXT NOT NULL DEFAULT ''",
+            'worker': 'TEXT',
+            'lease_until': 'REAL',
+        })
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'queue': row['queue'],
+            'stage': row['stage'],
+            'progress': row['progress'],
+            'params': json.loads(row['params']),
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'worker': row['worker'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+
+    def create(self, params, result=None, queue=''):
+        """
+        新建排队中的任务并返回任务字典
+        传入 result 时直接创建为已完成的任务（例如结果全部命中缓存）
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        if result is None:
+            status, stage, progress = STATUS_QUEUED, STATUS_QUEUED, 0
+        else:
+            status, stage, progress = STATUS_SUCCEEDED, 'done', 100
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, queue, stage, progress, params, result, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, status, queue, stage, progress, json.dumps(params),
+                 json.dumps(result) if result is not None else None, now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def claim_next(self, queues=None, worker=None):
+        """原子地取出最早排队的任务并标记为运行中，同时登记认领的工作进程与租约；没有任务时返回 None"""
+        sql = 'SELECT id FROM jobs WHERE status = ?'
+        args = [STATUS_QUEUED]
+        if queues is not None:
+            sql += f" AND queue IN ({', '.join('?' * len(queues))})"
+            args += list(queues)
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(sql + ' ORDER BY created_at LIMIT 1', args).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                now = time.time()
+                conn.execute(
+                    'UPDATE jobs SET status = ?, worker = ?, lease_until = ?, updated_at = ? WHERE id = ?',
+                    (STATUS_RUNNING, worker, now + JobConfig.LEASE_SECONDS, now, row['id'])
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return self.get(row['id'])
+
+    def extend_lease(self, job_id, worker):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ? AND worker IS ?',
+                (time.time() + JobConfig.LEASE_SECONDS, job_id, STATUS_RUNNING, worker)
+            )
+
+    def update_progress(self, job_id, stage, progress):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET stage = ?, progress = ?, updated_at = ? WHERE id = ?',
+                (stage, round(progress, 1), time.time(), job_id)
+            )
+
+    def advance(self, job_id, queue, state):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, queue = ?, result = ?, worker = NULL, lease_until = NULL, '
+                'updated_at = ? WHERE id = ?',
+                (STATUS_QUEUED, queue, json.dumps(state), time.time(), job_id)
+            )
+
+    def finish(self, job_id, result):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, stage = ?, progress = 100, result = ?, lease_until = NULL, '
+                'updated_at = ? WHERE id = ?',
+                (STATUS_SUCCEEDED, 'done', json.dumps(result), time.time(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ? WHERE id = ?',
+                (STATUS_FAILED, error, time.time(), job_id)
+            )
+
+    def requeue_interrupted(self):
+        """
+        把租约已过期的运行中任务重新放回原来的队列（已完成的阶段不会重做）
+        运行中的工作进程会定时续约，其他节点上仍在运行的任务不受影响
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET status = ?, stage = ?, progress = 0, worker = NULL, lease_until = NULL, '
+                'updated_at = ? WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)',
+                (STATUS_QUEUED, STATUS_QUEUED, time.time(), STATUS_RUNNING, time.time())
+            )
+            return cursor.rowcount
+
+    def active(self):
+        """排队中与运行中的任务"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT * FROM jobs WHERE status IN (?, ?)', (STATUS_QUEUED, STATUS_RUNNING)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def count(self, status):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (status,)).fetchone()[0]
+
+
+BROKERS = {
+    JobStore.name: JobStore,
+}
+
+
+def register_broker(broker_class):
+    BROKERS[broker_class.name] = broker_class
+
+
+def get_broker(name=None):
+    """按名称创建任务代理，为空时使用 JobConfig.BROKER"""
+    name = name or JobConfig.BROKER
+    broker_class = BROKERS.get(name)
+    if broker_class is None:
+        raise ValueError(f'Unknown job broker "{name}". Available: {", ".join(BROKERS)}')
+    return broker_class()
+
+
+class JobFailed(Exception):
+    """流水线阶段失败时抛出，消息会作为任务的 error 返回给客户端"""
+
+
+class NextStage:
+    """
+    处理函数返回该对象表示当前阶段已完成，任务进入 queue 重新排队，由处理该阶段的工作进程继续
+    state 保存为任务的中间结果，下一阶段从 job['result'] 中读取
+    """
+
+    def __init__(self, queue, state):
+        self.queue = queue
+        self.state = state
+
+
+class JobReporter:
+    """
+    任务进度上报：report(stage, progress) 推送进度事件并写入任务库，report.emit(event, data) 只推送事件
+    ffmpeg 与转录的进度回调非常频繁，进度事件只在整数百分比变化时推送，任务库按 PROGRESS_WRITE_INTERVAL 节流写入
+    """
+
+    def __init__(self, store, events, job_id):
+        self.store = store
+        self.events = events
+        self.job_id = job_id
+        self._stage = None
+        self._percent = None
+        self._written_at = 0.0
+
+    def __call__(self, stage, progress):
+        percent = int(progress)
+        stage_changed = stage != self._stage
+        if not stage_changed and percent == self._percent:
+            return
+        self._stage, self._percent = stage, percent
+        self.emit(EVENT_PROGRESS, {'stage': stage, 'progress': round(progress, 1)})
+
+        now = time.monotonic()
+        if stage_changed or now - self._written_at >= JobConfig.PROGRESS_WRITE_INTERVAL:
+            self._written_at = now
+            self.store.update_progress(self.job_id, stage, progress)
+
+    def emit(self, event, data):
+        self.events.publish(self.job_id, event, data)
+
+
+class _LeaseHeartbeat:
+    """任务运行期间每隔三分之一个租约时长续约一次，模型加载等长时间没有进度的阶段也不会被判定为失联"""
+
+    def __init__(self, store, job_id, worker):
+        self.store = store
+        self.job_id = job_id
+        self.worker = worker
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'lease-{job_id[:8]}', daemon=True)
+
+    def _run(self):
+        while not self._done.wait(JobConfig.LEASE_SECONDS / 3):
+            try:
+                self.store.extend_lease(self.job_id, self.worker)
+            except Exception:
+                logger.exception('任务 %s 续约失败', self.job_id)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+
+
+class JobQueue:
+    """
+    有界工作线程池：线程从任务库中认领任务并执行处理函数
+    处理函数签名为 handler(job, report)，report 为 JobReporter：report(stage, progress) 上报阶段与进度，
+    report.emit(event, data) 推送其他事件（例如新转录出的字幕条目）；返回 NextStage 时任务进入下一个队列
+    传入 slots（HeavySlots）时，工作线程先占到节点上的重任务槽位才认领任务，多个服务进程合计不超过槽位数
+    queues 限定只认领这些队列中的任务（None 表示全部），用于按阶段分工的工作进程
+    recover=False 时启动不恢复中断的任务，多进程部署中由主进程在派生工作进程前统一恢复
+    """
+
+    def __init__(self, store, handler, max_workers=None, poll_interval=None, events=None, slots=None,
+                 recover=True, queues=None):
+        self.store = store
+        self.handler = handler
+        self.events = events or job_events
+        # 0 表示本进程不执行任务，只负责提交（任务由独立的工作进程处理）
+        self.max_workers = max(0, JobConfig.MAX_WORKERS if max_workers is None else max_workers)
+        self.poll_interval = poll_interval or JobConfig.POLL_INTERVAL
+        self.slots = slots
+        self.recover = recover
+        self.queues = queues
+        self.worker_id = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._recovered_at = 0.0
+
+    def start(self):
+        """启动工作线程（可重复调用），启动前恢复租约已过期的任务"""
+        with self._start_lock:
+            if self._threads or not self.max_workers:
+                return
+            # 在 start 时确定：gunicorn 等在 fork 之后才启动工作线程
+            self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+            if self.recover:
+                self._recover()
+            for i in range(self.max_workers):
+                thread = threading.Thread(target=self._worker_loop, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, wait=False):
+        """停止认领新任务；wait=True 时等待正在运行的任务结束"""
+        self._stop.set()
+        self._wakeup.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def submit(self, params, queue=''):
+        """新建任务并唤醒空闲的工作线程"""
+        job = self.store.create(params, queue=queue)
+        self._wakeup.set()
+        return job
+
+    def _recover(self):
+        self._recovered_at = time.monotonic()
+        requeued = self.store.requeue_interrupted()
+        if requeued:
+            logger.info('重新排队 %d 个中断的任务', requeued)
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            slot = self.slots.try_acquire() if self.slots is not None else nullcontext()
+            if slot is None:
+                # 节点上的槽位都被占用（可能是其他服务进程的任务或同步烧录），稍后再试
+                self._stop.wait(self.poll_interval)
+                continue
+            with slot:
+                job = self.store.claim_next(self.queues, self.worker_id)
+                if job is not None:
+                    self._run(job)
+                    continue
+            # 空闲时定期回收失联工作进程留下的任务
+            if self.recover and time.monotonic() - self._recovered_at >= JobConfig.LEASE_SECONDS:
+                self._recover()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _run(self, job):
+        job_id = job['id']
+        report = JobReporter(self.store, self.events, job_id)
+        # 分阶段任务的后续阶段从中间结果中接上之前的耗时记录
+        state = job['result'] or {}
+
+        try:
+            # 各阶段的 wall / CPU / 峰值 RSS 记录随结果返回，并写入结构化的任务耗时日志
+            with _LeaseHeartbeat(self.store, job_id, self.worker_id), \
+                    job_timings(job_id, state.get('timings') or job['params'].get('upload_timings'),
+                                state.get('elapsed', 0.0), job['queue']) as run:
+                result = self.handler(job, report)
+                run.final = not isinstance(result, NextStage)
+            if isinstance(result, NextStage):
+                result.state.update(timings=run.stages, elapsed=run.elapsed)
+                self.store.advance(job_id, result.queue, result.state)
+                self._wakeup.set()
+                return
+            if isinstance(result, dict):
+                result['timings'] = run.stages
+            self.store.finish(job_id, result)
+        except JobFailed as e:
+            logger.warning('任务 %s 失败: %s', job_id, e)
+            self._fail(job_id, str(e))
+        except Exception as e:
+            logger.exception('任务 %s 执行出错', job_id)
+            self._fail(job_id, f'{type(e).__name__}: {e}')
+        else:
+            self.events.publish(job_id, EVENT_DONE, {'status': STATUS_SUCCEEDED})
+
+    def _fail(self, job_id, error):
+        self.store.fail(job_id, error)
+        self.events.publish(job_id, EVENT_FAILED, {'status': STATUS_FAILED, 'error': error})
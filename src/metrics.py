@@ -0,0 +1,375 @@
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from config.metrics import MetricsConfig
+from config.paths import PathConfig
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# 阶段耗时直方图的桶（秒）：上传保存、模型加载等从亚秒到长视频烧录的小时级
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def current_rss_bytes():
+    """当前进程的常驻内存（Linux 读取 /proc/self/statm），无法读取时返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _maxrss_bytes(children=False):
+    """getrusage 的峰值 RSS（Linux 上单位为 KB，macOS 上为字节），没有 resource 模块时返回 None"""
+    if resource is None:
+        return None
+    value = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return value if sys.platform == 'darwin' else value * 1024
+
+
+def _cpu_seconds():
+    """本进程与已结束子进程的 CPU 时间之和；没有 resource 模块时无法统计子进程，返回 None"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + usage.ru_utime + usage.ru_stime
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    进程内的指标注册表，以 Prometheus 文本格式导出
+    - 计数器、仪表盘与直方图在事件发生时更新
+    - 队列深度、缓存命中率等已有统计通过 collector 在抓取时读取，不重复计数
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def describe(self, name, kind, help_text):
+        self._meta[name] = (kind, help_text)
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def inc(self, name, labels=None, value=1):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, labels=None):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, labels=None, buckets=STAGE_BUCKETS):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def mean(self, name, labels=None):
+        """直方图的平均值，尚无观测时返回 None"""
+        with self._lock:
+            histogram = self._histograms.get(self._key(name, labels))
+            if histogram is None or not histogram.count:
+                return None
+            return histogram.sum / histogram.count
+
+    def register_collector(self, collector):
+        """collector() 返回 [(指标名, 类型, 说明, [(标签字典, 值), ...]), ...]，每次抓取时调用"""
+        self._collectors.append(collector)
+
+    def render(self):
+        """导出 Prometheus 文本格式（text/plain; version=0.0.4）"""
+        families = {}
+
+        def family(name, kind=None, help_text=None):
+            if name not in families:
+                meta_kind, meta_help = self._meta.get(name, (kind or 'untyped', help_text or name))
+                families[name] = (meta_kind, meta_help, [])
+            return families[name][2]
+
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                family(name, 'counter').append((name, dict(labels), value))
+            for (name, labels), value in self._gauges.items():
+                family(name, 'gauge').append((name, dict(labels), value))
+            for (name, labels), histogram in self._histograms.items():
+                samples = family(name, 'histogram')
+                labels = dict(labels)
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    samples.append((f'{name}_bucket', dict(labels, le=_format_value(float(bound))), count))
+                samples.append((f'{name}_bucket', dict(labels, le='+Inf'), histogram.count))
+                samples.append((f'{name}_sum', labels, histogram.sum))
+                samples.append((f'{name}_count', labels, histogram.count))
+
+        for collector in self._collectors:
+            try:
+                collected = collector()
+            except Exception:
+                logger.exception('Metrics collector failed')
+                continue
+            for name, kind, help_text, samples in collected:
+                family(name, kind, help_text).extend((name, labels, value) for labels, value in samples)
+
+        lines = []
+        for name, (kind, help_text, samples) in families.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample_name, labels, value in samples:
+                if value is not None:
+                    lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.describe('pipeline_stage_seconds', 'histogram', 'Wall time of pipeline stages in seconds')
+metrics.describe('pipeline_stage_cpu_seconds', 'histogram',
+                 'CPU time (service process plus finished ffmpeg children) of pipeline stages in seconds')
+metrics.describe('pipeline_stage_peak_rss_bytes', 'gauge', 'Peak resident memory of the last run of each stage')
+metrics.describe('pipeline_stage_total', 'counter', 'Pipeline stage runs by outcome')
+metrics.describe('jobs_total', 'counter', 'Finished jobs by outcome')
+metrics.describe('job_seconds', 'histogram', 'Total processing time of finished jobs in seconds')
+
+
+class _RssSampler:
+    """阶段运行期间定时采样进程 RSS，记录峰值；读不到 /proc 时回落到进程生命周期内的峰值"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or MetricsConfig.RSS_SAMPLE_INTERVAL
+        self.peak = current_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss_bytes()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    def stop(self):
+        if self._thread is None:
+            return _maxrss_bytes()
+        self._stop.set()
+        self._thread.join()
+        rss = current_rss_bytes()
+        return max(self.peak, rss or 0)
+
+
+_current = threading.local()
+
+
+def record_stage(stage, wall_seconds, cpu_seconds=None, peak_rss_bytes=None, status='ok', **extra):
+    """记录一次阶段运行并追加到当前线程正在执行的任务的耗时记录中，返回该记录"""
+    sample = {'stage': stage, 'status': status, 'wall_seconds': round(wall_seconds, 4)}
+    if cpu_seconds is not None:
+        sample['cpu_seconds'] = round(cpu_seconds, 4)
+    if peak_rss_bytes is not None:
+        sample['peak_rss_bytes'] = peak_rss_bytes
+    sample.update(extra)
+
+    labels = {'stage': stage}
+    metrics.observe('pipeline_stage_seconds', wall_seconds, labels)
+    if cpu_seconds is not None:
+        metrics.observe('pipeline_stage_cpu_seconds', cpu_seconds, labels)
+    if peak_rss_bytes is not None:
+        metrics.set('pipeline_stage_peak_rss_bytes', peak_rss_bytes, labels)
+    metrics.inc('pipeline_stage_total', {'stage': stage, 'status': status})
+
+    timings = getattr(_current, 'timings', None)
+    if timings is not None:
+        timings.append(sample)
+    return sample
+
+
+@contextmanager
+def measure_stage(stage, **extra):
+    """
+    测量一个流水线阶段的 wall 时间、CPU 时间与峰值 RSS
+    CPU 时间包括本进程所有线程以及阶段内结束的 ffmpeg 子进程；多个任务并发时会互相计入
+    子进程的内存峰值单独记为 child_peak_rss_bytes（只在阶段内出现了更大的子进程时记录）
+    没有 resource 模块的平台（Windows）不记录 CPU 时间，读不到 /proc 时也不记录内存峰值
+    """
+    start = time.perf_counter()
+    cpu_start = _cpu_seconds()
+    child_rss_start = _maxrss_bytes(children=True)
+    sampler = _RssSampler().start()
+    status = 'ok'
+    try:
+        yield
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        peak_rss = sampler.stop()
+        child_rss = _maxrss_bytes(children=True)
+        if child_rss is not None and child_rss > child_rss_start:
+            extra['child_peak_rss_bytes'] = child_rss
+        cpu_end = _cpu_seconds()
+        record_stage(stage, time.perf_counter() - start,
+                     cpu_end - cpu_start if cpu_start is not None else None, peak_rss, status, **extra)
+
+
+_timing_logger = None
+_timing_logger_lock = threading.Lock()
+
+
+def timing_logger():
+    """每个任务一行 JSON 的耗时日志，写入 MetricsConfig.TIMING_LOG_PATH，同时传给根日志"""
+    global _timing_logger
+    with _timing_logger_lock:
+        if _timing_logger is None:
+            log = logging.getLogger('video_processing.job_timings')
+            log.setLevel(logging.INFO)
+            try:
+                PathConfig.ensure_dir(os.path.dirname(MetricsConfig.TIMING_LOG_PATH))
+                handler = logging.FileHandler(MetricsConfig.TIMING_LOG_PATH)
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                log.addHandler(handler)
+            except OSError:
+                logger.exception('Cannot open job timing log %s', MetricsConfig.TIMING_LOG_PATH)
+            _timing_logger = log
+        return _timing_logger
+
+
+class JobRun:
+    """
+    一次任务运行的耗时记录：stages 为各阶段记录（随阶段运行不断追加，可放入任务结果），
+    elapsed 为包括之前各次运行在内的累计处理时间
+    分阶段执行的任务（先转录、再由其他工作进程烧录）在未完成的运行中把 final 设为 False，只在最后一次运行时计入任务计数
+    """
+
+    def __init__(self, stages, elapsed=0.0):
+        self.stages = stages
+        self.elapsed = elapsed
+        self.final = True
+
+
+@contextmanager
+def job_timings(job_id, initial=None, elapsed=0.0, queue=None):
+    """
+    收集当前线程中一个任务的各阶段记录，产出 JobRun；结束时写一行结构化日志，任务完成或失败时更新任务计数
+    :param initial: 之前已有的阶段记录（上传阶段，或分阶段任务前几次运行的记录）
+    :param elapsed: 之前各次运行累计的处理时间（秒）
+    :param queue: 本次运行所在的任务队列（阶段），写入日志
+    """
+    run = JobRun(list(initial or []), elapsed)
+    previous = getattr(_current, 'timings', None)
+    _current.timings = run.stages
+    start = time.perf_counter()
+    status = 'succeeded'
+    try:
+        yield run
+    except BaseException:
+        status = 'failed'
+        run.final = True
+        raise
+    finally:
+        _current.timings = previous
+        run.elapsed = elapsed + time.perf_counter() - start
+        if run.final:
+            metrics.inc('jobs_total', {'status': status})
+            metrics.observe('job_seconds', run.elapsed)
+        record = {
+            'event': 'job_timings',
+            'job_id': job_id,
+            'status': status if run.final else 'stage_done',
+            'total_seconds': round(run.elapsed, 4),
+            'stages': run.stages,
+        }
+        if queue:
+            record['queue'] = queue
+        timing_logger().info(json.dumps(record, ensure_ascii=False))
+
+
+@contextmanager
+def maybe_profile(enabled, name):
+    """
+    enabled 时对当前线程开启 cProfile，结束后写入 PROFILE_DIR/<name>.prof 并产出文件名；否则产出 None
+    只统计调用线程，进程池与 ffmpeg 子进程中的耗时不在其中
+    """
+    if not enabled:
+        yield None
+        return
+    PathConfig.ensure_dir(MetricsConfig.PROFILE_DIR)
+    filename = f'{name}.prof'
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield filename
+    finally:
+        profiler.disable()
+        profiler.dump_stats(os.path.join(MetricsConfig.PROFILE_DIR, filename))
+
+
+def stats_collector(cache_name, stats):
+    """把 stats() 返回 hits / misses / hit_rate 的缓存包装为 collector"""
+    def collect():
+        data = stats()
+        labels = {'cache': cache_name}
+        return [
+            ('cache_hits_total', 'counter', 'Cache hits', [(labels, data['hits'])]),
+            ('cache_misses_total', 'counter', 'Cache misses', [(labels, data['misses'])]),
+            ('cache_hit_ratio', 'gauge', 'Cache hit ratio since start', [(labels, data['hit_rate'])]),
+        ]
+    return collect
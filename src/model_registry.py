@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config.model import ModelConfig
+from src.engines import EngineModel, get_engine
+from src.metrics import measure_stage
+
+
+class ModelRegistry:
+    """
+    进程级转录模型注册表
+    同一个 (引擎, 模型名, 设备) 只加载一次并在所有请求间共享，超过常驻上限时按 LRU 淘汰
+    返回的是 EngineModel，调用方不需要关心具体的引擎实现
+    """
+
+    def __init__(self, max_resident=None, loader=None):
+        self.max_resident = max(1, max_resident or ModelConfig.MAX_RESIDENT_MODELS)
+        # loader(engine, model_name, device) -> EngineModel
+        self._loader = loader or self._load_engine_model
+        self._models = OrderedDict()
+        # 全局锁只保护字典和计数器，真正的加载在按 key 划分的锁里进行，避免阻塞其他模型的命中
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._load_seconds = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds_total = 0.0
+
+    @staticmethod
+    def _make_key(name, device, engine=None):
+        return (ModelConfig.resolve_engine_name(engine), ModelConfig.resolve_model_name(name),
+                device if device is not None else ModelConfig.DEVICE)
+
+    @staticmethod
+    def _load_engine_model(engine, name, device):
+        backend = get_engine(engine)
+        return EngineModel(backend, name, device, backend.load(name, device=device))
+
+    @staticmethod
+    def is_available(name, engine=None):
+        """判断模型名是否为该引擎支持的模型（引擎未安装时抛出 EngineUnavailable）"""
+        return get_engine(engine).is_available(name)
+
+    def _lookup(self, key):
+        """在持有全局锁时调用：命中则刷新 LRU 顺序并计数"""
+        model = self._models.get(key)
+        if model is not None:
+            self._models.move_to_end(key)
+            self.hits += 1
+        return model
+
+    def get(self, name=None, device=None, engine=None):
+        """获取模型，未加载时加载；并发请求同一模型时只会加载一次"""
+        key = self._make_key(name, device, engine)
+        with self._lock:
+            model = self._lookup(key)
+            if model is not None:
+                return model
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                # 等锁期间可能已由其他线程加载完成
+                model = self._lookup(key)
+                if model is not None:
+                    return model
+                self.misses += 1
+
+            start = time.perf_counter()
+            with measure_stage('model_load', engine=key[0], model=key[1]):
+                model = self._loader(*key)
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self._models[key] = model
+                self._load_seconds[key] = elapsed
+                self.load_seconds_total += elapsed
+                self._evict_locked()
+        return model
+
+    def _evict_locked(self):
+        """淘汰最久未使用的模型，正在使用它的请求仍持有引用，结束后由 GC 回收"""
+        while len(self._models) > self.max_resident:
+            key, _ = self._models.popitem(last=False)
+            self._load_seconds.pop(key, None)
+            self.evictions += 1
+
+    def warm_up(self, names=None, device=None, engine=None):
+        """预热模型，通常在服务启动时调用"""
+        for name in names or ModelConfig.get_warmup_models():
+            self.get(name, device, engine)
+
+    def stats(self):
+        """返回命中、未命中、淘汰次数以及各常驻模型的加载耗时"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+                'load_seconds_total': round(self.load_seconds_total, 3),
+                'max_resident': self.max_resident,
+                'resident': [
+                    {'engine': key[0], 'model': key[1], 'device': key[2], 'load_seconds': round(self._load_seconds[key], 3)}
+                    for key in self._models
+                ],
+            }
+
+
+registry = ModelRegistry()
+
+
+def get_model(name=None, device=None, engine=None):
+    """从进程级注册表获取共享的转录模型"""
+    return registry.get(name, device, engine)
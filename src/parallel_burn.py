@@ -0,0 +1,175 @@
+import csv
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config.encode import EncodeConfig
+from src.encode_profiles import faststart_args
+from src.subtitle_io import read_cues, seconds_to_ms, write_cues
+from src.video_processing import embed_subtitles
+
+logger = logging.getLogger(__name__)
+
+
+def probe_keyframes(video_path):
+    """
+    读取视频时长与所有关键帧的时间点（秒）
+    只读取 packet 的标志位，不需要解码画面
+    """
+    result = subprocess.run([
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags:format=duration', '-of', 'csv=p=0', video_path
+    ], capture_output=True, check=True, text=True)
+
+    keyframes = []
+    duration = 0.0
+    for line in result.stdout.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) >= 2 and 'K' in fields[1] and fields[0] not in ('', 'N/A'):
+            keyframes.append(float(fields[0]))
+        elif len(fields) == 1 and fields[0] not in ('', 'N/A'):
+            duration = float(fields[0])
+    return duration, sorted(keyframes)
+
+
+def plan_split_points(duration, keyframes, segments):
+    """在每个等分点附近选取最近的关键帧作为切分点，去掉重复和过于靠近开头的点"""
+    points = []
+    for i in range(1, segments):
+        target = duration * i / segments
+        nearest = min(keyframes, key=lambda t: abs(t - target), default=None)
+        if nearest is not None and nearest > 0 and (not points or nearest > points[-1]):
+            points.append(nearest)
+    return points
+
+
+def split_at_keyframes(video_path, split_points, work_dir):
+    """
+    用 segment 复用器在关键帧处无损切分（-c copy）
+    :return: [(分段路径, 起始秒, 结束秒), ...]，起止时间取自复用器写出的分段列表，与实际切分位置一致
+    """
+    extension = os.path.splitext(video_path)[1] or '.mp4'
+    list_path = os.path.join(work_dir, 'segments.csv')
+    subprocess.run([
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', video_path, '-map', '0', '-c', 'copy',
+        '-f', 'segment', '-segment_times', ','.join(f'{t:.6f}' for t in split_points),
+        '-segment_list', list_path, '-segment_list_type', 'csv', '-reset_timestamps', '1',
+        os.path.join(work_dir, f'part%03d{extension}')
+    ], check=True)
+
+    with open(list_path, newline='') as f:
+        return [(os.path.join(work_dir, row[0]), float(row[1]), float(row[2])) for row in csv.reader(f) if row]
+
+
+def write_subtitle_slice(cues, start, end, output_path):
+    """
+    取出与 [start, end) 有重叠的字幕，平移到分段自身的时间轴并裁剪到分段范围内
+    跨越分段边界的字幕会同时出现在相邻两段中，拼接后在画面上保持连续
+    cues 为整数毫秒的 (start_ms, end_ms, text) 列表，start / end 为秒
+    """
+    start_ms, end_ms = seconds_to_ms(start), seconds_to_ms(end)
+    write_cues((
+        (max(cue_start, start_ms) - start_ms, min(cue_end, end_ms) - start_ms, text)
+        for cue_start, cue_end, text in cues
+        if cue_end > start_ms and cue_start < end_ms
+    ), output_path, 'srt')
+
+
+def concat_segments(segment_paths, output_path, work_dir):
+    """用 concat 复用器无损拼接各分段"""
+    list_path = os.path.join(work_dir, 'concat.txt')
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in segment_paths:
+            escaped = path.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    subprocess.run([
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-f', 'concat', '-safe', '0', '-i', list_path,
+        '-map', '0', '-c', 'copy'
+    ] + faststart_args(output_path) + [output_path], check=True)
+
+
+class PartProgress:
+    """汇总并行编码的各段进度：整体进度 = 各段已编码时长之和 / 总时长"""
+
+    def __init__(self, durations, on_progress):
+        self.durations = durations
+        self.total = sum(durations) or 1
+        self.done = [0.0] * len(durations)
+        self.on_progress = on_progress
+        self._lock = threading.Lock()
+
+    def callback(self, i):
+        def update(fraction):
+            with self._lock:
+                self.done[i] = self.durations[i] * fraction
+                self.on_progress(sum(self.done) / self.total)
+        return update
+
+
+def embed_subtitles_parallel(video_path, subtitle_path, output_path, profile, segments=None, on_progress=None):
+    """
+    分段并行烧录字幕：在关键帧处把视频切成 N 段，每段配上对应时间窗口平移后的字幕，
+    由 N 个 ffmpeg 进程并行编码，最后用 concat 复用器无损拼接
+    soft 档位、短视频或找不到可用切分点时回落到串行的 embed_subtitles
+    :param on_progress: 可选的进度回调 on_progress(比例)，并行烧录时按各段已编码的时长汇总
+    """
+    segments = segments or EncodeConfig.BURN_SEGMENTS
+    if segments > EncodeConfig.BURN_MAX_SEGMENTS:
+        logger.info('分段数 %d 超过上限，改为 %d 段', segments, EncodeConfig.BURN_MAX_SEGMENTS)
+        segments = EncodeConfig.BURN_MAX_SEGMENTS
+    if segments <= 1 or profile['mode'] == 'soft':
+        return embed_subtitles(video_path, subtitle_path, output_path, profile, on_progress)
+
+    try:
+        duration, keyframes = probe_keyframes(video_path)
+    except subprocess.CalledProcessError as e:
+        logger.warning('读取关键帧失败，改为串行烧录: %s', e)
+        return embed_subtitles(video_path, subtitle_path, output_path, profile, on_progress)
+    split_points = plan_split_points(duration, keyframes, segments)
+    if duration < EncodeConfig.PARALLEL_BURN_MIN_SECONDS or not split_points:
+        return embed_subtitles(video_path, subtitle_path, output_path, profile, on_progress, duration)
+
+    try:
+        cues = list(read_cues(subtitle_path))
+    except (OSError, ValueError) as e:
+        logger.error('读取字幕文件失败: %s', e)
+        return False
+
+    work_dir = tempfile.mkdtemp(prefix='burn_', dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        parts = split_at_keyframes(video_path, split_points, work_dir)
+        # 每个 ffmpeg 进程分到的编码线程数，避免 N 个进程各自按全部核数开线程
+        part_profile = dict(profile, threads=profile.get('threads') or max(1, (os.cpu_count() or 1) // len(parts)))
+
+        jobs = []
+        for i, (part_path, start, end) in enumerate(parts):
+            part_subtitle = os.path.join(work_dir, f'part{i:03d}.srt')
+            write_subtitle_slice(cues, start, end, part_subtitle)
+            burned_path = os.path.join(work_dir, f'burned{i:03d}{os.path.splitext(output_path)[1]}')
+            jobs.append((part_path, part_subtitle, burned_path))
+
+        progress = PartProgress([end - start for _, start, end in parts], on_progress) if on_progress else None
+
+        def burn(i):
+            part_path, part_subtitle, burned_path = jobs[i]
+            # 分段只是中间文件，faststart 只在最终拼接时做一次
+            return embed_subtitles(part_path, part_subtitle, burned_path, part_profile,
+                                   progress.callback(i) if progress else None, parts[i][2] - parts[i][1],
+                                   faststart=False)
+
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            results = list(pool.map(burn, range(len(jobs))))
+        if not all(results):
+            return False
+
+        concat_segments([burned_path for _, _, burned_path in jobs], output_path, work_dir)
+        return True
+    except subprocess.CalledProcessError as e:
+        logger.error('分段烧录字幕时出错: %s', e)
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,409 @@
+import logging
+import os
+import shutil
+import threading
+import time
+
+from config.cache import CacheConfig
+from config.model import ModelConfig
+from config.transcription import TranscriptionConfig
+from config.translation import TranslationConfig
+from config.upload import UploadConfig
+from src.cache import cache, make_key, file_sha256, KIND_SUBTITLE as CACHED_SUBTITLE, KIND_VIDEO as CACHED_VIDEO
+from src.encode_profiles import resolve_encode_profile
+from src.job_events import EVENT_CUE
+from src.metrics import maybe_profile, measure_stage
+from src.jobs import JobFailed, NextStage
+from src.parallel_burn import embed_subtitles_parallel
+from src.retention import release_intermediates
+from src.storage import storage, KIND_AUDIO, KIND_CACHE, KIND_OUTPUT, KIND_SUBTITLE, KIND_UPLOAD
+from src.subtitle_io import SrtAppender, ms_to_time, segments_to_cues, write_cues
+from src.subtitle_store import store as subtitle_store
+from src.transcription import OUTPUT_LANGUAGE, OUTPUT_TRANSLATION, OUTPUT_WORDS, transcribe_outputs, write_words
+from src.video_processing import extract_audio_from_video, extract_audio_array, generate_subtitles, \
+    generate_subtitles_with_translation
+
+logger = logging.getLogger(__name__)
+
+# 各阶段在整体进度中的起止百分比
+STAGE_PROGRESS = {
+    'extract': (0, 15),
+    'transcribe': (15, 80),
+    'burn': (80, 100),
+}
+
+# 任务队列：转录（音频提取 + 字幕生成）与烧录可以由不同的工作进程分别处理
+QUEUE_TRANSCRIBE = 'transcribe'
+QUEUE_BURN = 'burn'
+PIPELINE_QUEUES = (QUEUE_TRANSCRIBE, QUEUE_BURN)
+
+
+# 上传过程中已提前解码好的音频，按视频路径索引 (登记时间, 字节数, (audio, stats))；
+# 只保存在内存中，服务重启后回落到常规提取。任务可能由其他进程认领，超过 EARLY_AUDIO_TTL 秒
+# 仍未被取走的音频由定时清理线程丢弃；总字节数不超过 EARLY_AUDIO_MAX_BYTES
+_prefetched_audio = {}
+_prefetched_bytes = 0
+_prefetched_lock = threading.Lock()
+_purge_thread = None
+
+
+def _pop_prefetched(video_path):
+    """在 _prefetched_lock 内调用"""
+    global _prefetched_bytes
+    entry = _prefetched_audio.pop(video_path, None)
+    if entry is not None:
+        _prefetched_bytes -= entry[1]
+    return entry
+
+
+def _purge_prefetched_audio():
+    """定时丢弃超时的音频，没有等待认领的音频时线程退出，下次登记时重新启动"""
+    global _purge_thread
+    while True:
+        time.sleep(UploadConfig.EARLY_AUDIO_PURGE_INTERVAL)
+        now = time.monotonic()
+        with _prefetched_lock:
+            for path in [path for path, (added, _, _) in _prefetched_audio.items()
+                         if now - added > UploadConfig.EARLY_AUDIO_TTL]:
+                _pop_prefetched(path)
+                logger.info('提前解码的音频超时未被认领，已丢弃: %s', path)
+            if not _prefetched_audio:
+                _purge_thread = None
+                return
+
+
+def register_prefetched_audio(video_path, early_audio):
+    """登记上传时由 EarlyAudioExtractor 提前解码的 (audio, stats)；超出内存上限时不保留，任务照常提取音频"""
+    global _prefetched_bytes, _purge_thread
+    if early_audio is None:
+        return
+    size = getattr(early_audio[0], 'nbytes', 0)
+    with _prefetched_lock:
+        _pop_prefetched(video_path)
+        if _prefetched_bytes + size > UploadConfig.EARLY_AUDIO_MAX_BYTES:
+            logger.info('提前解码的音频超出内存上限（已占用 %d 字节），改为由任务提取: %s',
+                        _prefetched_bytes, video_path)
+            return
+        _prefetched_audio[video_path] = (time.monotonic(), size, early_audio)
+        _prefetched_bytes += size
+        if _purge_thread is None:
+            _purge_thread = threading.Thread(target=_purge_prefetched_audio, name='early-audio-purge', daemon=True)
+            _purge_thread.start()
+
+
+def discard_prefetched_audio(video_path):
+    """取走（或丢弃）video_path 的提前解码音频，返回 (audio, stats)，没有时返回 None"""
+    with _prefetched_lock:
+        entry = _pop_prefetched(video_path)
+    return entry[2] if entry is not None else None
+
+
+def stage_progress(report, stage):
+    """把阶段内的完成比例（0~1）映射为整体进度并上报"""
+    low, high = STAGE_PROGRESS[stage]
+    return lambda fraction: report(stage, low + (high - low) * fraction)
+
+
+class LiveTranscript:
+    """
+    转录进度回调：新转录出的字幕立即追加到字幕文件并推送 cue 事件，转录比例映射为整体进度
+    转录期间字幕文件标记为 live，编辑器可以读取但不能保存；结束后由 write_cues 原子地替换为最终版本
+    """
+
+    def __init__(self, report, subtitle_path):
+        self.report = report
+        self.subtitle_path = subtitle_path
+        self.progress = stage_progress(report, 'transcribe')
+        self.writer = None
+
+    def __enter__(self):
+        subtitle_store.set_live(self.subtitle_path)
+        self.writer = SrtAppender(self.subtitle_path)
+        return self
+
+    def __exit__(self, *exc):
+        self.writer.close()
+        subtitle_store.set_live(self.subtitle_path, False)
+
+    def __call__(self, fraction, segments):
+        cues = [cue for cue in segments_to_cues(segments) if cue[2]]
+        if cues:
+            index = self.writer.count
+            self.writer.append(cues)
+            for i, (start, end, text) in enumerate(cues, index + 1):
+                self.report.emit(EVENT_CUE, {'index': i, 'start_time': ms_to_time(start),
+                                             'end_time': ms_to_time(end), 'text': text})
+        self.progress(fraction)
+
+
+def extract_audio(video_path, base, params, on_progress=None):
+    """
+    按配置提取音频，返回 (传给 Whisper 的音频, 提取统计)
+    - 上传时已提前解码的音频直接使用
+    - 分块转录直接让各子进程从视频文件中解码自己的区间，不需要提取
+    - stream 模式把 16 kHz 单声道 float32 通过管道读入内存，只有要求保留时才写 wav
+    - wav 模式保留旧版的落盘流程
+    on_progress(比例) 为可选的提取进度回调
+    """
+    prefetched = discard_prefetched_audio(video_path)
+    if params.get('chunked'):
+        return video_path, {'mode': 'chunked', 'bytes_written': 0}
+
+    mode = params.get('audio_mode') or TranscriptionConfig.AUDIO_EXTRACTION_MODE
+    if prefetched is not None and mode != 'wav' and not params.get('keep_audio'):
+        return prefetched
+    if mode == 'wav':
+        audio_path = storage.path(KIND_AUDIO, f"{base}.wav")
+        start = time.perf_counter()
+        extract_audio_from_video(video_path, audio_path, on_progress=on_progress)
+        return audio_path, {
+            'mode': 'wav',
+            'extract_seconds': round(time.perf_counter() - start, 3),
+            'bytes_written': os.path.getsize(audio_path),
+        }
+
+    keep_audio = params.get('keep_audio')
+    if keep_audio is None:
+        keep_audio = TranscriptionConfig.KEEP_AUDIO_WAV
+    wav_path = storage.path(KIND_AUDIO, f"{base}.wav") if keep_audio else None
+    audio, stats = extract_audio_array(video_path, wav_path, on_progress)
+    logger.info('音频提取完成: 写入 %d 字节, 节省 %d 字节, 节省时间 %.3f 秒 (%s)', stats['bytes_written'],
+                stats['bytes_saved'], stats['time_saved_seconds'], stats['time_saved_source'])
+    return audio, stats
+
+
+def transcript_cache_key(params):
+    """字幕缓存 key：上传内容哈希 + 引擎 + 模型 + 语言 + 任务（翻译时包括目标语言与翻译后端）"""
+    task = ['translate', params['translate'], params.get('translator') or TranslationConfig.BACKEND] \
+        if params.get('translate') else ['transcribe', None]
+    return make_key(params['content_hash'], ModelConfig.resolve_engine_name(params.get('engine')),
+                    ModelConfig.resolve_model_name(params.get('model')),
+                    params.get('language') or 'auto', task)
+
+
+def encode_profile(params):
+    """任务使用的编码档位，/upload 已解析并校验过；旧任务没有该字段时使用默认档位"""
+    return params.get('encode_profile') or resolve_encode_profile()
+
+
+def burn_cache_key(params, subtitle_path):
+    """烧录视频缓存 key：上传内容哈希 + 字幕内容哈希 + 编码档位，档位变化后不会命中旧的视频"""
+    return make_key(params['content_hash'], file_sha256(subtitle_path), encode_profile(params))
+
+
+def cache_enabled(params):
+    return CacheConfig.ENABLED and bool(params.get('content_hash'))
+
+
+def lookup_cache(params):
+    """
+    上传时同步查询缓存
+    请求了派生结果（outputs）的任务需要完整运行一次转录，不查询缓存
+    :return: {'subtitle': 缓存的字幕路径或 None, 'video': 缓存的烧录视频路径或 None}
+    """
+    hits = {'subtitle': None, 'video': None}
+    if not cache_enabled(params) or params.get('outputs'):
+        return hits
+    hits['subtitle'] = cache.get(transcript_cache_key(params))
+    if hits['subtitle'] and params.get('return_option', 'video') != 'subtitle':
+        hits['video'] = cache.get(burn_cache_key(params, hits['subtitle']))
+    return hits
+
+
+def build_result(params, subtitle_path, output_video_path=None, **extra):
+    subtitle_filename = os.path.basename(subtitle_path)
+    result = {
+        'subtitle_filename': subtitle_filename,
+        'subtitle_url': f'/download/{subtitle_filename}',
+    }
+    result.update(extra)
+    if output_video_path is None:
+        result['message'] = '字幕文件处理完成'
+        result['download_url'] = result['subtitle_url']
+    else:
+        result['message'] = '视频处理完成'
+        result['download_url'] = f'/download/{os.path.basename(output_video_path)}'
+    return result
+
+
+def cached_result(params, hits):
+    """缓存完全命中时直接生成任务结果，不再运行 ffmpeg 和 Whisper；部分命中返回 None"""
+    wants_video = params.get('return_option', 'video') != 'subtitle'
+    if not hits['subtitle'] or (wants_video and not hits['video']):
+        return None
+    subtitle_path = storage.path(KIND_SUBTITLE, f"{params['base']}.srt")
+    shutil.copyfile(hits['subtitle'], subtitle_path)
+    storage.publish(KIND_SUBTITLE, os.path.basename(subtitle_path))
+    if not wants_video:
+        return build_result(params, subtitle_path, cached=True)
+    return build_result(params, subtitle_path, hits['video'], cached=True, profile=encode_profile(params))
+
+
+def generate_outputs(audio, subtitle_path, params, on_progress=None):
+    """
+    单次解码多输出：一次转录同时生成字幕以及请求的语言、译文、词级时间戳
+    字幕写入 subtitle_path（指定了 translate 时为译文），其余结果写在同名的附加文件中
+    :return: 各派生结果的描述，写入任务结果的 artifacts 字段
+    """
+    outputs = list(params['outputs'])
+    target_language = params.get('target_language') or params.get('translate')
+    if params.get('translate') and OUTPUT_TRANSLATION not in outputs:
+        outputs.append(OUTPUT_TRANSLATION)
+    analysis = transcribe_outputs(audio, params.get('model'), params.get('language'), outputs, target_language,
+                                  params.get('translator'), params.get('chunked', False), params.get('engine'),
+                                  on_progress)
+
+    main_cues = analysis['translation'] if params.get('translate') else segments_to_cues(analysis['segments'])
+    write_cues(main_cues, subtitle_path, 'srt')
+
+    base = params['base']
+    artifacts = {}
+    if OUTPUT_LANGUAGE in params['outputs']:
+        artifacts['language'] = {'code': analysis['language'], 'probability': analysis['language_probability']}
+    if OUTPUT_TRANSLATION in params['outputs']:
+        filename = f"{base}.{target_language}.srt"
+        write_cues(analysis['translation'], storage.path(KIND_SUBTITLE, filename), 'srt')
+        storage.publish(KIND_SUBTITLE, filename)
+        artifacts['translation'] = {'language': target_language, 'filename': filename,
+                                    'url': f'/download/{filename}', 'stats': analysis['translation_stats']}
+    if OUTPUT_WORDS in params['outputs']:
+        filename = f"{base}.words.json"
+        count = write_words(analysis['segments'], storage.path(KIND_OUTPUT, filename))
+        storage.publish(KIND_OUTPUT, filename)
+        artifacts['words'] = {'filename': filename, 'url': f'/download/{filename}', 'count': count}
+    return artifacts
+
+
+def resolve_video_path(params):
+    """上传视频的本地路径：通过 storage 取得（其他节点上的工作进程也能读取），旧任务直接使用记录的路径"""
+    if params.get('video_filename'):
+        return storage.fetch(KIND_UPLOAD, params['video_filename'])
+    return params['video_path']
+
+
+def run_upload_job(job, report):
+    """
+    上传任务的处理流水线，分两个队列执行，可以由按阶段分工的不同工作进程完成：
+    - transcribe：音频提取 -> 字幕生成；字幕已在缓存中时（/upload 传入 cached_subtitle）跳过提取与转录，
+      只要字幕时任务到此完成，否则带着字幕文件名进入 burn 队列
+    - burn：字幕烧录
+    /upload 指定 cprofile=1 时对每个阶段开启 cProfile，结果文件名写入任务结果
+    转录阶段结束后立即删除未要求保留的中间 wav，释放的字节数写入任务结果的 reclaimed_bytes
+    :param job: JobStore 中的任务字典，params 由 /upload 写入，后续阶段的 result 为上一阶段的中间结果
+    :param report: report(stage, progress) 进度上报回调
+    :return: 任务结果（包含下载地址），或进入下一队列的 NextStage
+    """
+    params = job['params']
+    queue = job.get('queue') or QUEUE_TRANSCRIBE
+    profile_name = job['id'] if queue == QUEUE_TRANSCRIBE else f"{job['id']}.{queue}"
+    reclaimed = 0
+    try:
+        with maybe_profile(params.get('cprofile'), profile_name) as profile_filename:
+            if queue == QUEUE_BURN:
+                result = _burn_stage(job, report)
+            else:
+                result = _transcribe_stage(job, report)
+    finally:
+        if queue == QUEUE_TRANSCRIBE:
+            reclaimed = release_intermediates(params)
+    output = result.state if isinstance(result, NextStage) else result
+    if profile_filename:
+        output['cprofile'] = profile_filename
+    if reclaimed:
+        output['reclaimed_bytes'] = reclaimed
+    return result
+
+
+def _transcribe_stage(job, report):
+    params = job['params']
+    video_path = resolve_video_path(params)
+    base = params['base']
+
+    subtitle_filename = f"{base}.srt"
+    subtitle_path = storage.path(KIND_SUBTITLE, subtitle_filename)
+    artifacts = None
+    cached_subtitle = params.get('cached_subtitle')
+    if cached_subtitle and os.path.exists(cached_subtitle):
+        # 字幕命中缓存时不需要音频，释放上传时提前解码的音频
+        discard_prefetched_audio(video_path)
+        shutil.copyfile(cached_subtitle, subtitle_path)
+        audio_stats = {'mode': 'cached', 'bytes_written': 0}
+    else:
+        # 音频提取
+        report('extract', STAGE_PROGRESS['extract'][0])
+        with measure_stage('extract'):
+            audio, audio_stats = extract_audio(video_path, base, params, stage_progress(report, 'extract'))
+
+        # 生成字幕：转录出的字幕边转录边写入 subtitle_path 并推送给订阅者（首次使用模型时包含 model_load）
+        report('transcribe', STAGE_PROGRESS['transcribe'][0])
+        translate_target_language = params.get('translate')
+        with measure_stage('transcribe', engine=ModelConfig.resolve_engine_name(params.get('engine')),
+                           model=ModelConfig.resolve_model_name(params.get('model'))), \
+                LiveTranscript(report, subtitle_path) as live:
+            if params.get('outputs'):
+                artifacts = generate_outputs(audio, subtitle_path, params, live)
+                success = True
+            elif translate_target_language:
+                success = generate_subtitles_with_translation(audio, subtitle_path,
+                                                              target_language=translate_target_language,
+                                                              model_name=params.get('model'),
+                                                              chunked=params.get('chunked', False),
+                                                              source_language=params.get('language'),
+                                                              translator=params.get('translator'),
+                                                              engine=params.get('engine'),
+                                                              on_progress=live)
+            else:
+                success = generate_subtitles(audio, subtitle_path, language=params.get('language'),
+                                             model_name=params.get('model'),
+                                             chunked=params.get('chunked', False), engine=params.get('engine'),
+                                             on_progress=live)
+            if not success:
+                raise JobFailed('生成字幕时出错')
+
+        if cache_enabled(params) and not params.get('outputs'):
+            # 缓存保存一份独立副本，之后在编辑器里修改字幕不会影响缓存内容
+            key = transcript_cache_key(params)
+            cache_copy = storage.path(KIND_CACHE, f"{key}.srt")
+            shutil.copyfile(subtitle_path, cache_copy)
+            cache.put(key, CACHED_SUBTITLE, cache_copy)
+    storage.publish(KIND_SUBTITLE, subtitle_filename)
+
+    if params.get('return_option', 'video') == 'subtitle':
+        return build_result(params, subtitle_path, audio_stats=audio_stats, artifacts=artifacts)
+
+    # 字幕已就绪：中间结果中带上字幕地址，客户端在烧录完成前即可下载字幕
+    return NextStage(QUEUE_BURN, {
+        'subtitle_filename': subtitle_filename,
+        'subtitle_url': f'/download/{subtitle_filename}',
+        'audio_stats': audio_stats,
+        'artifacts': artifacts,
+    })
+
+
+def _burn_stage(job, report):
+    params = job['params']
+    state = job['result'] or {}
+    video_path = resolve_video_path(params)
+    subtitle_path = storage.fetch(KIND_SUBTITLE, state['subtitle_filename'])
+
+    # 嵌入字幕（字幕来自缓存时 /upload 已查询过烧录缓存，这里不再重复查询）
+    report('burn', STAGE_PROGRESS['burn'][0])
+    output_video_path = None
+    if cache_enabled(params) and not params.get('cached_subtitle'):
+        output_video_path = cache.get(burn_cache_key(params, subtitle_path))
+    if output_video_path is None:
+        output_filename = f"{params['base']}_with_subtitles.mp4"
+        output_video_path = storage.path(KIND_OUTPUT, output_filename)
+        with measure_stage('burn', profile=encode_profile(params)['name']):
+            if not embed_subtitles_parallel(video_path, subtitle_path, output_video_path, encode_profile(params),
+                                            params.get('burn_segments'), stage_progress(report, 'burn')):
+                raise JobFailed('嵌入字幕时出错')
+        storage.publish(KIND_OUTPUT, output_filename)
+        if cache_enabled(params):
+            cache.put(burn_cache_key(params, subtitle_path), CACHED_VIDEO, output_video_path)
+
+    result = build_result(params, subtitle_path, output_video_path, audio_stats=state.get('audio_stats'),
+                          profile=encode_profile(params), artifacts=state.get('artifacts'))
+    if state.get('reclaimed_bytes'):
+        result['reclaimed_bytes'] = state['reclaimed_bytes']
+    return result
@@ -0,0 +1,361 @@
+"""
+磁盘保留策略：按目录的 TTL 与容量上限清理 uploads/ 与 outputs/ 下的文件，替代原来全部删除的 bin/clear_outputs.sh
+
+用法：python -m src.retention             按策略清理一次
+      python -m src.retention --all       删除受管目录下的所有文件（跳过排队或运行中任务的文件）
+      python -m src.retention --dry-run   只报告将会删除的文件与字节数
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+from config.paths import PathConfig
+from config.retention import RetentionConfig
+from config.transcription import TranscriptionConfig
+from src.db import connect, init_db
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe('retention_reclaimed_bytes_total', 'counter', 'Bytes deleted by retention, by directory')
+metrics.describe('retention_deleted_files_total', 'counter', 'Files deleted by retention, by directory')
+
+
+def record_reclaimed(name, files, size):
+    metrics.inc('retention_deleted_files_total', {'directory': name}, files)
+    metrics.inc('retention_reclaimed_bytes_total', {'directory': name}, size)
+
+
+class FileIndex:
+    """
+    受管目录的文件 mtime 索引，保存在 SQLite 中，多个服务进程共享
+    - 目录自身的 mtime 不变（没有文件被创建、删除或经原子替换写回）时不重新扫描，直接按索引查询过期与超额的文件
+    - 原地追加写入不会改变目录的 mtime，删除前会重新 stat 候选文件
+    """
+
+    # 目录 mtime 距今小于该值时仍重新扫描，避免文件系统时间戳精度不足导致漏掉刚发生的变化
+    RESCAN_WINDOW_NS = 2 * 10 ** 9
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or RetentionConfig.INDEX_DB_PATH
+        init_db(self.db_path, """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                directory TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_files_mtime ON files (directory, mtime);
+            CREATE TABLE IF NOT EXISTS directories (
+                name TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sweeps (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                started_at REAL NOT NULL,
+                report TEXT
+            );
+        """)
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    def refresh(self, name, directory):
+        """目录有变化时重新扫描（不进入子目录）并同步索引，返回是否扫描过"""
+        try:
+            dir_mtime_ns = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM files WHERE directory = ?', (name,))
+                conn.execute('DELETE FROM directories WHERE name = ?', (name,))
+            return False
+
+        with self._connect() as conn:
+            row = conn.execute('SELECT mtime_ns FROM directories WHERE name = ?', (name,)).fetchone()
+        if row is not None and row['mtime_ns'] == dir_mtime_ns \
+                and time.time_ns() - dir_mtime_ns > self.RESCAN_WINDOW_NS:
+            return False
+
+        entries = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        entries.append((entry.path, name, stat.st_size, stat.st_mtime))
+                except FileNotFoundError:
+                    continue
+
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('DELETE FROM files WHERE directory = ?', (name,))
+                conn.executemany('INSERT OR REPLACE INTO files (path, directory, size, mtime) VALUES (?, ?, ?, ?)',
+                                 entries)
+                conn.execute('INSERT OR REPLACE INTO directories (name, mtime_ns) VALUES (?, ?)',
+                             (name, dir_mtime_ns))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return True
+
+    def older_than(self, name, cutoff):
+        """修改时间早于 cutoff 的文件 [(路径, 大小, mtime)]，从旧到新"""
+        with self._connect() as conn:
+            return [tuple(row) for row in conn.execute(
+                'SELECT path, size, mtime FROM files WHERE directory = ? AND mtime < ? ORDER BY mtime',
+                (name, cutoff))]
+
+    def total_bytes(self, name):
+        with self._connect() as conn:
+            return conn.execute('SELECT COALESCE(SUM(size), 0) FROM files WHERE directory = ?',
+                                (name,)).fetchone()[0]
+
+    def update(self, path, size, mtime):
+        with self._connect() as conn:
+            conn.execute('UPDATE files SET size = ?, mtime = ? WHERE path = ?', (size, mtime, path))
+
+    def remove(self, path):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM files WHERE path = ?', (path,))
+
+    def usage(self):
+        """{目录名: {'files', 'bytes'}}，按上次扫描时的索引统计"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT directory, COUNT(*), COALESCE(SUM(size), 0) FROM files GROUP BY directory')
+            return {row[0]: {'files': row[1], 'bytes': row[2]} for row in rows}
+
+    def claim_sweep(self, interval):
+        """距上次清理（任一进程）已超过 interval 秒时登记本次清理并返回 True"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT started_at FROM sweeps WHERE id = 1').fetchone()
+                if row is not None and now - row['started_at'] < interval:
+                    conn.execute('COMMIT')
+                    return False
+                conn.execute('INSERT INTO sweeps (id, started_at) VALUES (1, ?) '
+                             'ON CONFLICT (id) DO UPDATE SET started_at = excluded.started_at', (now,))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return True
+
+    def save_report(self, report):
+        with self._connect() as conn:
+            conn.execute('UPDATE sweeps SET report = ? WHERE id = 1', (json.dumps(report),))
+
+    def last_report(self):
+        with self._connect() as conn:
+            row = conn.execute('SELECT report FROM sweeps WHERE id = 1').fetchone()
+        return json.loads(row['report']) if row is not None and row['report'] else None
+
+
+def protected_files(jobs):
+    """
+    活动任务（排队或运行中）用到的文件：上传的视频本身，以及以任务 base 命名的字幕、音频与输出
+    :return: (绝对路径集合, base 集合)
+    """
+    paths, bases = set(), set()
+    for job in jobs:
+        params = job['params']
+        if params.get('video_path'):
+            paths.add(os.path.abspath(params['video_path']))
+        if params.get('base'):
+            bases.add(params['base'])
+    return paths, bases
+
+
+def is_protected(path, protected):
+    paths, bases = protected
+    if os.path.abspath(path) in paths:
+        return True
+    name = os.path.basename(path)
+    return any(name == base or name.startswith((f'{base}.', f'{base}_')) for base in bases)
+
+
+class RetentionSweeper:
+    """
+    后台清理线程：每隔 SWEEP_INTERVAL 秒按目录策略删除超过 TTL 的文件，再按修改时间从旧到新删除超出容量上限的部分
+    排队或运行中任务的文件、以及最近 MIN_AGE_SECONDS 秒内修改过的文件不会被删除
+    :param active_jobs: 返回活动任务列表的函数（JobStore.active）
+    """
+
+    def __init__(self, active_jobs=None, policies=None, index=None, interval=None, min_age=None):
+        self.active_jobs = active_jobs or list
+        self.policies = policies or RetentionConfig.POLICIES
+        self.index = index or FileIndex()
+        self.interval = interval or RetentionConfig.SWEEP_INTERVAL
+        self.min_age = RetentionConfig.MIN_AGE_SECONDS if min_age is None else min_age
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """启动后台清理线程（可重复调用）"""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='retention-sweeper', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception('磁盘清理失败')
+            self._stop.wait(self.interval)
+
+    def sweep(self, force=False, dry_run=False, purge=False):
+        """
+        执行一次清理
+        :param force: 不检查其他进程是否刚清理过
+        :param dry_run: 只统计将会删除的文件，不删除
+        :param purge: 忽略 TTL、容量与最短保留时间，删除所有文件（仍跳过活动任务的文件）
+        :return: 报告 {'directories': {名称: {'files', 'bytes'}}, 'deleted_files', 'reclaimed_bytes', ...}；
+                 其他进程在本间隔内已经清理过时返回 None
+        """
+        if not force and not self.index.claim_sweep(self.interval):
+            return None
+        start = time.perf_counter()
+        now = time.time()
+        protected = protected_files(self.active_jobs())
+        directories = {}
+        for name, policy in self.policies.items():
+            self.index.refresh(name, policy['directory'])
+            deleted = directories[name] = {'files': 0, 'bytes': 0}
+            young_cutoff = now if purge else now - self.min_age
+
+            ttl_cutoff = None
+            if purge or policy['ttl_seconds']:
+                ttl_cutoff = young_cutoff if purge else min(young_cutoff, now - policy['ttl_seconds'])
+                for path, _, _ in self.index.older_than(name, ttl_cutoff):
+                    self._delete(path, ttl_cutoff, protected, deleted, dry_run)
+
+            if policy['max_bytes'] and not purge:
+                total = self.index.total_bytes(name) - (deleted['bytes'] if dry_run else 0)
+                for path, _, mtime in self.index.older_than(name, young_cutoff):
+                    if total <= policy['max_bytes']:
+                        break
+                    # 试运行时索引中仍保留着上一步按 TTL 统计过的文件
+                    if dry_run and ttl_cutoff is not None and mtime < ttl_cutoff:
+                        continue
+                    total -= self._delete(path, young_cutoff, protected, deleted, dry_run)
+
+            if deleted['files'] and not dry_run:
+                record_reclaimed(name, deleted['files'], deleted['bytes'])
+
+        report = {
+            'finished_at': time.time(),
+            'seconds': round(time.perf_counter() - start, 3),
+            'dry_run': dry_run,
+            'purge': purge,
+            'deleted_files': sum(item['files'] for item in directories.values()),
+            'reclaimed_bytes': sum(item['bytes'] for item in directories.values()),
+            'directories': directories,
+        }
+        if not dry_run:
+            self.index.save_report(report)
+        if report['deleted_files']:
+            logger.info('磁盘清理%s: 删除 %d 个文件, 释放 %d 字节', '（试运行）' if dry_run else '',
+                        report['deleted_files'], report['reclaimed_bytes'])
+        return report
+
+    def _delete(self, path, cutoff, protected, deleted, dry_run):
+        """删除一个候选文件并返回释放的字节数；受保护、已不存在或在索引之后被修改过的文件返回 0"""
+        if is_protected(path, protected):
+            return 0
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.index.remove(path)
+            return 0
+        if stat.st_mtime >= cutoff:
+            self.index.update(path, stat.st_size, stat.st_mtime)
+            return 0
+        if not dry_run:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.index.remove(path)
+        deleted['files'] += 1
+        deleted['bytes'] += stat.st_size
+        return stat.st_size
+
+    def status(self):
+        """各目录的策略、当前占用与最近一次清理的报告"""
+        usage = self.index.usage()
+        return {
+            'interval_seconds': self.interval,
+            'min_age_seconds': self.min_age,
+            'directories': {
+                name: {
+                    'ttl_seconds': policy['ttl_seconds'],
+                    'max_bytes': policy['max_bytes'],
+                    **usage.get(name, {'files': 0, 'bytes': 0}),
+                }
+                for name, policy in self.policies.items()
+            },
+            'last_sweep': self.index.last_report(),
+        }
+
+    def collect(self):
+        """/metrics 的 collector：各目录在索引中的文件数与字节数"""
+        usage = self.index.usage()
+        return [
+            ('retention_directory_bytes', 'gauge', 'Bytes in each managed directory as of the last scan',
+             [({'directory': name}, usage.get(name, {}).get('bytes', 0)) for name in self.policies]),
+            ('retention_directory_files', 'gauge', 'Files in each managed directory as of the last scan',
+             [({'directory': name}, usage.get(name, {}).get('files', 0)) for name in self.policies]),
+        ]
+
+
+def release_intermediates(params):
+    """
+    任务结束（无论成功与否）后立即删除未要求保留的中间 wav，不等后台清理
+    wav 模式以及 stream 模式下 keep_audio 为真时写出的 wav 由 keep_audio（默认 KEEP_AUDIO_WAV）决定是否保留
+    :return: 释放的字节数
+    """
+    if not RetentionConfig.DELETE_AUDIO_ON_COMPLETE or not params.get('base'):
+        return 0
+    keep_audio = params.get('keep_audio')
+    if keep_audio is None:
+        keep_audio = TranscriptionConfig.KEEP_AUDIO_WAV
+    if keep_audio:
+        return 0
+    path = PathConfig.get_audio_path(f"{params['base']}.wav")
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+    except FileNotFoundError:
+        return 0
+    record_reclaimed('audio', 1, size)
+    return size
+
+
+def main():
+    import config.settings  # noqa: F401  配置日志
+    from src.jobs import JobStore
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--all', action='store_true', help='删除受管目录下的所有文件（跳过活动任务的文件）')
+    parser.add_argument('--dry-run', action='store_true', help='只报告，不删除')
+    args = parser.parse_args()
+
+    sweeper = RetentionSweeper(JobStore().active)
+    report = sweeper.sweep(force=True, dry_run=args.dry_run, purge=args.all)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import os
+
+from config.paths import PathConfig
+from config.storage import StorageConfig
+
+# 产物类型，与 PathConfig 中的目录一一对应
+KIND_UPLOAD = 'upload'
+KIND_AUDIO = 'audio'
+KIND_SUBTITLE = 'subtitle'
+KIND_OUTPUT = 'output'
+KIND_CACHE = 'cache'
+
+
+class Storage:
+    """
+    任务产物的存取接口：工作进程通过它取得输入、发布输出，API 节点通过它接收上传与提供下载
+    - path(kind, filename)：写入该产物时使用的本地路径
+    - fetch(kind, filename)：取得输入文件的本地路径，远程实现在此下载到本地
+    - publish(kind, filename)：产物写完后调用，远程实现在此上传，之后其他节点即可 fetch
+    """
+
+    name = 'base'
+
+    def path(self, kind, filename):
+        raise NotImplementedError
+
+    def fetch(self, kind, filename):
+        raise NotImplementedError
+
+    def publish(self, kind, filename):
+        raise NotImplementedError
+
+    def exists(self, kind, filename):
+        raise NotImplementedError
+
+
+class LocalStorage(Storage):
+    """直接读写 PathConfig 中的目录；同一台机器上的进程，或把项目目录放在共享文件系统上的多台机器均可使用"""
+
+    name = 'local'
+
+    # 产物类型对应的 PathConfig 属性，每次读取，运行时修改 PathConfig 同样生效
+    DIRECTORIES = {
+        KIND_UPLOAD: 'UPLOAD_DIR',
+        KIND_AUDIO: 'AUDIO_DIR',
+        KIND_SUBTITLE: 'SUBTITLE_DIR',
+        KIND_OUTPUT: 'OUTPUT_DIR',
+        KIND_CACHE: 'CACHE_DIR',
+    }
+
+    def directory(self, kind):
+        if kind not in self.DIRECTORIES:
+            raise ValueError(f'Unknown artifact kind "{kind}"')
+        return getattr(PathConfig, self.DIRECTORIES[kind])
+
+    def path(self, kind, filename):
+        directory = self.directory(kind)
+        PathConfig.ensure_dir(directory)
+        return os.path.join(directory, os.path.basename(filename))
+
+    def fetch(self, kind, filename):
+        path = os.path.join(self.directory(kind), os.path.basename(filename))
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        return path
+
+    def publish(self, kind, filename):
+        return self.path(kind, filename)
+
+    def exists(self, kind, filename):
+        return os.path.exists(os.path.join(self.directory(kind), os.path.basename(filename)))
+
+
+STORAGES = {
+    LocalStorage.name: LocalStorage,
+}
+
+
+def register_storage(storage_class):
+    STORAGES[storage_class.name] = storage_class
+
+
+def get_storage(name=None):
+    """按名称创建存储实现，为空时使用 StorageConfig.BACKEND"""
+    name = name or StorageConfig.BACKEND
+    storage_class = STORAGES.get(name)
+    if storage_class is None:
+        raise ValueError(f'Unknown storage backend "{name}". Available: {", ".join(STORAGES)}')
+    return storage_class()
+
+
+storage = get_storage()
@@ -1,9 +1,15 @@
+import logging
 import re
 import os
-from datetime import timedelta
-from typing import List, Dict, Any
+from typing import Iterable, List, Dict, Any
+
+from src.subtitle_io import iter_lines, iter_srt, ms_to_time, seconds_to_ms, time_to_ms
+
+logger = logging.getLogger(__name__)
 
 class SubtitleEntry:
+    __slots__ = ('index', 'start_time', 'end_time', 'text')
+
     def __init__(self, index: int, start_time: str, end_time: str, text: str):
         self.index = index
         self.start_time = start_time
@@ -32,100 +38,82 @@ class SubtitleEditor:
         self.subtitles: List[SubtitleEntry] = []
     
     def parse_srt_file(self, file_path: str) -> bool:
-        """解析SRT字幕文件"""
+        """解析SRT字幕文件（逐行流式读取）"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            self.subtitles = self._parse_srt_content(content)
+            with open(file_path, 'r', encoding='utf-8-sig') as f:
+                self.subtitles = self._parse_srt_lines(iter_lines(f))
             return True
         except Exception as e:
-            print(f"解析SRT文件失败: {str(e)}")
+            logger.error('解析SRT文件失败: %s', e)
             return False
     
     def _parse_srt_content(self, content: str) -> List[SubtitleEntry]:
         """解析SRT内容"""
-        subtitles = []
-        
-        # 分割字幕块
-        subtitle_blocks = re.split(r'\n\s*\n', content.strip())
-        
-        for block in subtitle_blocks:
-            if not block.strip():
-                continue
-                
-            lines = block.strip().split('\n')
-            if len(lines) < 3:
-                continue
-            
-            try:
-                # 解析索引
-                index = int(lines[0].strip())
-                
-                # 解析时间轴
-                time_line = lines[1].strip()
-                time_match = re.match(r'(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2},\d{3})', time_line)
-                if not time_match:
-                    continue
-                
-                start_time = time_match.group(1)
-                end_time = time_match.group(2)
-                
-                # 解析文本（可能多行）
-                text = '\n'.join(lines[2:])
-                
-                subtitle = SubtitleEntry(index, start_time, end_time, text)
-                subtitles.append(subtitle)
-                
-            except (ValueError, IndexError):
-                continue
-        
-        return subtitles
+        return self._parse_srt_lines(content.splitlines())
+    
+    def _parse_srt_lines(self, lines: Iterable[str]) -> List[SubtitleEntry]:
+        """按顺序重新编号，时间统一为 HH:MM:SS,mmm 格式"""
+        return [
+            SubtitleEntry(index, ms_to_time(start), ms_to_time(end), text)
+            for index, (start, end, text) in enumerate(iter_srt(lines), 1)
+        ]
     
     def get_subtitles_data(self) -> List[Dict[str, Any]]:
         """获取字幕数据"""
         return [subtitle.to_dict() for subtitle in self.subtitles]
     
+    def _find_subtitle(self, index: int):
+        """字幕序号通常与位置一致（index - 1），先直接按位置取，不一致时再线性查找"""
+        if 0 < index <= len(self.subtitles) and self.subtitles[index - 1].index == index:
+            return index - 1
+        for i, subtitle in enumerate(self.subtitles):
+            if subtitle.index == index:
+                return i
+        return None
+
     def update_subtitle(self, index: int, start_time: str, end_time: str, text: str) -> bool:
         """更新指定字幕"""
         try:
-            for subtitle in self.subtitles:
-                if subtitle.index == index:
-                    subtitle.start_time = start_time
-                    subtitle.end_time = end_time
-                    subtitle.text = text
-                    return True
-            return False
+            position = self._find_subtitle(index)
+            if position is None:
+                return False
+            subtitle = self.subtitles[position]
+            subtitle.start_time = start_time
+            subtitle.end_time = end_time
+            subtitle.text = text
+            return True
         except Exception as e:
-            print(f"更新字幕失败: {str(e)}")
+            logger.error('更新字幕失败: %s', e)
             return False
     
     def add_subtitle(self, start_time: str, end_time: str, text: str) -> bool:
         """添加新字幕"""
         try:
+            # 追加到末尾时序号就是 len + 1，不需要对全部字幕重新编号
             new_index = len(self.subtitles) + 1
             subtitle = SubtitleEntry(new_index, start_time, end_time, text)
             self.subtitles.append(subtitle)
-            self._reindex_subtitles()
             return True
         except Exception as e:
-            print(f"添加字幕失败: {str(e)}")
+            logger.error('添加字幕失败: %s', e)
             return False
     
     def delete_subtitle(self, index: int) -> bool:
         """删除指定字幕"""
         try:
-            self.subtitles = [s for s in self.subtitles if s.index != index]
-            self._reindex_subtitles()
+            position = self._find_subtitle(index)
+            if position is not None:
+                del self.subtitles[position]
+                self._reindex_subtitles(position)
             return True
         except Exception as e:
-            print(f"删除字幕失败: {str(e)}")
+            logger.error('删除字幕失败: %s', e)
             return False
     
-    def _reindex_subtitles(self):
-        """重新索引字幕"""
-        for i, subtitle in enumerate(self.subtitles, 1):
-            subtitle.index = i
+    def _reindex_subtitles(self, start: int = 0):
+        """重新索引字幕，只需要从发生变化的位置开始"""
+        for i in range(start, len(self.subtitles)):
+            self.subtitles[i].index = i + 1
     
     def save_to_srt(self, file_path: str) -> bool:
         """保存为SRT文件"""
@@ -135,7 +123,7 @@ class SubtitleEditor:
                 f.write(content)
             return True
         except Exception as e:
-            print(f"保存SRT文件失败: {str(e)}")
+            logger.error('保存SRT文件失败: %s', e)
             return False
     
     def _generate_srt_content(self) -> str:
@@ -158,21 +146,10 @@ class SubtitleEditor:
     def time_to_seconds(self, time_str: str) -> float:
         """将时间字符串转换为秒数"""
         try:
-            time_part, ms_part = time_str.split(',')
-            h, m, s = map(int, time_part.split(':'))
-            ms = int(ms_part)
-            return h * 3600 + m * 60 + s + ms / 1000
-        except Exception:
+            return time_to_ms(time_str) / 1000
+        except ValueError:
             return 0.0
     
     def seconds_to_time(self, seconds: float) -> str:
         """将秒数转换为时间字符串"""
-        try:
-            td = timedelta(seconds=seconds)
-            hours = int(td.total_seconds() // 3600)
-            minutes = int((td.total_seconds() % 3600) // 60)
-            secs = td.total_seconds() % 60
-            milliseconds = int((secs % 1) * 1000)
-            return f"{hours:02d}:{minutes:02d}:{int(secs):02d},{milliseconds:03d}"
-        except Exception:
-            return "00:00:00,000"
\ No newline at end of file
+        return ms_to_time(seconds_to_ms(seconds))
@@ -0,0 +1,316 @@
+import os
+import re
+import tempfile
+from typing import IO, Iterable, Iterator, Optional, Tuple
+
+# 字幕条目统一表示为 (start_ms, end_ms, text)，时间均为整数毫秒，多行文本用 \n 连接
+Cue = Tuple[int, int, str]
+
+TIME_PATTERN = re.compile(r'^(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{1,3})$')
+ASS_OVERRIDE_PATTERN = re.compile(r'\{[^}]*\}')
+
+# 定长时间戳各字段到毫秒的查找表，比逐字段 int() 更快
+_HOURS_MS = {f'{i:02d}': i * 3600000 for i in range(100)}
+_MINUTES_MS = {f'{i:02d}': i * 60000 for i in range(60)}
+_SECONDS_MS = {f'{i:02d}': i * 1000 for i in range(60)}
+_MILLIS = {f'{i:03d}': i for i in range(1000)}
+
+# 可读取的格式；写出时不支持旧版 SSA
+SUPPORTED_FORMATS = ('srt', 'vtt', 'ass', 'ssa')
+
+
+# ---- 时间戳 ----
+
+def time_to_ms(time_str: str) -> int:
+    """
+    将时间字符串转换为整数毫秒
+    支持 SRT 的 HH:MM:SS,mmm、WebVTT 的 HH:MM:SS.mmm / MM:SS.mmm 以及 ASS 的 H:MM:SS.cc
+    """
+    # 绝大多数时间戳是定长的 HH:MM:SS,mmm，直接按位置切片查表，避免正则
+    if len(time_str) == 12 and time_str[2] == ':' and time_str[5] == ':' and time_str[8] in ',.':
+        try:
+            return (_HOURS_MS[time_str[0:2]] + _MINUTES_MS[time_str[3:5]]
+                    + _SECONDS_MS[time_str[6:8]] + _MILLIS[time_str[9:12]])
+        except KeyError:
+            pass
+    match = TIME_PATTERN.match(time_str.strip())
+    if not match:
+        raise ValueError(f'Invalid time "{time_str}"')
+    h, m, s, fraction = match.groups()
+    # 小数部分按位数换算：ASS 的 .cc 是百分之一秒
+    ms = int(fraction) * 10 ** (3 - len(fraction))
+    return ((int(h or 0) * 60 + int(m)) * 60 + int(s)) * 1000 + ms
+
+
+def ms_to_time(ms: int, separator: str = ',') -> str:
+    """将整数毫秒转换为 HH:MM:SS,mmm（WebVTT 传入 separator='.'），只用整数运算"""
+    ms = max(0, ms)
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}{separator}{ms % 1000:03d}"
+
+
+def ms_to_ass_time(ms: int) -> str:
+    """ASS 时间戳 H:MM:SS.cc（精度为百分之一秒）"""
+    cs = (max(0, ms) + 5) // 10
+    return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+
+def seconds_to_ms(seconds: float) -> int:
+    """Whisper 等给出的浮点秒数取整到毫秒，之后的计算都用整数"""
+    return int(round(float(seconds) * 1000))
+
+
+def format_timestamp(seconds: float) -> str:
+    """将秒数转换为 SRT 格式的时间戳"""
+    return ms_to_time(seconds_to_ms(seconds))
+
+
+# ---- 读取 ----
+
+def _lines(source: Iterable[str]) -> Iterator[str]:
+    """去掉行尾的 \\r\\n 以及首行的 UTF-8 BOM"""
+    first = True
+    for line in source:
+        line = line.rstrip('\r\n')
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        yield line
+
+
+def _parse_timing(line: str) -> Optional[Tuple[int, int]]:
+    """解析 "start --> end [cue settings]"，不是时间轴行时返回 None"""
+    # 常见的定长写法 "HH:MM:SS,mmm --> HH:MM:SS,mmm" 直接按位置切片
+    if line[12:17] == ' --> ':
+        try:
+            return time_to_ms(line[:12]), time_to_ms(line[17:29])
+        except ValueError:
+            pass
+    start, arrow, rest = line.partition('-->')
+    if not arrow:
+        return None
+    fields = rest.split()
+    if not fields:
+        return None
+    try:
+        return time_to_ms(start.strip().lstrip('\ufeff')), time_to_ms(fields[0])
+    except ValueError:
+        return None
+
+
+def iter_srt(source: Iterable[str]) -> Iterator[Cue]:
+    """
+    逐行解析 SRT（也可用于 WebVTT 的正文部分），每解析完一条字幕就产出，不会把整个文件读入内存
+    source 可以是打开的文件或任意字符串行序列，行尾的 \\r\\n 与 BOM 都会被忽略
+    序号行可有可无；缺少合法时间轴的块被跳过
+    """
+    return _parse_srt(_lines(source))
+
+
+def _parse_srt(lines: Iterable[str]) -> Iterator[Cue]:
+    """解析已经由 _lines 去掉行尾与 BOM 的 SRT 行（也用于 WebVTT 的正文部分）"""
+    timing = None
+    text_lines = []
+    for line in lines:
+        if not line or line.isspace():
+            if timing is not None:
+                yield timing[0], timing[1], '\n'.join(text_lines)
+                timing = None
+                text_lines = []
+        elif timing is None:
+            # 块内第一行可能是序号（SRT）或 cue 标识（WebVTT），遇到时间轴行之前都忽略
+            if '-->' in line:
+                timing = _parse_timing(line)
+        else:
+            text_lines.append(line)
+    if timing is not None:
+        yield timing[0], timing[1], '\n'.join(text_lines)
+
+
+def iter_vtt(source: Iterable[str]) -> Iterator[Cue]:
+    """逐行解析 WebVTT：跳过 WEBVTT 头部以及 NOTE / STYLE / REGION 块，其余与 SRT 相同"""
+    lines = _lines(source)
+    for line in lines:
+        # 头部一直持续到第一个空行
+        if not line.strip():
+            break
+
+    def body():
+        skipping = False
+        at_block_start = True
+        for line in lines:
+            if not line.strip():
+                skipping = False
+                at_block_start = True
+                yield line
+                continue
+            if at_block_start and line.split(' ', 1)[0] in ('NOTE', 'STYLE', 'REGION'):
+                skipping = True
+            at_block_start = False
+            if not skipping:
+                yield line
+
+    return _parse_srt(body())
+
+
+def iter_ass(source: Iterable[str]) -> Iterator[Cue]:
+    """
+    逐行解析 ASS/SSA 的 [Events] 段：按 Format 行确定字段顺序，只取 Dialogue 行
+    去掉 {\\...} 样式标签，\\N 换行转换为 \\n
+    """
+    in_events = False
+    fields = ['Layer', 'Start', 'End', 'Style', 'Name', 'MarginL', 'MarginR', 'MarginV', 'Effect', 'Text']
+    for line in _lines(source):
+        stripped = line.strip()
+        if stripped.startswith('['):
+            in_events = stripped.lower() == '[events]'
+            continue
+        if not in_events:
+            continue
+        key, colon, value = stripped.partition(':')
+        if not colon:
+            continue
+        if key == 'Format':
+            fields = [field.strip() for field in value.split(',')]
+        elif key == 'Dialogue':
+            # Text 是最后一个字段，本身可以包含逗号
+            values = value.lstrip().split(',', len(fields) - 1)
+            if len(values) != len(fields):
+                continue
+            event = dict(zip(fields, values))
+            try:
+                start, end = time_to_ms(event['Start'].strip()), time_to_ms(event['End'].strip())
+            except (KeyError, ValueError):
+                continue
+            text = ASS_OVERRIDE_PATTERN.sub('', event.get('Text', ''))
+            yield start, end, text.replace('\\N', '\n').replace('\\n', '\n')
+
+
+# ---- 写出 ----
+
+def iter_srt_blocks(cues: Iterable[Cue], start_index: int = 1) -> Iterator[str]:
+    for i, (start, end, text) in enumerate(cues, start_index):
+        yield f"{i}\n{ms_to_time(start)} --> {ms_to_time(end)}\n{text}\n\n"
+
+
+def iter_vtt_blocks(cues: Iterable[Cue]) -> Iterator[str]:
+    yield 'WEBVTT\n\n'
+    for start, end, text in cues:
+        # WebVTT 的 cue 文本中不允许出现空行
+        text = '\n'.join(line for line in text.split('\n') if line.strip())
+        yield f"{ms_to_time(start, '.')} --> {ms_to_time(end, '.')}\n{text}\n\n"
+
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, \
+Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, \
+MarginV, Encoding
+Style: Default,Arial,20,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,0,2,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def iter_ass_blocks(cues: Iterable[Cue]) -> Iterator[str]:
+    yield ASS_HEADER
+    for start, end, text in cues:
+        text = text.replace('\n', '\\N')
+        yield f"Dialogue: 0,{ms_to_ass_time(start)},{ms_to_ass_time(end)},Default,,0,0,0,,{text}\n"
+
+
+READERS = {'srt': iter_srt, 'vtt': iter_vtt, 'ass': iter_ass, 'ssa': iter_ass}
+WRITERS = {'srt': iter_srt_blocks, 'vtt': iter_vtt_blocks, 'ass': iter_ass_blocks}
+
+
+def detect_format(path: str) -> str:
+    """按扩展名判断字幕格式"""
+    fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in READERS:
+        raise ValueError(f'Unsupported subtitle format "{fmt}"')
+    return fmt
+
+
+def iter_lines(f: IO[str], chunk_size: int = 1 << 20) -> Iterator[str]:
+    """
+    按块读取文本文件并切分为行（不含行尾），内存占用与块大小相关而与文件大小无关
+    文件需以通用换行模式打开，CRLF 已在解码时统一为 \\n
+    """
+    tail = ''
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        lines = (tail + chunk).split('\n')
+        tail = lines.pop()
+        yield from lines
+    if tail:
+        yield tail
+
+
+def read_cues(path: str, fmt: Optional[str] = None) -> Iterator[Cue]:
+    """逐条读取字幕文件，fmt 为空时按扩展名判断；文件在迭代结束后关闭"""
+    reader = READERS[fmt or detect_format(path)]
+    # utf-8-sig 会去掉 BOM，通用换行模式把 CRLF 统一为 \n
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        yield from reader(iter_lines(f))
+
+
+def write_cues(cues: Iterable[Cue], path: str, fmt: Optional[str] = None):
+    """
+    把字幕写入文件，fmt 为空时按扩展名判断
+    先写到同目录下的临时文件再原子地替换目标文件，读者不会看到写了一半的字幕
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in WRITERS:
+        raise ValueError(f'Cannot write subtitle format "{fmt}"')
+    writer = WRITERS[fmt]
+    fd, tmp_path = tempfile.mkstemp(prefix='.subtitle_', suffix=f'.{fmt}', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.writelines(writer(cues))
+        # mkstemp 创建的文件权限为 0600，改为与普通输出文件一致
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class SrtAppender:
+    """
+    边转录边写出的 SRT 文件：每批字幕以一次 write 追加并立即刷新，其他进程可以在转录过程中读取已完成的部分
+    转录结束后由 write_cues 原子地替换为最终版本
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def append(self, cues: Iterable[Cue]):
+        cues = list(cues)
+        if not cues:
+            return
+        self._file.write(''.join(iter_srt_blocks(cues, self.count + 1)))
+        self._file.flush()
+        self.count += len(cues)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def segments_to_cues(segments: Iterable[dict]) -> Iterator[Cue]:
+    """Whisper 片段（浮点秒）转换为整数毫秒的字幕条目"""
+    for segment in segments:
+        yield seconds_to_ms(segment['start']), seconds_to_ms(segment['end']), segment['text'].strip()
@@ -0,0 +1,383 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.paths import PathConfig
+from config.subtitles import SubtitleConfig
+from src.subtitle_io import SUPPORTED_FORMATS, detect_format, read_cues, time_to_ms
+from src.subtitle_track import SubtitleTrack
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class VersionConflict(Exception):
+    """If-Match 中的版本与当前版本不一致：字幕已被其他人修改"""
+
+    def __init__(self, current_etag):
+        super().__init__('Subtitle file has been modified')
+        self.current_etag = current_etag
+
+
+class TrackBusy(Exception):
+    """字幕仍在转录中（可能在其他服务进程或工作进程中），文件会在转录结束时被整体替换，此时不接受修改"""
+
+    def __init__(self):
+        super().__init__('Subtitle file is still being transcribed')
+
+
+class InvalidOperation(ValueError):
+    """修改操作格式错误或引用了不存在的字幕；index 为出错的操作在这一批中的下标"""
+
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.index = index
+
+
+class _Entry:
+    __slots__ = ('track', 'mtime_ns', 'size', 'lock')
+
+    def __init__(self, track, stat):
+        self.track = track
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.lock = threading.Lock()
+
+    @property
+    def etag(self):
+        # 版本号只由文件本身决定（与 http_utils.file_etag 相同的形式），
+        # 不同的服务进程、重启之后或缓存被淘汰重新加载时都得到同一个值
+        return f'"{self.mtime_ns:x}-{self.size:x}"'
+
+    def matches(self, stat):
+        return self.mtime_ns == stat.st_mtime_ns and self.size == stat.st_size
+
+
+def apply_operations(track: SubtitleTrack, operations: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    按顺序把修改操作应用到轨道上，返回 {客户端临时引用: 新字幕 id}
+    - {"op": "insert", "ref": "new-1", "before": <id 或引用>, "start_time": ..., "end_time": ..., "text": ...}
+      省略 before 时追加到末尾
+    - {"op": "update", "id": <id 或引用>, 以及 start_time / end_time / text 中要修改的字段}
+    - {"op": "delete", "id": <id 或引用>}
+    同一批操作中可以用 insert 的 ref 引用刚插入的字幕
+    """
+    refs: Dict[str, int] = {}
+
+    def resolve(key):
+        if isinstance(key, str) and key in refs:
+            return refs[key]
+        if isinstance(key, int) and not isinstance(key, bool):
+            return key
+        raise InvalidOperation(f'Unknown subtitle reference {key!r}')
+
+    def position(key):
+        i = track.position_of(resolve(key))
+        if i is None:
+            raise InvalidOperation(f'Subtitle {key!r} not found')
+        return i
+
+    def optional_time(op, field):
+        return time_to_ms(op[field]) if op.get(field) is not None else None
+
+    def apply(op):
+        if not isinstance(op, dict):
+            raise InvalidOperation('Each operation must be an object')
+        kind = op.get('op')
+        if kind == 'insert':
+            before = op.get('before')
+            at = len(track) if before is None else position(before)
+            cue_id = track.insert(at, time_to_ms(op['start_time']), time_to_ms(op['end_time']), op.get('text', ''))
+            if op.get('ref') is not None:
+                refs[str(op['ref'])] = cue_id
+        elif kind == 'update':
+            position(op.get('id'))
+            track.update(resolve(op['id']), optional_time(op, 'start_time'), optional_time(op, 'end_time'),
+                         op.get('text'))
+        elif kind == 'delete':
+            position(op.get('id'))
+            track.delete(resolve(op['id']))
+        else:
+            raise InvalidOperation(f'Unknown operation {kind!r}')
+
+    for i, op in enumerate(operations):
+        try:
+            apply(op)
+        except InvalidOperation as e:
+            e.index = i
+            raise
+        except (KeyError, TypeError) as e:
+            raise InvalidOperation(f'Malformed operation: {e}', i)
+        except ValueError as e:
+            # 时间格式错误、结束时间早于开始时间等
+            raise InvalidOperation(str(e), i)
+    return refs
+
+
+class SubtitleStore:
+    """
+    已解析字幕轨道的进程内缓存，字幕接口的读写都经过这里
+    - 以文件路径为 key，文件的 mtime/大小变化（被外部改写）时自动重新加载
+    - 每次修改先在副本上应用，全部成功后原子地写回文件，再替换缓存中的轨道
+    - 版本号（ETag）用于乐观并发控制：带 If-Match 的修改只有在版本一致时才会执行
+    - 字幕 id 即文件中的顺序号（1..n），每次写回后重新编号，任何进程加载同一文件得到相同的 id
+    """
+
+    def __init__(self, max_tracks=None, index=None):
+        self.max_tracks = max_tracks or SubtitleConfig.CACHE_TRACKS
+        # 写回文件后需要刷新的目录索引
+        self.index = index
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+        # 本进程中正在边转录边写出的文件 -> 持有锁的标记文件描述符（没有 fcntl 时为 None）
+        self._live: Dict[str, Optional[int]] = {}
+
+    @staticmethod
+    def live_marker(path):
+        """字幕文件旁的转录标记文件（.<文件名>.live），不会出现在字幕列表中"""
+        directory, name = os.path.split(os.path.abspath(path))
+        return os.path.join(directory, f'.{name}.live')
+
+    def set_live(self, path, live=True):
+        """
+        标记文件正在转录中（live=False 时取消标记）
+        标记是字幕旁对标记文件持有的 flock，同一节点上的其他服务进程与工作进程都能看到；
+        转录进程崩溃时锁由内核释放，不会把文件永久锁定。没有 fcntl 的平台只在进程内有效
+        """
+        path = os.path.abspath(path)
+        marker = self.live_marker(path)
+        if live:
+            fd = None
+            if fcntl is not None:
+                fd = os.open(marker, os.O_CREAT | os.O_RDWR, 0o644)
+                # 阻塞加锁：其他进程的 is_live 只会短暂试探加锁
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            with self._lock:
+                self._live[path] = fd
+            return
+        with self._lock:
+            fd = self._live.pop(path, None)
+        if fd is not None:
+            # 先删除标记再释放锁，之后打开标记文件的进程不会再看到转录中的状态
+            try:
+                os.remove(marker)
+            except FileNotFoundError:
+                pass
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def is_live(self, path) -> bool:
+        """文件是否正在被任意进程转录（标记文件的锁被占用）"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._live:
+                return True
+        if fcntl is None:
+            return False
+        try:
+            fd = os.open(self.live_marker(path), os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        finally:
+            os.close(fd)
+        # 没有进程持有锁：转录进程崩溃后遗留的标记文件
+        return False
+
+    def _check_writable(self, path):
+        if self.is_live(path):
+            raise TrackBusy()
+
+    def _entry(self, path) -> _Entry:
+        """取出（必要时加载）path 对应的缓存条目；文件不存在时抛出 FileNotFoundError"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.matches(stat):
+                self._entries.move_to_end(path)
+                return entry
+        # 解析放在锁外，避免大文件的加载阻塞其他文件的请求
+        entry = _Entry(SubtitleTrack.from_file(path), stat)
+        with self._lock:
+            current = self._entries.get(path)
+            if current is not None and current.matches(stat):
+                entry = current
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_tracks:
+                self._entries.popitem(last=False)
+        return entry
+
+    def peek(self, path) -> Optional[SubtitleTrack]:
+        """已缓存且与磁盘上的文件一致时返回轨道，不触发加载"""
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+        return entry.track if entry is not None and entry.matches(stat) else None
+
+    def load(self, path) -> Tuple[SubtitleTrack, str]:
+        """返回 (轨道, ETag)；调用方不应修改返回的轨道"""
+        entry = self._entry(path)
+        with entry.lock:
+            return entry.track, entry.etag
+
+    @staticmethod
+    def _check_version(entry, if_match):
+        if if_match is not None and if_match != '*' and if_match != entry.etag:
+            raise VersionConflict(entry.etag)
+
+    def _write(self, path, entry, track) -> Dict[int, int]:
+        """
+        在 entry.lock 内调用：原子写回文件并更新缓存中的轨道与版本
+        :return: 重新编号后发生变化的 {旧 id: 新 id}
+        """
+        renumbered = track.renumber()
+        track.save(path, detect_format(path))
+        if self.index is not None:
+            self.index.invalidate()
+        stat = os.stat(path)
+        if (stat.st_mtime_ns, stat.st_size) == (entry.mtime_ns, entry.size):
+            # 文件系统时间戳精度不足时内容变了版本号却不变，把 mtime 往后推一秒保证版本号变化
+            os.utime(path, ns=(stat.st_atime_ns, entry.mtime_ns + 10 ** 9))
+            stat = os.stat(path)
+        entry.track = track
+        entry.mtime_ns = stat.st_mtime_ns
+        entry.size = stat.st_size
+        return renumbered
+
+    def patch(self, path, operations, if_match=None) -> Tuple[str, Dict[str, int], Dict[int, int], int]:
+        """
+        应用一批修改操作并写回文件；任何一个操作失败时文件与缓存都保持不变
+        写回后字幕重新编号，客户端需要按返回的对应关系更新手上的 id
+        :return: (新 ETag, {客户端引用: 新字幕 id}, {旧 id: 新 id}, 字幕条数)
+        """
+        detect_format(path)
+        path = os.path.abspath(path)
+        self._check_writable(path)
+        entry = self._entry(path)
+        with entry.lock:
+            self._check_version(entry, if_match)
+            track = entry.track.copy()
+            refs = apply_operations(track, operations)
+            renumbered = self._write(path, entry, track)
+            refs = {ref: renumbered.get(cue_id, cue_id) for ref, cue_id in refs.items()}
+            return entry.etag, refs, renumbered, len(track)
+
+    def replace(self, path, track: SubtitleTrack, if_match=None) -> str:
+        """用新的轨道整体替换文件内容（PUT），文件不存在时创建"""
+        detect_format(path)
+        path = os.path.abspath(path)
+        self._check_writable(path)
+        if not os.path.exists(path):
+            track.save(path)
+            if self.index is not None:
+                self.index.invalidate()
+            return self._entry(path).etag
+        entry = self._entry(path)
+        with entry.lock:
+            self._check_version(entry, if_match)
+            self._write(path, entry, track)
+            return entry.etag
+
+    def invalidate(self, path):
+        with self._lock:
+            self._entries.pop(os.path.abspath(path), None)
+
+
+def summarize(path) -> Dict[str, int]:
+    """流式统计字幕条数与时长（最后结束的字幕的结束时间），不保留解析结果"""
+    cues = duration = 0
+    for _, end, _ in read_cues(path):
+        cues += 1
+        duration = max(duration, end)
+    return {'cues': cues, 'duration_ms': duration}
+
+
+class SubtitleIndex:
+    """
+    字幕目录索引：缓存文件列表以及每个文件的条数、时长、大小
+    - 目录的 mtime 不变（没有文件被创建、删除或经原子替换写回）时不再重新扫描目录
+    - 每个文件的统计信息以 (mtime, 大小) 校验，只在文件变化后重新统计；已在 SubtitleStore 中缓存的轨道直接复用
+    """
+
+    # 目录 mtime 距今小于该值时仍重新扫描，避免文件系统时间戳精度不足导致漏掉刚发生的变化
+    RESCAN_WINDOW_NS = 2 * 10 ** 9
+
+    def __init__(self, directory=None, store=None):
+        self.directory = directory or PathConfig.SUBTITLE_DIR
+        self.store = store
+        self._dir_mtime_ns = None
+        self._files: Dict[str, Tuple[int, int]] = {}
+        self._details: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._dir_mtime_ns = None
+
+    def _refresh(self):
+        """在 self._lock 内调用"""
+        try:
+            dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            self._files = {}
+            self._dir_mtime_ns = None
+            return
+        if dir_mtime_ns == self._dir_mtime_ns and time.time_ns() - dir_mtime_ns > self.RESCAN_WINDOW_NS:
+            return
+        extensions = tuple(f'.{fmt}' for fmt in SUPPORTED_FORMATS)
+        files = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(extensions) and entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        self._files = files
+        self._details = {name: detail for name, detail in self._details.items() if name in files}
+        self._dir_mtime_ns = dir_mtime_ns
+
+    def files(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return sorted(self._files)
+
+    def details(self) -> List[Dict[str, Any]]:
+        """每个字幕文件的 {filename, cues, duration_ms, size, mtime}"""
+        with self._lock:
+            self._refresh()
+            files = dict(self._files)
+            cached = dict(self._details)
+
+        result = []
+        for name in sorted(files):
+            mtime_ns, size = files[name]
+            detail = cached.get(name)
+            if detail is None or detail['_stat'] != (mtime_ns, size):
+                path = os.path.join(self.directory, name)
+                track = self.store.peek(path) if self.store is not None else None
+                try:
+                    stats = {'cues': len(track), 'duration_ms': track.duration()} if track else summarize(path)
+                except (OSError, ValueError):
+                    continue
+                detail = dict(stats, filename=name, size=size, mtime=mtime_ns / 1e9, _stat=(mtime_ns, size))
+                with self._lock:
+                    self._details[name] = detail
+            result.append({key: value for key, value in detail.items() if key != '_stat'})
+        return result
+
+
+index = SubtitleIndex()
+store = SubtitleStore(index=index)
+index.store = store
@@ -0,0 +1,284 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.subtitle_io import Cue, iter_srt_blocks, ms_to_time, read_cues, time_to_ms, write_cues
+
+
+class SubtitleTrack:
+    """
+    紧凑的字幕轨道：起止时间以整数毫秒存放在 array('q') 中，文本与稳定 id 分别存放在并行数组里
+    - 按开始时间有序时，按时间查找字幕为 O(log n + k)（k 为可能覆盖该时刻的字幕数）
+    - 支持重叠/间隙检测以及整体平移、缩放
+    - 保留写入顺序；按时间查找在未排序时退化为线性扫描，重叠/间隙检测会先（稳定地）排序
+    """
+
+    __slots__ = ('starts', 'ends', 'texts', 'ids', '_next_id', '_sorted', '_positions', '_max_duration')
+
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.texts: List[str] = []
+        self.ids = array('q')
+        self._next_id = 1
+        self._sorted = True
+        # id -> 下标的索引，结构变化后惰性重建
+        self._positions: Optional[Dict[int, int]] = None
+        self._max_duration = 0
+
+    @classmethod
+    def from_cues(cls, cues: Iterable[Cue]) -> 'SubtitleTrack':
+        """由 (start_ms, end_ms, text) 序列批量构建轨道"""
+        track = cls()
+        starts, ends, texts = track.starts, track.ends, track.texts
+        for start, end, text in cues:
+            if end < start:
+                raise ValueError('Subtitle end time must not be earlier than start time')
+            starts.append(start)
+            ends.append(end)
+            texts.append(text)
+        n = len(starts)
+        track.ids = array('q', range(1, n + 1))
+        track._next_id = n + 1
+        track._sorted = all(starts[i] <= starts[i + 1] for i in range(n - 1))
+        track._max_duration = max(map(int.__sub__, ends, starts), default=0)
+        return track
+
+    @classmethod
+    def from_dicts(cls, data: Iterable[Dict[str, Any]]) -> 'SubtitleTrack':
+        """由接口中的字幕字典（start_time / end_time 为 SRT 时间字符串）构建轨道"""
+        return cls.from_cues((time_to_ms(d['start_time']), time_to_ms(d['end_time']), d['text']) for d in data)
+
+    @classmethod
+    def from_file(cls, file_path: str, fmt: Optional[str] = None) -> 'SubtitleTrack':
+        """流式读取 SRT / WebVTT / ASS 文件，fmt 为空时按扩展名判断"""
+        return cls.from_cues(read_cues(file_path, fmt))
+
+    @classmethod
+    def from_editor(cls, editor) -> 'SubtitleTrack':
+        return cls.from_cues(
+            (time_to_ms(s.start_time), time_to_ms(s.end_time), s.text) for s in editor.subtitles
+        )
+
+    def copy(self) -> 'SubtitleTrack':
+        """复制轨道（数组整体拷贝），用于在副本上试应用一批修改"""
+        track = SubtitleTrack()
+        track.starts = array('q', self.starts)
+        track.ends = array('q', self.ends)
+        track.texts = list(self.texts)
+        track.ids = array('q', self.ids)
+        track._next_id = self._next_id
+        track._sorted = self._sorted
+        track._max_duration = self._max_duration
+        return track
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, int, str]]:
+        """按当前顺序产出 (id, start_ms, end_ms, text)"""
+        return zip(self.ids, self.starts, self.ends, self.texts)
+
+    # ---- 写入 ----
+
+    def append(self, start: int, end: int, text: str) -> int:
+        """追加一条字幕，返回其 id；均摊 O(1)"""
+        if end < start:
+            raise ValueError('Subtitle end time must not be earlier than start time')
+        if self.starts and start < self.starts[-1]:
+            self._sorted = False
+        cue_id = self._next_id
+        self._next_id += 1
+        self.starts.append(start)
+        self.ends.append(end)
+        self.texts.append(text)
+        self.ids.append(cue_id)
+        if self._positions is not None:
+            self._positions[cue_id] = len(self.ids) - 1
+        self._max_duration = max(self._max_duration, end - start)
+        return cue_id
+
+    def insert(self, position: int, start: int, end: int, text: str) -> int:
+        """在指定下标插入字幕，返回其 id"""
+        if end < start:
+            raise ValueError('Subtitle end time must not be earlier than start time')
+        cue_id = self._next_id
+        self._next_id += 1
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self.texts.insert(position, text)
+        self.ids.insert(position, cue_id)
+        self._positions = None
+        self._sorted = self._sorted and self._is_ordered_at(position)
+        self._max_duration = max(self._max_duration, end - start)
+        return cue_id
+
+    def update(self, cue_id: int, start: Optional[int] = None, end: Optional[int] = None,
+               text: Optional[str] = None) -> bool:
+        """按 id 更新字幕，只修改传入的字段"""
+        i = self.position_of(cue_id)
+        if i is None:
+            return False
+        new_start = self.starts[i] if start is None else start
+        new_end = self.ends[i] if end is None else end
+        if new_end < new_start:
+            raise ValueError('Subtitle end time must not be earlier than start time')
+        self.starts[i] = new_start
+        self.ends[i] = new_end
+        if text is not None:
+            self.texts[i] = text
+        self._sorted = self._sorted and self._is_ordered_at(i)
+        self._max_duration = max(self._max_duration, new_end - new_start)
+        return True
+
+    def delete(self, cue_id: int) -> bool:
+        i = self.position_of(cue_id)
+        if i is None:
+            return False
+        del self.starts[i]
+        del self.ends[i]
+        del self.texts[i]
+        del self.ids[i]
+        self._positions = None
+        return True
+
+    def renumber(self) -> Dict[int, int]:
+        """把 id 按当前顺序重新编号为 1..n（与从文件重新加载得到的 id 一致），返回发生变化的 {旧 id: 新 id}"""
+        n = len(self.ids)
+        changed = {old: new for new, old in enumerate(self.ids, 1) if old != new}
+        if changed:
+            self.ids = array('q', range(1, n + 1))
+            self._positions = None
+        self._next_id = n + 1
+        return changed
+
+    def _is_ordered_at(self, i: int) -> bool:
+        return ((i == 0 or self.starts[i - 1] <= self.starts[i])
+                and (i == len(self.starts) - 1 or self.starts[i] <= self.starts[i + 1]))
+
+    def position_of(self, cue_id: int) -> Optional[int]:
+        """id 对应的当前下标"""
+        if self._positions is None:
+            self._positions = {cue_id: i for i, cue_id in enumerate(self.ids)}
+        return self._positions.get(cue_id)
+
+    def sort(self):
+        """按开始时间稳定排序（开始时间相同的保持原有顺序）"""
+        if self._sorted:
+            return
+        order = sorted(range(len(self.starts)), key=self.starts.__getitem__)
+        self.starts = array('q', (self.starts[i] for i in order))
+        self.ends = array('q', (self.ends[i] for i in order))
+        self.texts = [self.texts[i] for i in order]
+        self.ids = array('q', (self.ids[i] for i in order))
+        self._positions = None
+        self._sorted = True
+
+    # ---- 查询 ----
+
+    def cues_at(self, t: int) -> List[int]:
+        """
+        返回在 t 毫秒时显示的所有字幕下标（start <= t < end）
+        轨道未排序时退化为线性扫描，不会改变字幕顺序（缓存中的轨道可能被多个请求共享读取）
+        """
+        if not self._sorted:
+            return [i for i in range(len(self.starts)) if self.starts[i] <= t < self.ends[i]]
+        hi = bisect_right(self.starts, t)
+        lo = bisect_left(self.starts, t - self._max_duration, 0, hi)
+        return [i for i in range(lo, hi) if self.ends[i] > t]
+
+    def cue_at(self, t: int) -> Optional[int]:
+        """返回在 t 毫秒时显示的字幕下标，多条重叠时取开始最晚的一条"""
+        found = self.cues_at(t)
+        return found[-1] if found else None
+
+    def cues_in_range(self, start: int, end: int) -> List[int]:
+        """返回与 [start, end) 有重叠的字幕下标，按当前顺序排列"""
+        if not self._sorted:
+            return [i for i in range(len(self.starts)) if self.starts[i] < end and self.ends[i] > start]
+        hi = bisect_left(self.starts, end)
+        lo = bisect_left(self.starts, start - self._max_duration, 0, hi)
+        return [i for i in range(lo, hi) if self.ends[i] > start]
+
+    def overlaps(self) -> List[Tuple[int, int]]:
+        """返回所有相互重叠的相邻字幕对 (前一条下标, 后一条下标)"""
+        self.sort()
+        result = []
+        latest = -1  # 目前为止结束最晚的字幕
+        for i in range(len(self.starts)):
+            if latest >= 0 and self.starts[i] < self.ends[latest]:
+                result.append((latest, i))
+            if latest < 0 or self.ends[i] > self.ends[latest]:
+                latest = i
+        return result
+
+    def gaps(self, min_gap: int = 0) -> List[Tuple[int, int]]:
+        """返回长于 min_gap 毫秒、没有任何字幕显示的空白区间 (start_ms, end_ms)"""
+        self.sort()
+        result = []
+        covered_until = None
+        for start, end in zip(self.starts, self.ends):
+            if covered_until is not None and start - covered_until > min_gap:
+                result.append((covered_until, start))
+            covered_until = end if covered_until is None else max(covered_until, end)
+        return result
+
+    # ---- 批量操作 ----
+
+    def shift(self, delta: int, start_index: int = 0, end_index: Optional[int] = None):
+        """把 [start_index, end_index) 范围内的字幕整体平移 delta 毫秒，结果不早于 0"""
+        n = len(self.starts)
+        if start_index < 0 or (end_index is not None and end_index < 0):
+            raise ValueError('Subtitle index must not be negative')
+        if start_index >= n:
+            return
+        end_index = n if end_index is None else end_index
+        if not start_index <= end_index <= n:
+            raise ValueError(f'Subtitle range [{start_index}, {end_index}) is out of range for {n} subtitles')
+        for i in range(start_index, end_index):
+            self.starts[i] = max(0, self.starts[i] + delta)
+            self.ends[i] = max(0, self.ends[i] + delta)
+        if start_index > 0 or end_index < len(self.starts):
+            self._sorted = self._sorted and self._is_ordered_at(start_index) and \
+                (end_index == 0 or self._is_ordered_at(end_index - 1))
+
+    def scale(self, factor: float, origin: int = 0):
+        """以 origin 毫秒为原点按比例缩放时间轴（例如修正帧率不一致导致的字幕漂移）"""
+        if factor <= 0:
+            raise ValueError('Scale factor must be positive')
+        self.starts = array('q', (max(0, origin + round((s - origin) * factor)) for s in self.starts))
+        self.ends = array('q', (max(0, origin + round((e - origin) * factor)) for e in self.ends))
+        self._max_duration = round(self._max_duration * factor) + 1
+
+    def duration(self) -> int:
+        return max(self.ends) if self.ends else 0
+
+    # ---- 输出 ----
+
+    def to_dict(self, i: int) -> Dict[str, Any]:
+        return {
+            'index': i + 1,
+            'id': self.ids[i],
+            'start_time': ms_to_time(self.starts[i]),
+            'end_time': ms_to_time(self.ends[i]),
+            'text': self.texts[i],
+        }
+
+    def to_dicts(self, start_index: int = 0, end_index: Optional[int] = None) -> List[Dict[str, Any]]:
+        end_index = len(self.starts) if end_index is None else end_index
+        return [self.to_dict(i) for i in range(start_index, min(end_index, len(self.starts)))]
+
+    def cues(self) -> Iterator[Cue]:
+        """按当前顺序产出 (start_ms, end_ms, text)"""
+        return zip(self.starts, self.ends, self.texts)
+
+    def iter_srt(self) -> Iterator[str]:
+        """按当前顺序逐条产出 SRT 文本块"""
+        return iter_srt_blocks(self.cues())
+
+    def save(self, file_path: str, fmt: Optional[str] = None):
+        """写出为 SRT / WebVTT / ASS，fmt 为空时按扩展名判断"""
+        write_cues(self.cues(), file_path, fmt)
+
+    def save_to_srt(self, file_path: str):
+        self.save(file_path, 'srt')
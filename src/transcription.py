@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+
+from src.chunked_transcription import load_audio_segment, transcribe_chunked
+from src.metrics import measure_stage
+from src.model_registry import get_model
+from src.subtitle_io import segments_to_cues
+from src.translation import get_translator, translate_cues
+
+# 可以在一次转录中同时产出的派生结果
+OUTPUT_LANGUAGE = 'language'
+OUTPUT_TRANSLATION = 'translation'
+OUTPUT_WORDS = 'words'
+AVAILABLE_OUTPUTS = (OUTPUT_LANGUAGE, OUTPUT_TRANSLATION, OUTPUT_WORDS)
+
+
+def parse_outputs(value):
+    """解析逗号分隔的输出列表，遇到未知的输出名称时抛出 ValueError"""
+    outputs = [item.strip() for item in (value or '').split(',') if item.strip()]
+    unknown = [item for item in outputs if item not in AVAILABLE_OUTPUTS]
+    if unknown:
+        raise ValueError(f'Unknown outputs: {", ".join(unknown)}. Available: {", ".join(AVAILABLE_OUTPUTS)}')
+    return outputs
+
+
+def load_audio(audio):
+    """音频只解码一次：已是 16 kHz float32 数组时直接返回，文件路径则整体解码为数组"""
+    if isinstance(audio, np.ndarray):
+        return audio
+    # 直接用 ffmpeg 解码，不依赖具体引擎是否安装了 openai-whisper
+    return load_audio_segment(audio)
+
+
+def detect_language(audio, model):
+    """
+    只用第一个 30 秒窗口检测语言，不运行完整的转录
+    :param audio: 16 kHz float32 数组，或文件路径（此时只解码前 30 秒）
+    :param model: get_model 返回的 EngineModel
+    :return: (语言代码, 该语言的概率)
+    """
+    return model.detect_language(audio)
+
+
+def transcribe_outputs(audio, model_name=None, language=None, outputs=(), target_language=None, translator=None,
+                       chunked=False, engine=None, on_progress=None):
+    """
+    一次转录产出原始字幕以及请求的派生结果，所有结果共享同一份解码后的音频与转录结果：
+    - 先用前 30 秒检测语言，再以该语言转录，转录时不会再次检测
+    - words：在同一次转录中开启词级时间戳
+    - translation：对转录得到的字幕文本分批翻译，不再运行 Whisper 的 translate 任务
+    chunked=True 时 audio 为文件路径，由各子进程解码自己的区间，语言检测只解码前 30 秒
+    on_progress(比例, 新片段列表) 在转录过程中回调，见 EngineModel.transcribe
+    :return: {'segments', 'language', 'language_probability', 'translation'（字幕条目列表）, 'translation_stats'}
+    """
+    outputs = set(outputs)
+    model = get_model(model_name, engine=engine)
+    if not chunked:
+        audio = load_audio(audio)
+
+    result = {'language': language, 'language_probability': None}
+    if language is None:
+        result['language'], result['language_probability'] = detect_language(audio, model)
+
+    word_timestamps = OUTPUT_WORDS in outputs
+    if chunked:
+        result['segments'] = transcribe_chunked(audio, model_name=model_name, language=result['language'],
+                                                word_timestamps=word_timestamps, engine=engine,
+                                                on_progress=on_progress)
+    else:
+        result['segments'] = model.transcribe(audio, language=result['language'], word_timestamps=word_timestamps,
+                                              on_progress=on_progress)['segments']
+
+    if OUTPUT_TRANSLATION in outputs and target_language:
+        cues = list(segments_to_cues(result['segments']))
+        stats = {}
+        if target_language != result['language']:
+            with measure_stage('translate', cues=len(cues)):
+                cues = translate_cues(cues, target_language, result['language'],
+                                      translator=get_translator(translator), stats=stats)
+        result['translation'] = cues
+        result['translation_stats'] = stats
+    return result
+
+
+def write_words(segments, path):
+    """把词级时间戳写成 JSON：[{"start": 秒, "end": 秒, "word": "..."}, ...]"""
+    words = [
+        {'start': round(word['start'], 3), 'end': round(word['end'], 3), 'word': word['word']}
+        for segment in segments for word in segment.get('words', [])
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(words, f, ensure_ascii=False)
+    return len(words)
@@ -0,0 +1,245 @@
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from config.translation import TranslationConfig
+from src.db import connect, init_db
+from src.subtitle_io import Cue
+
+
+# 目标语言代码：ISO 639 两到三个字母，可带地区或文字后缀（zh-CN、pt_BR、zh-Hant）
+# 语言代码会拼进输出文件名，只允许字母数字可以防止 ../ 之类的路径穿越
+LANGUAGE_CODE_PATTERN = re.compile(r'^[A-Za-z]{2,3}([-_][A-Za-z0-9]+)?$')
+
+
+def is_language_code(value) -> bool:
+    """value 是否为合法的语言代码"""
+    return isinstance(value, str) and LANGUAGE_CODE_PATTERN.match(value) is not None
+
+
+class TranslationUnavailable(Exception):
+    """翻译后端不可用（依赖未安装、缺少语言对模型或未知的后端名称）"""
+
+
+class Translator:
+    """
+    翻译后端接口：一次翻译一批文本，返回与输入一一对应的译文
+    后端本身不需要处理缓存、去重和并发，这些由 translate_texts 统一完成
+    """
+
+    name = 'base'
+
+    def translate_batch(self, texts: Sequence[str], source: Optional[str], target: str) -> List[str]:
+        raise NotImplementedError
+
+
+class StubTranslator(Translator):
+    """
+    测试用后端：不做真正的翻译，返回带目标语言标记的原文
+    latency 模拟每个批次的请求耗时，便于测量批处理与并发的效果
+    """
+
+    name = 'stub'
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.batches = 0
+
+    def translate_batch(self, texts, source, target):
+        self.batches += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [f'[{target}] {text}' for text in texts]
+
+
+class MarianTranslator(Translator):
+    """
+    本地离线翻译：Helsinki-NLP/opus-mt-{source}-{target} 系列模型（transformers 的 MarianMT）
+    每个语言对的模型只加载一次并常驻内存
+    """
+
+    name = 'marian'
+
+    def __init__(self, model_template=None):
+        self.model_template = model_template or TranslationConfig.MARIAN_MODEL_TEMPLATE
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _load(self, source, target):
+        if not source:
+            raise TranslationUnavailable('Marian translation requires a known source language')
+        key = (source, target)
+        with self._lock:
+            if key not in self._models:
+                try:
+                    from transformers import MarianMTModel, MarianTokenizer
+                except ImportError:
+                    raise TranslationUnavailable('transformers is not installed')
+                name = self.model_template.format(source=source, target=target)
+                try:
+                    self._models[key] = (MarianTokenizer.from_pretrained(name), MarianMTModel.from_pretrained(name))
+                except OSError as e:
+                    raise TranslationUnavailable(f'No translation model for {source} -> {target}: {str(e)}')
+            return self._models[key]
+
+    def translate_batch(self, texts, source, target):
+        tokenizer, model = self._load(source, target)
+        batch = tokenizer(list(texts), return_tensors='pt', padding=True, truncation=True)
+        output = model.generate(**batch)
+        return tokenizer.batch_decode(output, skip_special_tokens=True)
+
+
+TRANSLATORS = {
+    'stub': StubTranslator,
+    'marian': MarianTranslator,
+}
+
+_translators: Dict[str, Translator] = {}
+_translators_lock = threading.Lock()
+
+
+def register_translator(name, factory):
+    """注册新的翻译后端，factory 无参数调用后返回 Translator 实例"""
+    TRANSLATORS[name] = factory
+
+
+def get_translator(name=None) -> Translator:
+    """按名称获取（进程内共享的）翻译后端，为空时使用 TranslationConfig.BACKEND"""
+    name = name or TranslationConfig.BACKEND
+    with _translators_lock:
+        if name not in _translators:
+            if name not in TRANSLATORS:
+                raise TranslationUnavailable(f'Unknown translation backend "{name}"')
+            _translators[name] = TRANSLATORS[name]()
+        return _translators[name]
+
+
+class TranslationCache:
+    """持久化的译文缓存：(后端, 源语言, 目标语言, 原文) -> 译文，重复的句子和重新运行都不再调用后端"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or TranslationConfig.CACHE_DB_PATH
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        init_db(self.db_path, """
+            CREATE TABLE IF NOT EXISTS translations (
+                backend TEXT NOT NULL,
+                source_lang TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                source_text TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (backend, source_lang, target_lang, text_hash)
+            );
+        """)
+
+    @staticmethod
+    def _hash(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_many(self, backend, source, target, texts: Iterable[str]) -> Dict[str, str]:
+        """返回已缓存的 {原文: 译文}"""
+        texts = list(texts)
+        found = {}
+        with self._connect() as conn:
+            # 分批查询，避免超过 SQLite 的参数个数上限
+            for i in range(0, len(texts), 500):
+                chunk = {self._hash(text): text for text in texts[i:i + 500]}
+                rows = conn.execute(
+                    'SELECT text_hash, translation FROM translations WHERE backend = ? AND source_lang = ? '
+                    f'AND target_lang = ? AND text_hash IN ({",".join("?" * len(chunk))})',
+                    (backend, source or 'auto', target, *chunk)
+                ).fetchall()
+                for row in rows:
+                    found[chunk[row['text_hash']]] = row['translation']
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return found
+
+    def put_many(self, backend, source, target, translations: Dict[str, str]):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO translations '
+                '(backend, source_lang, target_lang, text_hash, source_text, translation, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(backend, source or 'auto', target, self._hash(text), text, translation, now)
+                 for text, translation in translations.items()]
+            )
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0}
+
+
+def make_batches(texts: Sequence[str], max_chars=None, max_items=None) -> List[List[str]]:
+    """按字符数与条数上限把文本分批，单条超过字符上限的文本独占一批"""
+    max_chars = max_chars or TranslationConfig.BATCH_MAX_CHARS
+    max_items = max_items or TranslationConfig.BATCH_MAX_ITEMS
+    batches = []
+    current, size = [], 0
+    for text in texts:
+        if current and (size + len(text) > max_chars or len(current) >= max_items):
+            batches.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def translate_texts(texts: Sequence[str], target: str, source: Optional[str] = None, translator=None,
+                    cache=None, concurrency=None, stats=None) -> List[str]:
+    """
+    翻译一组文本，返回与输入一一对应的译文
+    相同的文本只翻译一次；先查缓存，未命中的文本按大小分批后并发交给后端，结果写回缓存
+    :param stats: 可选的字典，写入 unique / cached / translated / batches 计数
+    """
+    translator = translator or get_translator()
+    cache = cache if cache is not None else translation_cache
+    concurrency = concurrency or TranslationConfig.CONCURRENCY
+
+    # 空白文本不需要翻译
+    unique = list(dict.fromkeys(text for text in texts if text.strip()))
+    translated = cache.get_many(translator.name, source, target, unique) if cache else {}
+    missing = [text for text in unique if text not in translated]
+    batches = make_batches(missing)
+
+    def run(batch):
+        result = translator.translate_batch(batch, source, target)
+        if len(result) != len(batch):
+            raise ValueError(f'Translator returned {len(result)} results for {len(batch)} texts')
+        return dict(zip(batch, result))
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(batches))) as pool:
+            for result in pool.map(run, batches):
+                translated.update(result)
+                if cache:
+                    cache.put_many(translator.name, source, target, result)
+
+    if stats is not None:
+        stats.update(unique=len(unique), cached=len(unique) - len(missing), translated=len(missing),
+                     batches=len(batches))
+    return [translated.get(text, text) for text in texts]
+
+
+def translate_cues(cues: Iterable[Cue], target: str, source: Optional[str] = None, **kwargs) -> List[Cue]:
+    """翻译字幕文本，起止时间保持不变"""
+    cues = list(cues)
+    translations = translate_texts([text for _, _, text in cues], target, source, **kwargs)
+    return [(start, end, text) for (start, end, _), text in zip(cues, translations)]
+
+
+translation_cache = TranslationCache()
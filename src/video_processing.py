@@ -1,100 +1,210 @@
+import logging
 import os
 import subprocess
-import whisper
-from datetime import timedelta
-from config.paths import PathConfig
+import time
+
+import numpy as np
 
-def extract_audio_from_video(video_path, audio_path, sample_rate=44000):
-    """从视频中提取音频并保存为 wav 文件"""
+from config.paths import PathConfig
+from config.transcription import TranscriptionConfig
+from src.chunked_transcription import transcribe_chunked, SAMPLE_RATE
+from src.encode_profiles import resolve_encode_profile, build_embed_command
+from src.ffmpeg_progress import probe_duration, run_ffmpeg
+from src.model_registry import get_model
+from src.subtitle_io import segments_to_cues, write_cues
+from src.transcription import OUTPUT_TRANSLATION, detect_language, transcribe_outputs
+
+logger = logging.getLogger(__name__)
+
+# 旧版 wav 提取（44 kHz 双声道 16 bit）每秒音频写入的字节数
+LEGACY_WAV_BYTES_PER_SECOND = 44000 * 2 * 2
+# 旧版提取每秒音频的平均耗时（指数滑动平均），用于估算流式提取节省的时间
+_legacy_seconds_per_audio_second = None
+
+def extract_audio_from_video(video_path, audio_path, sample_rate=44000, on_progress=None):
+    """
+    从视频中提取音频并保存为 wav 文件
+    :param on_progress: 可选的进度回调 on_progress(比例)，由 ffmpeg 的 -progress 输出驱动
+    """
+    global _legacy_seconds_per_audio_second
+    cmd = [
+        'ffmpeg', '-nostdin', '-y', '-i', video_path, '-vn', '-ar', str(sample_rate),
+        '-ac', '2', audio_path
+    ]
+    start = time.perf_counter()
+    run_ffmpeg(cmd, on_progress, probe_duration(video_path) if on_progress else None)
+    elapsed = time.perf_counter() - start
+
+    audio_seconds = os.path.getsize(audio_path) / (sample_rate * 2 * 2)
+    if sample_rate == 44000 and audio_seconds > 0:
+        rate = elapsed / audio_seconds
+        previous = _legacy_seconds_per_audio_second
+        _legacy_seconds_per_audio_second = rate if previous is None else 0.8 * previous + 0.2 * rate
+
+def audio_array_command(input_path, wav_path=None):
+    """
+    构造把音轨解码为 16 kHz 单声道 float32 并写到 stdout 的 ffmpeg 命令
+    :param input_path: 输入文件路径，也可以是 pipe:0（从 stdin 读取）
+    :param wav_path: 可选，同一次解码额外输出一份 16 kHz 单声道 wav 文件
+    """
     cmd = [
-        'ffmpeg', '-i', video_path, '-vn', '-ar', str(sample_rate),
-        '-ac', '2', '-b:a', '128k', audio_path
+        'ffmpeg', '-loglevel', 'error', '-y', '-i', input_path,
+        '-map', '0:a:0', '-f', 'f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1'
     ]
-    subprocess.run(cmd, check=True)
-
-def format_timestamp(seconds):
-    """将秒数转换为 SRT 格式的时间戳"""
-    td = timedelta(seconds=float(seconds))
-    hours = int(td.total_seconds() // 3600)
-    minutes = int((td.total_seconds() % 3600) // 60)
-    seconds = td.total_seconds() % 60
-    milliseconds = int((seconds % 1) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{int(seconds):02d},{milliseconds:03d}"
-
-def generate_subtitles(audio_path, output_srt_path, language='zh'):
-    """使用 Whisper 生成字幕文件"""
+    if input_path != 'pipe:0':
+        cmd.insert(1, '-nostdin')
+    if wav_path:
+        cmd += ['-map', '0:a:0', '-ac', '1', '-ar', str(SAMPLE_RATE), wav_path]
+    return cmd
+
+def build_audio_stats(audio, elapsed, wav_path=None, mode='stream'):
+    """
+    统计流式提取写盘的字节数、相比旧版 wav 节省的字节数与估算节省的时间
+    旧版流程比流式提取多出两部分开销：写出 44 kHz 双声道 wav，以及 Whisper 再次读入并重采样该 wav
+    - 写出部分：本进程跑过旧版提取时按实测的每秒音频提取耗时计算（time_saved_source 为 measured），
+      否则按 WAV_WRITE_BYTES_PER_SECOND 的写入速度估算节省的字节数所需的时间（estimated）
+    - 重新读入部分按 WAV_REDECODE_REALTIME 估算
+    """
+    audio_seconds = len(audio) / SAMPLE_RATE
+    legacy_wav_bytes = int(audio_seconds * LEGACY_WAV_BYTES_PER_SECOND)
+    bytes_written = os.path.getsize(wav_path) if wav_path else 0
+    bytes_saved = max(0, legacy_wav_bytes - bytes_written)
+    if _legacy_seconds_per_audio_second is not None:
+        extract_saved = max(0.0, _legacy_seconds_per_audio_second * audio_seconds - elapsed)
+        source = 'measured'
+    else:
+        extract_saved = bytes_saved / TranscriptionConfig.WAV_WRITE_BYTES_PER_SECOND
+        source = 'estimated'
+    redecode_saved = audio_seconds / TranscriptionConfig.WAV_REDECODE_REALTIME
+    return {
+        'mode': mode,
+        'audio_seconds': round(audio_seconds, 3),
+        'extract_seconds': round(elapsed, 3),
+        'bytes_written': bytes_written,
+        'bytes_saved': bytes_saved,
+        'time_saved_seconds': round(extract_saved + redecode_saved, 3),
+        'time_saved_source': source,
+    }
+
+def extract_audio_array(video_path, wav_path=None, on_progress=None):
+    """
+    将视频音轨直接解码为 Whisper 所需的 16 kHz 单声道 float32，通过 ffmpeg 的 stdout 读入内存，不落盘
+    :param wav_path: 可选，同时保留一份 16 kHz 单声道 wav 文件（同一次解码输出两路）
+    :param on_progress: 可选的进度回调 on_progress(比例)；stdout 已用于传输音频，进度按已读入的采样数计算
+    :return: (audio, stats)，audio 可直接传给 model.transcribe，stats 记录写盘字节数与节省的时间
+    """
+    cmd = audio_array_command(video_path, wav_path)
+    duration = probe_duration(video_path) if on_progress else None
+    expected_bytes = duration * SAMPLE_RATE * 4 if duration else None
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # 逐块读入可增长的 bytearray，最后零拷贝地转换为可写的 numpy 数组
+    buffer = bytearray()
+    while True:
+        chunk = process.stdout.read(1 << 20)
+        if not chunk:
+            break
+        buffer += chunk
+        if expected_bytes:
+            on_progress(min(1.0, len(buffer) / expected_bytes))
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+
+    audio = np.frombuffer(buffer, dtype=np.float32)
+    return audio, build_audio_stats(audio, time.perf_counter() - start, wav_path)
+
+def write_srt(segments, output_srt_path):
+    """将 Whisper 片段列表写入 SRT 文件"""
+    write_cues(segments_to_cues(segments), output_srt_path, 'srt')
+
+def transcribe_segments(audio_path, model_name=None, chunked=False, engine=None, on_progress=None, language=None):
+    """
+    转录音频，返回 (片段列表, 检测到的语言)
+    chunked=True 时在静音处切分音频并用进程池并行转录（不检测语言，只返回传入的 language）
+    :param engine: 转录引擎名称（openai-whisper / faster-whisper），为空时使用 ModelConfig.DEFAULT_ENGINE
+    :param on_progress: 可选的回调 on_progress(比例, 新片段列表)，新转录出的片段会尽早交给调用方
+    :param language: 音频的源语言，为空时由模型自动检测
+    """
+    if chunked:
+        return transcribe_chunked(audio_path, model_name=model_name, language=language, engine=engine,
+                                  on_progress=on_progress), language
+    # 从进程级注册表获取共享的转录模型
+    model = get_model(model_name, engine=engine)
+    result = model.transcribe(audio_path, language=language, on_progress=on_progress)
+    return result["segments"], result.get("language")
+
+
+def generate_subtitles(audio_path, output_srt_path, language=None, model_name=None, chunked=False, engine=None,
+                       on_progress=None):
+    """
+    使用 Whisper 生成字幕文件
+    audio_path 可以是音视频文件路径，也可以是 extract_audio_array 返回的 16 kHz float32 数组
+    language 为音频的源语言，为空时由模型自动检测
+    chunked=True 时在静音处切分音频并用进程池并行转录，适合长音频（仅支持文件路径）
+    on_progress(比例, 新片段列表) 在转录过程中回调，可用于推送进度与边转录边写出字幕
+    """
     try:
-        # 加载 Whisper 模型
-        model = whisper.load_model("large-v3")
-        result = model.transcribe(audio_path)
-
-        with open(output_srt_path, 'w', encoding='utf-8') as f:
-            for i, segment in enumerate(result["segments"], 1):
-                start_time = format_timestamp(segment["start"])
-                end_time = format_timestamp(segment["end"])
-                f.write(f"{i}\n{start_time} --> {end_time}\n{segment['text'].strip()}\n\n")
-
+        segments, _ = transcribe_segments(audio_path, model_name, chunked, engine, on_progress, language)
+        write_srt(segments, output_srt_path)
         return True
     except Exception as e:
-        print(f"生成字幕时出错: {str(e)}")
+        logger.exception('生成字幕时出错')
         return False
 
 
-# TODO 这个方法暂时只实现到翻译成英文的功能
-def generate_subtitles_with_translation(audio_path, output_srt_path, target_language='zh'):
-    """使用 Whisper 生成翻译成目标语言的字幕"""
+def generate_subtitles_with_translation(audio_path, output_srt_path, target_language='zh', model_name=None,
+                                        chunked=False, source_language=None, translator=None, engine=None,
+                                        on_progress=None):
+    """
+    生成翻译成目标语言的字幕：只转录一遍，再把字幕文本分批交给翻译后端，起止时间保持不变
+    :param source_language: 源语言，为空时只用前 30 秒检测
+    :param translator: 翻译后端名称，为空时使用 TranslationConfig.BACKEND
+    """
     try:
-        # 加载 Whisper 模型
-        model = whisper.load_model("large-v3")
-
-        # TODO 使用 Whisper 的内置翻译功能 whisper 暂时只支持翻译成英文,需要接入第三方翻译服务 , 这里不会生效
-        print(f"Transcribing and translating audio to '{target_language}'...")
-        result = model.transcribe(audio_path, task="translate")
+        logger.info('转录并翻译为 %s', target_language)
+        result = transcribe_outputs(audio_path, model_name, source_language, [OUTPUT_TRANSLATION], target_language,
+                                    translator, chunked, engine, on_progress)
+        logger.info('翻译完成: %s', result['translation_stats'])
 
         # 保存翻译后的字幕
-        with open(output_srt_path, 'w', encoding='utf-8') as f:
-            for i, segment in enumerate(result["segments"], 1):
-                start_time = format_timestamp(segment["start"])
-                end_time = format_timestamp(segment["end"])
-                text = segment['text'].strip()
-
-                f.write(f"{i}\n{start_time} --> {end_time}\n{text}\n\n")
-
+        write_cues(result['translation'], output_srt_path, 'srt')
         return True
     except Exception as e:
-        print(f"生成翻译字幕时出错: {str(e)}")
+        logger.exception('生成翻译字幕时出错')
         return False
 
 
-def detect_language_in_audio(audio_path):
-    """检测音频中的主语言"""
+def detect_language_in_audio(audio_path, model_name=None, engine=None):
+    """检测音频中的主语言：只解码并分析前 30 秒，不再运行完整的转录"""
     try:
-        # 加载 Whisper 模型
-        model = whisper.load_model("large-v3")
-
-        # 转录音频并获取语言信息
-        result = model.transcribe(audio_path)
-
-        # 提取检测到的语言
-        detected_language = result['language']
-        print(f"检测到的语言是: {detected_language}")
+        # 从进程级注册表获取共享的转录模型
+        model = get_model(model_name, engine=engine)
+        detected_language, probability = detect_language(audio_path, model)
+        logger.info('检测到的语言是: %s (%.2f)', detected_language, probability)
 
         return detected_language
     except Exception as e:
-        print(f"检测语言时出错: {str(e)}")
+        logger.exception('检测语言时出错')
         return None
 
 
-
-
-def embed_subtitles(video_path, subtitle_path, output_path):
-    """使用 FFmpeg 将字幕嵌入到视频中"""
+def embed_subtitles(video_path, subtitle_path, output_path, profile=None, on_progress=None, duration=None,
+                    faststart=True):
+    """
+    使用 FFmpeg 将字幕嵌入到视频中
+    :param profile: resolve_encode_profile 返回的编码档位，为空时使用默认档位
+    :param on_progress: 可选的进度回调 on_progress(比例)，由 ffmpeg 的 -progress 输出驱动
+    :param duration: 视频时长（秒），已知时不再调用 ffprobe
+    :param faststart: mp4 输出是否把 moov 移到文件开头（见 faststart_args）
+    """
+    profile = profile or resolve_encode_profile()
     try:
-        cmd = [
-            'ffmpeg', '-i', video_path, '-vf', f'subtitles={subtitle_path}', '-c:a', 'copy', output_path
-        ]
-        subprocess.run(cmd, check=True)
+        cmd = build_embed_command(video_path, subtitle_path, output_path, profile, faststart)
+        if on_progress and not duration:
+            duration = probe_duration(video_path)
+        run_ffmpeg(cmd, on_progress, duration)
         return True
     except subprocess.CalledProcessError as e:
-        print(f"嵌入字幕时出错: {str(e)}")
-        return False
\ No newline at end of file
+        logger.error('嵌入字幕时出错: %s', e)
+        return False
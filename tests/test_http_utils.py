@@ -0,0 +1,127 @@
+"""send_file_range 的 Range 与条件请求：用 Flask 测试客户端逐字节比对响应体与文件切片"""
+import os
+
+import pytest
+from flask import Flask, abort
+
+from src.http_utils import send_file_range
+
+SIZE = 10000
+
+
+@pytest.fixture
+def data(tmp_path):
+    content = bytes(i * 7 % 256 for i in range(SIZE))
+    (tmp_path / 'video.bin').write_bytes(content)
+    return content
+
+
+@pytest.fixture
+def client(tmp_path, data):
+    app = Flask(__name__)
+
+    @app.route('/download/<filename>', methods=['GET', 'HEAD'])
+    def download(filename):
+        response = send_file_range(str(tmp_path), filename)
+        if response is None:
+            abort(404)
+        return response
+
+    return app.test_client()
+
+
+def test_full_file(client, data):
+    response = client.get('/download/video.bin')
+    assert response.status_code == 200
+    assert response.headers['Content-Length'] == str(SIZE)
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert 'Content-Range' not in response.headers
+    assert response.get_data() == data
+
+
+@pytest.mark.parametrize('header, start, stop', [
+    ('bytes=0-0', 0, 1),
+    ('bytes=100-1099', 100, 1100),
+    ('bytes=9000-', 9000, SIZE),
+    # 结束位置超出文件时截断到文件末尾
+    ('bytes=9990-20000', 9990, SIZE),
+])
+def test_partial_content(client, data, header, start, stop):
+    response = client.get('/download/video.bin', headers={'Range': header})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes {start}-{stop - 1}/{SIZE}'
+    assert response.headers['Content-Length'] == str(stop - start)
+    assert response.get_data() == data[start:stop]
+
+
+@pytest.mark.parametrize('suffix', [1, 500, SIZE, SIZE + 100])
+def test_suffix_range(client, data, suffix):
+    response = client.get('/download/video.bin', headers={'Range': f'bytes=-{suffix}'})
+    start = max(0, SIZE - suffix)
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes {start}-{SIZE - 1}/{SIZE}'
+    assert response.headers['Content-Length'] == str(SIZE - start)
+    assert response.get_data() == data[start:]
+
+
+def test_unsatisfiable_range(client):
+    response = client.get('/download/video.bin', headers={'Range': f'bytes={SIZE}-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{SIZE}'
+
+
+def test_multiple_ranges_fall_back_to_full_file(client, data):
+    response = client.get('/download/video.bin', headers={'Range': 'bytes=0-9,20-29'})
+    assert response.status_code == 200
+    assert response.get_data() == data
+
+
+def test_if_range(client, data):
+    etag = client.get('/download/video.bin').headers['ETag']
+
+    matching = client.get('/download/video.bin', headers={'Range': 'bytes=10-19', 'If-Range': etag})
+    assert matching.status_code == 206
+    assert matching.get_data() == data[10:20]
+
+    stale = client.get('/download/video.bin', headers={'Range': 'bytes=10-19', 'If-Range': '"stale"'})
+    assert stale.status_code == 200
+    assert 'Content-Range' not in stale.headers
+    assert stale.get_data() == data
+
+
+def test_not_modified(client):
+    first = client.get('/download/video.bin')
+
+    by_etag = client.get('/download/video.bin', headers={'If-None-Match': first.headers['ETag']})
+    assert by_etag.status_code == 304
+    assert by_etag.get_data() == b''
+    assert by_etag.headers['ETag'] == first.headers['ETag']
+
+    by_date = client.get('/download/video.bin', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert by_date.status_code == 304
+
+    changed = client.get('/download/video.bin', headers={'If-None-Match': '"other"'})
+    assert changed.status_code == 200
+
+
+def test_regenerated_file_changes_etag(client, tmp_path):
+    etag = client.get('/download/video.bin').headers['ETag']
+    path = tmp_path / 'video.bin'
+    path.write_bytes(b'regenerated')
+    os.utime(path, ns=(0, 10 ** 9))
+
+    response = client.get('/download/video.bin', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_data() == b'regenerated'
+
+
+def test_head(client):
+    response = client.head('/download/video.bin', headers={'Range': 'bytes=0-99'})
+    assert response.status_code == 206
+    assert response.headers['Content-Length'] == '100'
+    assert response.get_data() == b''
+
+
+def test_missing_file_and_traversal(client):
+    assert client.get('/download/missing.bin').status_code == 404
+    assert client.get('/download/..%2Fvideo.bin').status_code == 404
@@ -0,0 +1,90 @@
+"""
+分段并行烧录与串行烧录的输出一致性：在合成视频上比较时长、帧数与逐帧 PSNR
+需要 ffmpeg / ffprobe，未安装时跳过
+"""
+import os
+import shutil
+import subprocess
+
+import pytest
+
+if not (shutil.which('ffmpeg') and shutil.which('ffprobe')):
+    pytest.skip('ffmpeg is not installed', allow_module_level=True)
+pytest.importorskip('numpy')
+
+from benchmarks.bench_parallel_burn import frame_psnr  # noqa: E402
+from benchmarks.fixtures import probe_video  # noqa: E402
+from config.encode import EncodeConfig  # noqa: E402
+from src.encode_profiles import resolve_encode_profile  # noqa: E402
+from src import parallel_burn  # noqa: E402
+from src.parallel_burn import embed_subtitles_parallel, probe_keyframes  # noqa: E402
+from src.subtitle_io import format_timestamp  # noqa: E402
+from src.video_processing import embed_subtitles  # noqa: E402
+
+DURATION = 12
+RATE = 25
+# 字幕时间轴错位时，字幕出现/消失的帧 PSNR 会明显下降
+MIN_PSNR = 25.0
+
+
+@pytest.fixture
+def video(tmp_path):
+    """每 2 秒一个关键帧的合成视频，以及覆盖整个时长、边界跨越切分点的字幕"""
+    video_path = str(tmp_path / 'source.mp4')
+    subprocess.run([
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size=320x240:rate={RATE}:duration={DURATION}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=44100:duration={DURATION}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-g', str(RATE * 2),
+        '-c:a', 'aac', '-shortest', video_path
+    ], check=True)
+
+    subtitle_path = str(tmp_path / 'source.srt')
+    with open(subtitle_path, 'w', encoding='utf-8') as f:
+        start, index = 0.0, 1
+        while start + 1.5 <= DURATION:
+            f.write(f'{index}\n{format_timestamp(start)} --> {format_timestamp(start + 1.5)}\n字幕 {index}\n\n')
+            start += 1.7
+            index += 1
+    return video_path, subtitle_path
+
+
+def test_parallel_burn_matches_serial(video, tmp_path, monkeypatch):
+    video_path, subtitle_path = video
+    monkeypatch.setattr(EncodeConfig, 'PARALLEL_BURN_MIN_SECONDS', 0)
+    monkeypatch.setattr(EncodeConfig, 'BURN_MAX_SEGMENTS', 3)
+    profile = resolve_encode_profile('fast')
+    serial_path = str(tmp_path / 'serial.mp4')
+    parallel_path = str(tmp_path / 'parallel.mp4')
+
+    assert len(probe_keyframes(video_path)[1]) > 3
+    assert embed_subtitles(video_path, subtitle_path, serial_path, profile)
+    assert embed_subtitles_parallel(video_path, subtitle_path, parallel_path, profile, segments=3)
+
+    serial_duration, serial_frames = probe_video(serial_path)
+    parallel_duration, parallel_frames = probe_video(parallel_path)
+    assert abs(serial_duration - parallel_duration) <= 1.0 / RATE
+    assert serial_frames == parallel_frames
+    min_psnr, _ = frame_psnr(serial_path, parallel_path, str(tmp_path / 'psnr.log'))
+    assert min_psnr >= MIN_PSNR
+
+
+def test_segments_above_cap_are_clamped(video, tmp_path, monkeypatch):
+    video_path, subtitle_path = video
+    monkeypatch.setattr(EncodeConfig, 'PARALLEL_BURN_MIN_SECONDS', 0)
+    monkeypatch.setattr(EncodeConfig, 'BURN_MAX_SEGMENTS', 2)
+    planned = []
+
+    def plan_split_points(duration, keyframes, segments):
+        planned.append(segments)
+        return original(duration, keyframes, segments)
+
+    original = parallel_burn.plan_split_points
+    monkeypatch.setattr(parallel_burn, 'plan_split_points', plan_split_points)
+    output_path = str(tmp_path / 'capped.mp4')
+
+    assert embed_subtitles_parallel(video_path, subtitle_path, output_path, resolve_encode_profile('fast'),
+                                    segments=500)
+    assert planned == [2]
+    assert os.path.getsize(output_path) > 0
+    assert abs(probe_video(output_path)[0] - probe_video(video_path)[0]) <= 1.0 / RATE
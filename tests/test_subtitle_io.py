@@ -0,0 +1,77 @@
+"""字幕读写：SRT / WebVTT / ASS 的流式解析、CRLF 与 BOM 兼容以及写出后的往返一致"""
+import pytest
+
+from src.subtitle_io import detect_format, iter_ass, iter_srt, iter_vtt, ms_to_time, read_cues, time_to_ms, \
+    write_cues
+
+CUES = [(1000, 2500, '第一行'), (3000, 4000, 'two\nlines'), (3600000, 3601234, 'late')]
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('00:00:01,000', 1000),
+    ('01:02:03.456', 3723456),
+    ('02:03.5', 123500),
+    ('0:00:01.25', 1250),
+])
+def test_time_to_ms(value, expected):
+    assert time_to_ms(value) == expected
+
+
+def test_time_to_ms_rejects_garbage():
+    with pytest.raises(ValueError):
+        time_to_ms('not a time')
+
+
+def test_ms_to_time():
+    assert ms_to_time(3723456) == '01:02:03,456'
+    assert ms_to_time(-5, '.') == '00:00:00.000'
+
+
+def test_iter_srt_strips_crlf_and_bom():
+    lines = ['﻿00:00:01,000 --> 00:00:02,000\r\n', 'hi\r\n', '\r\n',
+             '2\r\n', '00:00:03,000 --> 00:00:04,500\r\n', 'a\r\n', 'b\r\n']
+    assert list(iter_srt(lines)) == [(1000, 2000, 'hi'), (3000, 4500, 'a\nb')]
+
+
+def test_iter_srt_skips_blocks_without_timing():
+    lines = ['1', 'no timing here', '', '2', '00:00:01,000 --> 00:00:02,000', 'ok', '', '']
+    assert list(iter_srt(lines)) == [(1000, 2000, 'ok')]
+    assert list(iter_srt([])) == []
+
+
+def test_iter_vtt_skips_header_and_note_blocks():
+    lines = ['﻿WEBVTT', 'Kind: captions', '', 'NOTE a comment', 'more', '',
+             'cue-1', '00:01.000 --> 00:02.000 align:start', 'hello', '', 'STYLE', '::cue {}', '',
+             '00:00:03.000 --> 00:00:04.000', 'world']
+    assert list(iter_vtt(lines)) == [(1000, 2000, 'hello'), (3000, 4000, 'world')]
+
+
+def test_iter_ass_reads_dialogue():
+    lines = ['[Script Info]', 'Title: x', '', '[Events]',
+             'Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text',
+             'Dialogue: 0,0:00:01.00,0:00:02.50,Default,,0,0,0,,{\\b1}Hello, world\\Nnext']
+    assert list(iter_ass(lines)) == [(1000, 2500, 'Hello, world\nnext')]
+
+
+@pytest.mark.parametrize('fmt', ['srt', 'vtt', 'ass'])
+def test_round_trip(tmp_path, fmt):
+    path = str(tmp_path / f'cues.{fmt}')
+    write_cues(CUES, path)
+    assert detect_format(path) == fmt
+    # ASS 的时间精度为百分之一秒
+    expected = [((start + 5) // 10 * 10, (end + 5) // 10 * 10, text) for start, end, text in CUES] \
+        if fmt == 'ass' else CUES
+    assert list(read_cues(path)) == expected
+
+
+def test_read_cues_crlf_bom_file(tmp_path):
+    path = tmp_path / 'windows.srt'
+    path.write_bytes('﻿1\r\n00:00:01,000 --> 00:00:02,000\r\n字幕\r\n\r\n'.encode('utf-8'))
+    assert list(read_cues(str(path))) == [(1000, 2000, '字幕')]
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        detect_format('movie.txt')
+    with pytest.raises(ValueError):
+        write_cues(CUES, str(tmp_path / 'cues.ssa'))
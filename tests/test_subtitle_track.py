@@ -0,0 +1,79 @@
+"""SubtitleTrack 的增删改、按时间查找、平移与重新编号"""
+import pytest
+
+from src.subtitle_track import SubtitleTrack
+
+
+def make_track(*cues):
+    return SubtitleTrack.from_cues(cues)
+
+
+def test_cues_at_and_in_range():
+    track = make_track((0, 1000, 'a'), (500, 3000, 'b'), (4000, 5000, 'c'))
+    assert track.cues_at(700) == [0, 1]
+    assert track.cue_at(700) == 1
+    assert track.cues_at(3500) == []
+    assert track.cues_in_range(2000, 4500) == [1, 2]
+
+
+def test_overlaps_and_gaps():
+    track = make_track((0, 1000, 'a'), (500, 3000, 'b'), (4000, 5000, 'c'))
+    assert track.overlaps() == [(0, 1)]
+    assert track.gaps() == [(3000, 4000)]
+    assert track.gaps(min_gap=1000) == []
+
+
+def test_shift_range():
+    track = make_track((0, 1000, 'a'), (2000, 3000, 'b'), (4000, 5000, 'c'))
+    track.shift(-500, 1, 2)
+    assert list(track.cues()) == [(0, 1000, 'a'), (1500, 2500, 'b'), (4000, 5000, 'c')]
+    track.shift(-3000)
+    assert list(track.cues()) == [(0, 0, 'a'), (0, 0, 'b'), (1000, 2000, 'c')]
+
+
+def test_shift_out_of_order_clears_sorted():
+    track = make_track((0, 1000, 'a'), (2000, 3000, 'b'))
+    track.shift(-2500, 1)
+    assert track.cues_at(200) == [0, 1]
+
+
+@pytest.mark.parametrize('start_index', [3, 10])
+def test_shift_starting_past_the_end_is_a_no_op(start_index):
+    track = make_track((0, 1000, 'a'), (2000, 3000, 'b'), (4000, 5000, 'c'))
+    track.shift(100, start_index)
+    assert list(track.cues()) == [(0, 1000, 'a'), (2000, 3000, 'b'), (4000, 5000, 'c')]
+
+
+def test_shift_empty_track():
+    track = SubtitleTrack()
+    track.shift(100)
+    assert len(track) == 0
+
+
+@pytest.mark.parametrize('start_index, end_index', [(-1, None), (0, -1), (0, 4), (2, 1)])
+def test_shift_rejects_invalid_range(start_index, end_index):
+    track = make_track((0, 1000, 'a'), (2000, 3000, 'b'), (4000, 5000, 'c'))
+    with pytest.raises(ValueError):
+        track.shift(100, start_index, end_index)
+
+
+def test_insert_update_delete_keep_ids():
+    track = make_track((0, 1000, 'a'), (2000, 3000, 'b'))
+    cue_id = track.insert(1, 1000, 1500, 'x')
+    assert [cue[0] for cue in track] == [1, cue_id, 2]
+    assert track.update(2, text='B')
+    assert track.delete(1)
+    assert [cue[3] for cue in track] == ['x', 'B']
+    with pytest.raises(ValueError):
+        track.update(cue_id, start=2000)
+
+
+def test_renumber_matches_reload():
+    track = make_track((0, 1000, 'a'), (2000, 3000, 'b'), (4000, 5000, 'c'))
+    inserted = track.insert(0, 0, 500, 'new')
+    track.delete(2)
+    assert track.renumber() == {inserted: 1, 1: 2}
+    assert track.renumber() == {}
+    assert [cue[0] for cue in track] == [1, 2, 3]
+    assert list(track) == list(SubtitleTrack.from_cues(track.cues()))
+    assert track.append(6000, 7000, 'd') == 4
@@ -0,0 +1,66 @@
+"""
+独立的任务工作进程：python worker.py [--stages transcribe,burn] [--threads N]
+API 节点设置 JOB_WORKERS=0 时只接收上传与提供下载，任务由这里启动的工作进程从任务代理（JOB_BROKER）中认领
+- --stages 指定只处理的阶段，例如 GPU 节点只跑 transcribe，CPU 节点只跑 burn
+- 同一节点上的多个工作进程（以及服务进程）共享 HEAVY_JOB_SLOT_DIR 下的重任务槽位
+- 收到 SIGTERM / SIGINT 后停止认领新任务，等待正在运行的任务结束后退出
+"""
+import argparse
+import logging
+import signal
+import threading
+
+import config.settings  # noqa: F401  配置日志
+from config.jobs import JobConfig
+from config.model import ModelConfig
+from src.admission import HeavySlots
+from src.jobs import JobQueue, get_broker
+from src.model_registry import registry
+from src.pipeline import run_upload_job, PIPELINE_QUEUES, QUEUE_TRANSCRIBE
+
+logger = logging.getLogger('worker')
+
+
+def parse_stages(value):
+    stages = tuple(stage.strip() for stage in value.split(',') if stage.strip())
+    unknown = [stage for stage in stages if stage not in PIPELINE_QUEUES]
+    if unknown or not stages:
+        raise argparse.ArgumentTypeError(
+            f'Unknown stage "{",".join(unknown)}". Available: {", ".join(PIPELINE_QUEUES)}')
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run transcription / burn job workers')
+    parser.add_argument('--stages', type=parse_stages, default=PIPELINE_QUEUES,
+                        help=f'comma separated stages to process (default: {",".join(PIPELINE_QUEUES)})')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='worker threads in this process (default: MAX_HEAVY_JOBS)')
+    args = parser.parse_args(argv)
+
+    # 旧版本创建的任务没有队列名，从转录阶段开始执行
+    queues = args.stages + ('',) if QUEUE_TRANSCRIBE in args.stages else args.stages
+    job_queue = JobQueue(get_broker(), run_upload_job, max_workers=max(1, args.threads or JobConfig.MAX_HEAVY_JOBS),
+                         slots=HeavySlots(), queues=queues)
+
+    stopped = threading.Event()
+
+    def shutdown(signum, frame):
+        logger.info('收到信号 %d，等待正在运行的任务结束', signum)
+        stopped.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    if QUEUE_TRANSCRIBE in args.stages and ModelConfig.WARMUP_ON_START:
+        registry.warm_up()
+    job_queue.start()
+    logger.info('工作进程 %s 已启动：阶段 %s，%d 个线程', job_queue.worker_id, ','.join(args.stages),
+                job_queue.max_workers)
+    stopped.wait()
+    job_queue.stop(wait=True)
+    logger.info('工作进程 %s 已退出', job_queue.worker_id)
+
+
+if __name__ == '__main__':
+    main()